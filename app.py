@@ -1,11 +1,10 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import re
-from collections import Counter
-import numpy as np
+import os
+
+from perf import finish_perf, start_perf
+
+# pandas / plotly は起動時には読み込まない（初回描画の高速化）
+# pandas はデータ読み込み時、plotly は分析結果の描画時に読み込む
 
 # ページ設定
 st.set_page_config(
@@ -14,6 +13,9 @@ st.set_page_config(
     layout="wide"
 )
 
+# 処理時間の計測（サイドバーの「パフォーマンス」パネルで有効化）
+perf = start_perf("geo")
+
 # メインタイトル
 st.title("🎯 GEO分析ダッシュボード")
 st.markdown("**Generative Engine Optimization (GEO) 分析ツール**")
@@ -29,28 +31,174 @@ uploaded_file = st.sidebar.file_uploader(
     help="プロンプト・回答データのCSVファイルをアップロードしてください"
 )
 
-# サンプルデータの読み込み（デモ用）
+# 回答列の設定（回答列の数は固定しない）
+with st.sidebar.expander("🧩 回答列の設定"):
+    model_names_input = st.text_input(
+        "モデル名（ヘッダーなしCSV・左から順）",
+        value="GPT, Gemini, Perplexity",
+        help="3列目以降の回答列に左から付ける名前。足りない分は「モデル4」のような連番になります"
+    )
+    column_map_input = st.text_area(
+        "列の対応（ヘッダーありCSV・1行に「列名: モデル名」）",
+        value="",
+        placeholder="gpt_answer: GPT\nclaude_answer: Claude",
+        help="「〜回答」という列名は自動で回答列として扱います。それ以外の列名を回答列にする場合に指定します"
+    )
+model_names = [name.strip() for name in model_names_input.split(',') if name.strip()]
+
+# サンプルデータの読み込み（デモ用。ファイルは環境変数 GEO_SAMPLE_PATH で変更可）
 @st.cache_data
-def load_sample_data():
+def load_sample_data(model_names):
+    from geo_analysis import read_geo_csv
     try:
-        df = pd.read_csv('/home/user/LAVA_GEO_data.csv', header=None)
-        # 列名を設定
-        df.columns = ['ID', 'プロンプト', 'GPT回答', 'Gemini回答', 'Perplexity回答'] + [f'列{i}' for i in range(5, len(df.columns))]
-        return df
+        return read_geo_csv(os.environ.get('GEO_SAMPLE_PATH', '/home/user/LAVA_GEO_data.csv'), model_names)
     except:
         return None
 
+# 分析結果のグラフ（結果のハッシュをキーに一度だけ生成して使い回す）
+@st.cache_resource(max_entries=32)
+def get_result_figures(figure_key, _results, _models, _main_brand, _brand_top_n):
+    from geo_charts import build_result_figures
+    return build_result_figures(_results, _models, _main_brand, brand_top_n=_brand_top_n)
+
+# ブランド共起のヒートマップ（結果のハッシュ・表示するモデル・単位をキーにキャッシュ。ページ送りなどの再実行では作り直さない）
+@st.cache_resource(max_entries=32)
+def get_co_mention_figure(figure_key, co_model, co_percent, _results, _models, _main_brand, _brand_top_n):
+    from geo_charts import build_co_mention_heatmap, co_mention_frame, top_brands
+    
+    # 上位ブランドのみ表示（ブランド数はサイドバーの設定）
+    heatmap_brands = top_brands(_results, _main_brand, _brand_top_n)
+    heatmap_models = _models if co_model == "全モデル合計" else [co_model]
+    return build_co_mention_heatmap(
+        co_mention_frame(_results, heatmap_models, heatmap_brands, co_percent),
+        f"ブランド共起（{co_model}）",
+        co_percent
+    )
+
+# 分析結果の履歴ストア（SQLite。保存先は環境変数 GEO_STORE_PATH で変更可）
+# 履歴ファイルがまだなければ、ページを開いただけでは geo_store（pandas）の読み込みもファイルの作成もしない
+HISTORY_PATH = os.environ.get(
+    'GEO_STORE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "geo_history.sqlite")
+)
+
+@st.cache_resource
+def get_result_store():
+    from geo_store import ResultStore
+    return ResultStore(HISTORY_PATH)
+
+# 回答列の正規化（データごとに1回だけ。ブランド照合はこの正規化済みテキストに対して行う。data_key はデータの内容のハッシュ）
+@st.cache_resource(max_entries=4)
+def get_normalized_answers(data_key, _df, unify_kana):
+    from geo_analysis import normalize_answers
+    return normalize_answers(_df, unify_kana=unify_kana)
+
+# 列ごとの分析を並列に実行するプロセスプール（回答列が多く、行数が多い場合のみ使う）
+@st.cache_resource
+def get_analysis_executor():
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=min(8, os.cpu_count() or 1), mp_context=multiprocessing.get_context('spawn'))
+
+EXPORT_DOWNLOAD_LIMIT_MB = 100  # これより大きいエクスポートは画面からダウンロードさせない（ボタン表示中はメモリに載るため）
+
+PARALLEL_MIN_CELLS = 20000  # 行数×モデル数がこれ未満なら並列化しない（プロセス間の受け渡しの方が重い）
+
+def discard_export():
+    """作成済みのエクスポート一時ファイルを削除"""
+    export = st.session_state.pop('detail_export', None)
+    if export and os.path.exists(export['path']):
+        os.remove(export['path'])
+
+def render_trend(main_brand, competitors, models):
+    """
+    履歴ストアの集計値からブランド言及率・引用ドメインの推移を表示（過去のCSVは再分析しない）
+    models: モデルの選択肢（None の場合は履歴に保存されているモデル）
+    """
+    no_history = f"{main_brand} の分析履歴はまだありません。「分析結果を履歴に保存」をオンにして分析すると、ここに推移が表示されます。"
+    if not os.path.exists(HISTORY_PATH):
+        st.info(no_history)
+        return
+    
+    store = get_result_store()
+    with perf.stage("履歴読み込み"):
+        runs = store.list_runs(main_brand)
+    
+    if runs.empty:
+        st.info(no_history)
+        return
+    
+    # plotly は履歴があるときだけ読み込む
+    from geo_charts import build_domain_trend_figure, build_trend_figure, domain_trend_frame, trend_frame
+    
+    trend1, trend2, trend3 = st.columns(3)
+    with trend1:
+        known_brands = store.known_brands(main_brand)
+        trend_brands = st.multiselect(
+            "比較するブランド",
+            known_brands,
+            default=[b for b in competitors if b in known_brands][:3],
+            key="trend_brands"
+        )
+    with trend2:
+        if models is None:
+            models = store.known_models(main_brand)
+        trend_model = st.selectbox("モデル", ["全モデル平均"] + list(models), key="trend_model")
+    with trend3:
+        monthly = st.radio("集計単位", ["実行ごと", "月ごと"], horizontal=True, key="trend_unit") == "月ごと"
+    
+    with perf.stage("履歴読み込み"):
+        brand_df = store.brand_trend(main_brand, [main_brand] + trend_brands)
+        domain_df = store.domain_trend(main_brand, top_n=5)
+    
+    model_filter = None if trend_model == "全モデル平均" else trend_model
+    st.plotly_chart(
+        build_trend_figure(
+            trend_frame(brand_df, model_filter, monthly),
+            f"ブランド言及率の推移（{trend_model}）"
+        ),
+        use_container_width=True
+    )
+    if not domain_df.empty:
+        st.plotly_chart(
+            build_domain_trend_figure(domain_trend_frame(domain_df, monthly), 5),
+            use_container_width=True
+        )
+    
+    total_runs = store.count_runs(main_brand)
+    shown = f"（新しい{len(runs)}件を表示）" if total_runs > len(runs) else ""
+    st.markdown(f"**保存済みの分析: {total_runs}件**{shown}")
+    st.dataframe(
+        runs.rename(columns={
+            'id': 'ID', 'created_at': '日時', 'dataset_name': 'データ',
+            'main_brand': 'メインブランド', 'rows': '行数', 'dataset_hash': 'データハッシュ'
+        }),
+        hide_index=True,
+        use_container_width=True
+    )
+
+def move_detail_page(step, total_pages):
+    """詳細データのページ送り（ボタンのコールバック。再実行の前にページを更新し、範囲内に収める）"""
+    page = st.session_state.get('detail_page', 0) + step
+    st.session_state.detail_page = max(0, min(page, total_pages - 1))
+
 # データの処理
 if uploaded_file is not None:
+    from geo_analysis import parse_column_map, read_geo_csv
     try:
-        df = pd.read_csv(uploaded_file, header=None)
-        # 列数に応じて列名を設定
-        if len(df.columns) >= 5:
-            df.columns = ['ID', 'プロンプト', 'GPT回答', 'Gemini回答', 'Perplexity回答'] + [f'列{i}' for i in range(5, len(df.columns))]
-        else:
-            df.columns = [f'列{i}' for i in range(len(df.columns))]
+        with perf.stage("CSV読み込み"):
+            df = read_geo_csv(uploaded_file, model_names, parse_column_map(column_map_input))
+        perf.count("行数", len(df))
         
         st.sidebar.success(f"✅ ファイル読み込み完了: {len(df)}行")
+        # 正規化のキャッシュは全セッションで共有されるので、ファイル名ではなく内容のハッシュをキーにする
+        # ハッシュはアップロード（と列の設定）ごとに1回だけ計算し、ページ送りなどの再実行では使い回す
+        upload_key = (uploaded_file.file_id, tuple(model_names), column_map_input)
+        if st.session_state.get('upload_hash', {}).get('key') != upload_key:
+            from geo_store import dataset_hash
+            with perf.stage("データハッシュ"):
+                st.session_state.upload_hash = {'key': upload_key, 'hash': dataset_hash(df)}
+        data_key = st.session_state.upload_hash['hash']
         data_loaded = True
     except Exception as e:
         st.sidebar.error(f"❌ ファイル読み込みエラー: {e}")
@@ -58,15 +206,26 @@ if uploaded_file is not None:
         df = None
 else:
     # サンプルデータを使用
-    df = load_sample_data()
+    with perf.stage("CSV読み込み"):
+        df = load_sample_data(model_names)
     if df is not None:
         st.sidebar.info("📂 サンプルデータ（LAVA）を使用中")
+        perf.count("行数", len(df))
+        data_key = f"sample:{','.join(map(str, df.columns))}"
         data_loaded = True
     else:
         st.sidebar.warning("⚠️ データファイルをアップロードしてください")
         data_loaded = False
 
 if data_loaded and df is not None:
+    import numpy as np
+    from geo_analysis import answer_column, detect_models
+    
+    data_models = detect_models(df)
+    if not data_models:
+        st.sidebar.warning("⚠️ 回答列が見つかりません。「回答列の設定」を確認してください")
+    else:
+        st.sidebar.caption(f"回答列: {len(data_models)}モデル（{', '.join(data_models)}）")
     
     # ブランド設定
     st.sidebar.subheader("🏢 ブランド設定")
@@ -87,80 +246,102 @@ if data_loaded and df is not None:
     
     competitors = [brand.strip() for brand in competitors_input.split(',') if brand.strip()]
     
-    # 分析関数
-    def count_brand_mentions(text, brand_name):
-        """テキスト内のブランド言及数をカウント"""
-        if pd.isna(text) or text == '':
-            return 0
-        pattern = re.compile(re.escape(brand_name), re.IGNORECASE)
-        return len(pattern.findall(str(text)))
+    # 表記ゆれ（別名・カナ）の設定。全角/半角・大文字/小文字の違いは常に同一視する
+    aliases_input = st.sidebar.text_area(
+        "ブランドの別名（1行に「ブランド: 別名, 別名」）",
+        value="LAVA: ラバ\nzen place: ゼンプレイス\nCALDO: カルド\nloIve: ロイブ",
+        help="別名もブランド名と同じように数えます（例: LAVA: ラバ, らば）"
+    )
+    unify_kana = st.sidebar.checkbox(
+        "ひらがなとカタカナを区別しない",
+        value=False,
+        help="「らば」と「ラバ」を同じ表記として数えます"
+    )
+    
+    with perf.stage("テキスト正規化"):
+        normalized_answers = get_normalized_answers(data_key, df, unify_kana)
+    
+    # グラフ表示設定
+    brand_top_n = st.sidebar.slider(
+        "グラフに表示するブランド数",
+        min_value=3,
+        max_value=30,
+        value=10,
+        help="上位以外のブランドは「その他」にまとめて表示します"
+    )
     
-    def extract_urls(text):
-        """テキストからURLを抽出"""
-        if pd.isna(text) or text == '':
-            return []
-        url_pattern = r'https?://[^\s\)\]\,]+'
-        urls = re.findall(url_pattern, str(text))
-        return urls
+    save_history = st.sidebar.checkbox(
+        "分析結果を履歴に保存",
+        value=True,
+        help="言及率・引用ドメインの集計値を保存し、「推移」タブで過去の分析と比較します"
+    )
     
-    # 分析実行
+    # 分析実行（分析ロジックは geo_analysis.py。バッチ処理 geo_batch.py と共通）
     if st.sidebar.button("🔍 分析実行", type="primary"):
+        from concurrent.futures.process import BrokenProcessPool
+        from geo_analysis import analyze, parse_aliases
         
+        aliases = parse_aliases(aliases_input)
+        # 回答列ごとに独立したタスクとして分析（データが大きい場合はプロセスを分けて並列に実行）
+        use_pool = (os.cpu_count() or 1) > 1 and len(df) * len(data_models) >= PARALLEL_MIN_CELLS
+        executor = get_analysis_executor() if use_pool else None
         with st.spinner("分析中..."):
+            try:
+                analysis = analyze(
+                    df, main_brand, competitors,
+                    aliases=aliases, unify_kana=unify_kana, normalized=normalized_answers, executor=executor
+                )
+            except BrokenProcessPool:
+                # ワーカープロセスが落ちたプールは使えないので捨てる（次回の分析で作り直す）。今回は1プロセスで分析し直す
+                get_analysis_executor.clear()
+                st.sidebar.warning("⚠️ 並列処理のプロセスが停止したため、1プロセスで分析し直しました。")
+                analysis = analyze(
+                    df, main_brand, competitors,
+                    aliases=aliases, unify_kana=unify_kana, normalized=normalized_answers
+                )
+        
+        # 再実行しても結果を保持する（グラフは結果のハッシュをキーにキャッシュから再利用）
+        # row_mentions / row_domains は詳細データのフィルター・CSVエクスポートで再利用
+        st.session_state.geo_results = dict(analysis, data_key=data_key, main_brand=main_brand)
+        
+        if save_history and analysis['results']:
+            from geo_store import dataset_hash
             
-            # メイン分析結果を格納する辞書
-            results = {}
-            models = ['GPT', 'Gemini', 'Perplexity']
-            model_columns = ['GPT回答', 'Gemini回答', 'Perplexity回答']
-            
-            # 各モデルでの分析
-            for i, model in enumerate(models):
-                if i + 2 < len(df.columns):  # 列が存在するかチェック
-                    column = model_columns[i]
-                    
-                    # メインブランドの言及分析
-                    main_mentions = df[column].apply(lambda x: count_brand_mentions(x, main_brand))
-                    main_mention_rate = (main_mentions > 0).mean() * 100
-                    
-                    # 競合ブランドの言及分析
-                    competitor_rates = {}
-                    for competitor in competitors:
-                        comp_mentions = df[column].apply(lambda x: count_brand_mentions(x, competitor))
-                        competitor_rates[competitor] = (comp_mentions > 0).mean() * 100
-                    
-                    # URL分析
-                    all_urls = []
-                    for text in df[column].dropna():
-                        urls = extract_urls(text)
-                        all_urls.extend(urls)
-                    
-                    # ドメイン分析
-                    domains = []
-                    for url in all_urls:
-                        try:
-                            domain = re.findall(r'https?://([^/]+)', url)[0]
-                            domains.append(domain)
-                        except:
-                            continue
-                    
-                    domain_counts = Counter(domains)
-                    
-                    results[model] = {
-                        'main_brand_rate': main_mention_rate,
-                        'competitor_rates': competitor_rates,
-                        'total_urls': len(all_urls),
-                        'unique_domains': len(domain_counts),
-                        'top_domains': dict(domain_counts.most_common(10))
-                    }
+            with perf.stage("履歴保存"):
+                get_result_store().save_run(
+                    analysis['results'],
+                    main_brand,
+                    competitors,
+                    data_key if uploaded_file is not None else dataset_hash(df),
+                    rows=len(df),
+                    dataset_name=uploaded_file.name if uploaded_file is not None else "sample",
+                    settings={'aliases': aliases, 'unify_kana': unify_kana}
+                )
+    
+    # 別のデータが読み込まれた場合は前回の結果を破棄
+    if st.session_state.get('geo_results', {}).get('data_key') not in (None, data_key):
+        del st.session_state.geo_results
+    
+    if 'geo_results' in st.session_state:
+        # 結果表示（plotly はここで初めて読み込む）
+        from geo_charts import result_hash
+        
+        results = st.session_state.geo_results['results']
+        models = st.session_state.geo_results['models']
+        main_brand = st.session_state.geo_results['main_brand']
+        
+        with perf.stage("グラフ生成"):
+            figure_key = result_hash(results, main_brand, models=models, brand_top_n=brand_top_n)
+            figures, tables = get_result_figures(figure_key, results, models, main_brand, brand_top_n)
         
-        # 結果表示
         st.header("📊 分析結果")
         
         # サマリーメトリクス
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            avg_mention_rate = np.mean([results[model]['main_brand_rate'] for model in models if model in results])
+            main_rates = [results[model]['main_brand_rate'] for model in models if model in results]
+            avg_mention_rate = sum(main_rates) / len(main_rates) if main_rates else 0.0
             st.metric(
                 f"{main_brand} 平均言及率",
                 f"{avg_mention_rate:.1f}%",
@@ -193,134 +374,70 @@ if data_loaded and df is not None:
             )
         
         # タブで詳細分析を分ける
-        tab1, tab2, tab3, tab4 = st.tabs(["🏆 ブランド比較", "🤖 モデル別分析", "🔗 URL分析", "📝 詳細データ"])
+        tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(
+            ["🏆 ブランド比較", "🤖 モデル別分析", "🔗 URL分析", "🔥 共起・初出", "📝 詳細データ", "📈 推移"]
+        )
         
         with tab1:
             st.subheader("ブランド言及率比較")
             
-            # ブランド比較チャート作成
-            brand_data = []
-            
-            for model in models:
-                if model in results:
-                    # メインブランド
-                    brand_data.append({
-                        'ブランド': main_brand,
-                        'モデル': model,
-                        '言及率': results[model]['main_brand_rate'],
-                        'タイプ': 'メイン'
-                    })
-                    
-                    # 競合ブランド
-                    for competitor, rate in results[model]['competitor_rates'].items():
-                        brand_data.append({
-                            'ブランド': competitor,
-                            'モデル': model,
-                            '言及率': rate,
-                            'タイプ': '競合'
-                        })
-            
-            if brand_data:
-                brand_df = pd.DataFrame(brand_data)
-                
-                # グループ化棒グラフ
-                fig = px.bar(
-                    brand_df, 
-                    x='ブランド', 
-                    y='言及率', 
-                    color='モデル',
-                    title=f"ブランド別・モデル別言及率比較",
-                    labels={'言及率': '言及率 (%)', 'ブランド': 'ブランド名'},
-                    height=400
-                )
-                fig.update_layout(showlegend=True)
-                st.plotly_chart(fig, use_container_width=True)
-                
-                # 平均言及率テーブル
-                avg_rates = brand_df.groupby('ブランド')['言及率'].mean().sort_values(ascending=False)
+            if 'brand' in figures:
+                # グループ化棒グラフ（上位ブランド以外は「その他」に集約）
+                st.plotly_chart(figures['brand'], use_container_width=True)
                 
+                # 平均言及率テーブル（全ブランド）
                 st.subheader("📈 ブランド別平均言及率ランキング")
-                rank_df = pd.DataFrame({
-                    'ランク': range(1, len(avg_rates) + 1),
-                    'ブランド': avg_rates.index,
-                    '平均言及率 (%)': avg_rates.values.round(1)
-                })
-                st.dataframe(rank_df, hide_index=True, use_container_width=True)
+                st.dataframe(tables['ranking'], hide_index=True, use_container_width=True)
         
         with tab2:
             st.subheader("AIモデル別パフォーマンス")
             
-            # モデル比較
-            model_performance = []
-            for model in models:
-                if model in results:
-                    model_performance.append({
-                        'モデル': model,
-                        f'{main_brand}言及率': results[model]['main_brand_rate'],
-                        'URL引用数': results[model]['total_urls'],
-                        'ユニークドメイン数': results[model]['unique_domains']
-                    })
-            
-            if model_performance:
-                perf_df = pd.DataFrame(model_performance)
-                
+            if 'radar' in figures:
                 # レーダーチャート
-                fig = go.Figure()
-                
-                angles = ['言及率', 'URL引用数', 'ユニークドメイン数']
-                
-                for _, row in perf_df.iterrows():
-                    values = [
-                        row[f'{main_brand}言及率'],
-                        row['URL引用数'] / 10,  # スケール調整
-                        row['ユニークドメイン数'] * 5  # スケール調整
-                    ]
-                    
-                    fig.add_trace(go.Scatterpolar(
-                        r=values,
-                        theta=angles,
-                        fill='toself',
-                        name=row['モデル']
-                    ))
-                
-                fig.update_layout(
-                    polar=dict(
-                        radialaxis=dict(visible=True, range=[0, 100])
-                    ),
-                    title="モデル別パフォーマンス比較（正規化）",
-                    height=500
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                st.plotly_chart(figures['radar'], use_container_width=True)
                 
                 # 詳細テーブル
-                st.dataframe(perf_df, hide_index=True, use_container_width=True)
+                st.dataframe(tables['performance'], hide_index=True, use_container_width=True)
         
         with tab3:
             st.subheader("URL・ドメイン分析")
             
-            # 各モデルのトップドメイン
-            col1, col2, col3 = st.columns(3)
+            # 全モデルの引用ドメインを1つのヒートマップで比較（モデル数が増えてもグラフは1つ）
+            if 'domains' in figures:
+                st.plotly_chart(figures['domains'], use_container_width=True)
+            
+            # 選択したモデルのトップドメインのみ描画
+            from geo_charts import build_domain_figure, domain_frame
             
-            for i, (model, col) in enumerate(zip(models, [col1, col2, col3])):
-                if model in results and results[model]['top_domains']:
-                    with col:
-                        st.markdown(f"**{model} トップドメイン**")
-                        domains = list(results[model]['top_domains'].items())[:5]
-                        
-                        domain_df = pd.DataFrame(domains, columns=['ドメイン', '引用回数'])
-                        
-                        fig = px.bar(
-                            domain_df,
-                            x='引用回数',
-                            y='ドメイン',
-                            orientation='h',
-                            title=f"{model} 引用ドメイン TOP5",
-                            height=300
-                        )
-                        fig.update_layout(yaxis={'categoryorder':'total ascending'})
-                        st.plotly_chart(fig, use_container_width=True)
+            domain_models = [model for model in models if results[model]['top_domains']]
+            if domain_models:
+                domain_model = st.selectbox("モデル別のトップドメイン", domain_models, key="domain_model")
+                st.plotly_chart(
+                    build_domain_figure(domain_frame(results[domain_model], 5), domain_model, 5),
+                    use_container_width=True
+                )
         
         with tab4:
+            st.subheader("同じ回答で言及されたブランド")
+            
+            co1, co2 = st.columns(2)
+            with co1:
+                co_model = st.selectbox("モデル", ["全モデル合計"] + models, key="co_mention_model")
+            with co2:
+                co_percent = st.radio(
+                    "表示", ["回答数", "割合"], horizontal=True, key="co_mention_unit",
+                    help="割合: 縦軸のブランドが言及された回答のうち、横軸のブランドも言及された割合"
+                ) == "割合"
+            
+            with perf.stage("グラフ生成"):
+                co_figure = get_co_mention_figure(figure_key, co_model, co_percent, results, models, main_brand, brand_top_n)
+            st.plotly_chart(co_figure, use_container_width=True)
+            
+            if 'first_mention' in figures:
+                st.subheader("最初に言及されたブランド")
+                st.plotly_chart(figures['first_mention'], use_container_width=True)
+        
+        with tab5:
             st.subheader("詳細データ")
             
             # フィルター機能
@@ -333,52 +450,132 @@ if data_loaded and df is not None:
             with col2:
                 show_mentions_only = st.checkbox(f"{main_brand}が言及された行のみ表示")
             
-            # データフィルタリング
-            display_df = df.copy()
-            
-            if search_term:
-                mask = display_df['プロンプト'].str.contains(search_term, case=False, na=False)
-                display_df = display_df[mask]
+            # データフィルタリング（DataFrameはコピーせず、該当行の位置だけを保持）
+            from geo_table import filter_row_indices, page_count, page_rows
             
-            if show_mentions_only:
-                # メインブランドが言及された行のみ
-                mention_mask = False
-                for col in ['GPT回答', 'Gemini回答', 'Perplexity回答']:
-                    if col in display_df.columns:
-                        col_mask = display_df[col].apply(lambda x: count_brand_mentions(x, main_brand) > 0)
-                        mention_mask = mention_mask | col_mask
+            filter_key = (figure_key, search_term, show_mentions_only)
+            if st.session_state.get('detail_filter_key') != filter_key:
+                row_mask = None
+                if show_mentions_only:
+                    # メインブランドが言及された行のみ（分析時の行ごとの言及数を再利用）
+                    row_mentions = st.session_state.geo_results['row_mentions']
+                    row_mask = np.zeros(len(df), dtype=bool)
+                    for counts in row_mentions.values():
+                        row_mask |= counts > 0
                 
-                if isinstance(mention_mask, pd.Series):
-                    display_df = display_df[mention_mask]
+                st.session_state.detail_filter_key = filter_key
+                with perf.stage("フィルター"):
+                    st.session_state.detail_rows = filter_row_indices(df, search_term, row_mask)
+                st.session_state.detail_page = 0
             
-            st.markdown(f"**表示件数: {len(display_df)} / {len(df)}**")
+            row_indices = st.session_state.detail_rows
             
-            # データ表示（最初の5列のみ）
-            if len(display_df) > 0:
-                display_columns = ['ID', 'プロンプト', 'GPT回答', 'Gemini回答', 'Perplexity回答']
-                available_columns = [col for col in display_columns if col in display_df.columns]
+            st.markdown(f"**表示件数: {len(row_indices)} / {len(df)}**")
+            
+            # データ表示（ID・プロンプト・回答列のみ・表示中のページ分だけ取り出す）
+            if len(row_indices) > 0:
+                display_columns = ['ID', 'プロンプト'] + [answer_column(model) for model in models]
+                available_columns = [col for col in display_columns if col in df.columns]
+                
+                page_size = st.selectbox("1ページの表示件数", [50, 100, 200], key="detail_page_size")
+                total_pages = page_count(len(row_indices), page_size)
+                # ページ送りはボタンのコールバックで先に反映されるので、ここでは範囲内に収めるだけ
+                page = max(0, min(st.session_state.detail_page, total_pages - 1))
+                st.session_state.detail_page = page
+                
+                nav1, nav2, nav3 = st.columns([1, 2, 1])
+                with nav1:
+                    st.button("◀ 前へ", disabled=page == 0, use_container_width=True,
+                              on_click=move_detail_page, args=(-1, total_pages))
+                with nav3:
+                    st.button("次へ ▶", disabled=page >= total_pages - 1, use_container_width=True,
+                              on_click=move_detail_page, args=(1, total_pages))
+                with nav2:
+                    start = page * page_size
+                    st.caption(f"{page + 1} / {total_pages} ページ（{start + 1}〜{min(start + page_size, len(row_indices))}件目）")
                 
                 st.dataframe(
-                    display_df[available_columns].head(50), 
+                    page_rows(df, row_indices, page, page_size, available_columns), 
                     height=400,
                     use_container_width=True
                 )
                 
-                # CSVダウンロード
-                csv = display_df.to_csv(index=False)
-                st.download_button(
-                    label="📥 フィルター結果をCSVダウンロード",
-                    data=csv,
-                    file_name=f"geo_analysis_{main_brand}_filtered.csv",
-                    mime="text/csv"
-                )
+                # CSVエクスポート（ボタンが押されたときだけ、一時ファイルへチャンク単位で書き出す）
+                with st.expander("📥 フィルター結果をCSVエクスポート"):
+                    export_columns = st.multiselect(
+                        "出力する列",
+                        list(df.columns),
+                        default=list(df.columns),
+                        key="export_columns"
+                    )
+                    include_analysis = st.checkbox("行ごとの言及数・引用ドメインを追加", key="export_analysis")
+                    compress = st.checkbox("gzip圧縮", key="export_gzip")
+                    
+                    export_key = (filter_key, tuple(export_columns), include_analysis, compress)
+                    if st.session_state.get('detail_export', {}).get('key') != export_key:
+                        discard_export()
+                    
+                    if 'detail_export' not in st.session_state:
+                        if st.button("📄 CSVを作成", disabled=not (export_columns or include_analysis)):
+                            from geo_export import analysis_columns, export_to_tempfile
+                            
+                            extra_columns = None
+                            if include_analysis:
+                                extra_columns = analysis_columns(
+                                    st.session_state.geo_results['row_mentions'],
+                                    st.session_state.geo_results['row_domains'],
+                                    main_brand
+                                )
+                            with st.spinner("CSV作成中..."), perf.stage("CSVエクスポート"):
+                                path = export_to_tempfile(df, row_indices, export_columns, extra_columns, compress)
+                            st.session_state.detail_export = {'key': export_key, 'path': path, 'fresh': True}
+                    
+                    # 一定時間が経って一時ファイルが削除されていれば作り直してもらう
+                    if 'detail_export' in st.session_state and not os.path.exists(st.session_state.detail_export['path']):
+                        discard_export()
+                        st.info("作成したCSVの保存期間が過ぎました。もう一度作成してください。")
+                    
+                    if 'detail_export' in st.session_state:
+                        export = st.session_state.detail_export
+                        size_mb = os.path.getsize(export['path']) / 1024 ** 2
+                        if size_mb > EXPORT_DOWNLOAD_LIMIT_MB:
+                            st.warning(
+                                f"⚠️ CSVが {size_mb:.0f} MB あり、画面からダウンロードできる上限（{EXPORT_DOWNLOAD_LIMIT_MB} MB）を超えています。"
+                                "gzip圧縮を有効にするか、出力する列・フィルター条件を絞ってください。"
+                            )
+                        elif export.pop('fresh', False) or st.button("📥 ダウンロードを準備", key="prepare_export_download"):
+                            # ファイルの読み込みは作成直後・準備ボタンを押したときだけ（再実行のたびに読み込まない）
+                            file_name = f"geo_analysis_{main_brand}_filtered.csv" + (".gz" if compress else "")
+                            with open(export['path'], 'rb') as f:
+                                data = f.read()
+                            st.download_button(
+                                label=f"📥 CSVをダウンロード（{size_mb:.1f} MB）",
+                                data=data,
+                                file_name=file_name,
+                                mime="application/gzip" if compress else "text/csv"
+                            )
             else:
                 st.info("フィルター条件に該当するデータがありません。")
+        
+        with tab6:
+            st.subheader("言及率・引用ドメインの推移")
+            render_trend(main_brand, competitors, models)
+    else:
+        # 分析前でも保存済みの履歴から推移を表示する（CSVを再分析しない）
+        st.header("📈 分析履歴の推移")
+        render_trend(main_brand, competitors, data_models)
 
 else:
     # データが読み込まれていない場合の案内
     st.info("📂 CSVファイルをアップロードするか、サンプルデータをお試しください。")
     
+    # 保存済みの履歴があれば、データを読み込まなくても推移を表示する
+    history_brands = get_result_store().main_brands() if os.path.exists(HISTORY_PATH) else []
+    if history_brands:
+        st.header("📈 分析履歴の推移")
+        history_brand = st.selectbox("メインブランド", history_brands, key="trend_main_brand")
+        render_trend(history_brand, [], None)
+    
     st.markdown("""
     ### 📋 データ形式について
     
@@ -388,6 +585,9 @@ else:
     3. **GPT回答** - ChatGPTの回答
     4. **Gemini回答** - Geminiの回答  
     5. **Perplexity回答** - Perplexityの回答
+    6. 以降の列 - その他のAIモデルの回答（何列でも可。モデル名はサイドバーの「回答列の設定」で指定）
+    
+    ヘッダー行（「ID, プロンプト, GPT回答, …」のような列名）があるCSVは、「〜回答」の列をすべて分析します。
     
     **分析できる項目:**
     - ✅ ブランド言及率の比較
@@ -407,3 +607,6 @@ st.markdown(
     """, 
     unsafe_allow_html=True
 )
+
+# 処理時間の表示（計測が有効な場合）
+finish_perf(perf)
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GEO分析・LPテンプレート処理のベンチマーク
+
+合成データ（benchmarks/synthetic.py）に対して各処理の実行時間を計測し、
+機械可読なJSONとして保存する。前回の結果と比較して劣化を検出できる
+
+使い方:
+    python benchmarks/bench_suite.py                       # 標準サイズで全ケース
+    python benchmarks/bench_suite.py --size small -k lp.   # 名前に "lp." を含むケースのみ
+    python benchmarks/bench_suite.py --compare benchmarks/results/bench_20250101_120000.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import synthetic  # noqa: E402
+from geo_analysis import (  # noqa: E402
+    BrandMatcher, analyze, count_brand_mentions, extract_domains, extract_urls, normalize_answers
+)
+from geo_export import write_csv  # noqa: E402
+from geo_table import filter_row_indices  # noqa: E402
+from lp_assets import AssetStore, extract_images  # noqa: E402
+from lp_dedupe import DuplicateIndex, template_signature  # noqa: E402
+from lp_similar import SimilarityIndex, query_features  # noqa: E402
+from lp_versions import SNAPSHOT_INTERVAL, RevisionHistory  # noqa: E402
+from lp_builder_bu import (  # noqa: E402
+    check_base64_images, check_html_size, parse_library, sanitize_user_html,
+    serialize_library, validate_html_structure
+)
+
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+MODEL_COLUMNS = ['GPT回答', 'Gemini回答', 'Perplexity回答']
+
+# サイズ別のデータ量
+SIZES = {
+    'small': {'rows': 500, 'answer_chars': 300, 'html_kb': 20, 'templates': 20},
+    'medium': {'rows': 5000, 'answer_chars': 600, 'html_kb': 200, 'templates': 100},
+    'large': {'rows': 50000, 'answer_chars': 1200, 'html_kb': 900, 'templates': 300},
+}
+
+# 劣化とみなす中央値の比率
+REGRESSION_RATIO = 1.2
+
+
+class Case:
+    """ベンチマーク1件（setup は計測対象外、run の実行時間を計測する）"""
+
+    def __init__(self, name: str, run: Callable[[], object], params: Optional[Dict] = None):
+        self.name = name
+        self.run = run
+        self.params = params or {}
+
+
+def time_case(case: Case, repeat: int, warmup: int = 1) -> Dict:
+    """repeat 回実行して統計値（秒）を返す"""
+    for _ in range(warmup):
+        case.run()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        case.run()
+        samples.append(time.perf_counter() - started)
+    return {
+        'name': case.name,
+        'params': case.params,
+        'repeat': repeat,
+        'min_s': min(samples),
+        'median_s': statistics.median(samples),
+        'mean_s': statistics.fmean(samples),
+        'max_s': max(samples),
+    }
+
+
+# ===== GEO分析 =====
+def geo_cases(size: Dict) -> List[Case]:
+    params = {'rows': size['rows'], 'answer_chars': size['answer_chars']}
+    csv_text = synthetic.geo_csv_text(rows=size['rows'], answer_chars=size['answer_chars'])
+    df = pd.read_csv(io.StringIO(csv_text), header=None)
+    df.columns = synthetic.GEO_COLUMNS
+    dense = synthetic.geo_dataframe(rows=size['rows'], answer_chars=size['answer_chars'], brand_density=0.2, url_density=5)
+    english = synthetic.geo_dataframe(rows=size['rows'], answer_chars=size['answer_chars'], japanese=False)
+    variants = synthetic.geo_dataframe(rows=size['rows'], answer_chars=size['answer_chars'], brand_density=0.2, variants=True)
+    wide = synthetic.geo_dataframe(rows=size['rows'], answer_chars=size['answer_chars'], models=8)
+    brands = synthetic.DEFAULT_BRANDS
+    tmp_dir = tempfile.mkdtemp(prefix="geo_bench_")
+
+    def read_csv():
+        pd.read_csv(io.StringIO(csv_text), header=None)
+
+    def mention_count(frame):
+        def run():
+            for column in MODEL_COLUMNS:
+                for brand in brands:
+                    (frame[column].apply(lambda x: count_brand_mentions(x, brand)) > 0).mean()
+        return run
+
+    def normalize(frame):
+        return lambda: normalize_answers(frame, unify_kana=True)
+
+    def alias_scan(frame):
+        # 正規化済みの列に対して、全ブランド・全別名を1回の走査で数える
+        normalized = normalize_answers(frame, unify_kana=True)
+        matcher = BrandMatcher(brands, synthetic.BRAND_VARIANTS, unify_kana=True)
+
+        def run():
+            for series in normalized.values():
+                hits, first = matcher.scan(series)
+                (hits > 0).mean(axis=0)
+        return run
+
+    def analyze_all(frame, parallel):
+        def run():
+            if parallel:
+                with ProcessPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as executor:
+                    analyze(frame, brands[0], brands[1:], executor=executor)
+            else:
+                analyze(frame, brands[0], brands[1:])
+        return run
+
+    def url_domain(frame):
+        def run():
+            for column in MODEL_COLUMNS:
+                domains = Counter()
+                for text in frame[column]:
+                    domains.update(extract_domains(extract_urls(text)))
+        return run
+
+    mask = np.zeros(len(df), dtype=bool)
+    mask[::3] = True
+
+    def filtering():
+        filter_row_indices(df, "ヨガ", mask)
+
+    all_rows = np.arange(len(df))
+
+    def export(compress):
+        def run():
+            write_csv(os.path.join(tmp_dir, "export.csv"), df, all_rows, compress=compress)
+        return run
+
+    return [
+        Case('geo.read_csv', read_csv, params),
+        Case('geo.mention_count', mention_count(df), dict(params, brands=len(brands))),
+        Case('geo.mention_count.dense', mention_count(dense), dict(params, brands=len(brands), brand_density=0.2)),
+        Case('geo.mention_count.english', mention_count(english), dict(params, brands=len(brands), japanese=False)),
+        Case('geo.normalize', normalize(variants), params),
+        Case('geo.mention_count.aliases', alias_scan(variants), dict(params, brands=len(brands), brand_density=0.2)),
+        Case('geo.analyze.8models', analyze_all(wide, False), dict(params, models=8)),
+        Case('geo.analyze.8models.parallel', analyze_all(wide, True), dict(params, models=8, jobs=min(8, os.cpu_count() or 1))),
+        Case('geo.url_domain', url_domain(df), params),
+        Case('geo.url_domain.dense', url_domain(dense), dict(params, url_density=5)),
+        Case('geo.filter', filtering, params),
+        Case('geo.export_csv', export(False), params),
+        Case('geo.export_csv.gzip', export(True), params),
+    ]
+
+
+def check_brand_rates(size: Dict) -> List[str]:
+    """
+    計測の前に、1回の走査で数えた言及率がブランドごとの検索（count_brand_mentions）と一致するか確かめる
+    一部が重なる名前（「ab」と「bc」の「abc」）・他の名前に含まれる名前も確かめる。一致しないケースの説明を返す
+    """
+    frames = {
+        'synthetic': synthetic.geo_dataframe(rows=size['rows'], answer_chars=size['answer_chars'], brand_density=0.2),
+        'english': synthetic.geo_dataframe(rows=size['rows'], answer_chars=size['answer_chars'], japanese=False),
+    }
+    overlap = pd.DataFrame({'ID': [1, 2, 3], 'プロンプト': ['q'] * 3, 'GPT回答': ['abc', 'zen place', 'place bc']})
+    checks = [(name, frame, synthetic.DEFAULT_BRANDS) for name, frame in frames.items()]
+    checks += [('overlap', overlap, ['ab', 'bc']), ('nested', overlap, ['zen', 'zen place', 'place'])]
+
+    failures = []
+    for name, frame, brands in checks:
+        analysis = analyze(frame, brands[0], brands[1:])
+        for model, result in analysis['results'].items():
+            rates = dict(result['competitor_rates'], **{brands[0]: result['main_brand_rate']})
+            for brand in brands:
+                expected = (frame[f'{model}回答'].apply(lambda x: count_brand_mentions(x, brand)) > 0).mean() * 100
+                if abs(rates[brand] - expected) > 1e-9:
+                    failures.append(f"{name}/{model}/{brand}: {rates[brand]:.2f}% (期待値 {expected:.2f}%)")
+    return failures
+
+
+# ===== LPテンプレート =====
+def lp_cases(size: Dict) -> List[Case]:
+    kb = size['html_kb']
+    documents = {
+        'plain': synthetic.lp_html(size_kb=kb, depth=3),
+        'deep': synthetic.lp_html(size_kb=kb, depth=40),
+        'base64': synthetic.lp_html(size_kb=kb, base64_images=10),
+        'adversarial': synthetic.lp_html(size_kb=kb, adversarial=0.3),
+    }
+    records = synthetic.lp_template_records(count=size['templates'], size_kb=max(kb // 10, 5))
+    library_json = serialize_library(records, [])
+
+    def validate(html):
+        def run():
+            check_html_size(html)
+            check_base64_images(html)
+            validate_html_structure(html)
+        return run
+
+    def sanitize(html):
+        return lambda: sanitize_user_html(html)
+
+    cases = []
+    for variant, html in documents.items():
+        params = {'html_kb': round(len(html.encode('utf-8')) / 1024, 1), 'variant': variant}
+        cases.append(Case(f'lp.validate.{variant}', validate(html), params))
+        cases.append(Case(f'lp.sanitize.{variant}', sanitize(html), params))
+        cases.append(Case(f'lp.signature.{variant}', lambda html=html: template_signature({'html_sanitized': html}), params))
+
+    asset_store = AssetStore(tempfile.mkdtemp(prefix="lp_assets_"))
+    base64_params = {'html_kb': round(len(documents['base64'].encode('utf-8')) / 1024, 1), 'variant': 'base64'}
+    cases.append(Case('lp.assets.extract', lambda: extract_images(documents['base64'], asset_store), base64_params))
+
+    # 版管理: 少しずつ編集した版を SNAPSHOT_INTERVAL 版分保存し、最後の版（差分の適用が最多）を復元
+    plain = documents['plain']
+    revisions = [plain.replace('</body>', f'<section>追加{i}</section></body>', 1) for i in range(SNAPSHOT_INTERVAL)]
+    history = RevisionHistory.start(plain, None)
+    for text in revisions[1:]:
+        history.append(text, None)
+    plain_params = {'html_kb': round(len(plain.encode('utf-8')) / 1024, 1), 'revisions': len(history)}
+    cases.append(Case('lp.versions.append', lambda: RevisionHistory.start(plain, None).append(revisions[1], None), plain_params))
+    cases.append(Case('lp.versions.rebuild', lambda: history.text(len(history)), plain_params))
+
+    library_params = {'templates': len(records), 'json_kb': round(len(library_json) / 1024, 1)}
+    cases.append(Case('lp.export', lambda: serialize_library(records, []), library_params))
+    cases.append(Case('lp.import', lambda: parse_library(library_json), library_params))
+
+    index = DuplicateIndex.build(records)
+    signature = template_signature(records[0])
+    cases.append(Case('lp.dedupe.build', lambda: DuplicateIndex.build(records), library_params))
+    cases.append(Case('lp.dedupe.query', lambda: index.query(signature), library_params))
+    cases.append(Case('lp.dedupe.report', index.duplicate_groups, library_params))
+
+    similar_index = SimilarityIndex.build(records)
+    query = query_features(records[0]['name'], records[0]['category'], records[0]['industry'], records[0]['notes'])
+    similar_index.query(query)
+    cases.append(Case('lp.similar.build', lambda: SimilarityIndex.build(records), library_params))
+    cases.append(Case('lp.similar.query', lambda: similar_index.query(query), library_params))
+    return cases
+
+
+# ===== 結果の保存・比較 =====
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(current: List[Dict], baseline_path: Path) -> List[str]:
+    """前回結果との比較（中央値の比率）。劣化したケースの名前を返す"""
+    baseline = {r['name']: r for r in json.loads(baseline_path.read_text(encoding='utf-8'))['results']}
+    regressions = []
+    print(f"\n## 比較: {baseline_path.name}")
+    for result in current:
+        old = baseline.get(result['name'])
+        if not old:
+            continue
+        ratio = result['median_s'] / old['median_s'] if old['median_s'] else float('inf')
+        flag = "⚠️ 劣化" if ratio > REGRESSION_RATIO else ""
+        if flag:
+            regressions.append(result['name'])
+        print(f"  {result['name']:<32} {old['median_s'] * 1000:9.2f} ms → {result['median_s'] * 1000:9.2f} ms  x{ratio:5.2f} {flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GEO分析・LPテンプレート処理のベンチマーク")
+    parser.add_argument('--size', choices=list(SIZES), default='medium', help="データ量")
+    parser.add_argument('--repeat', type=int, default=5, help="計測回数")
+    parser.add_argument('-k', '--filter', default="", help="ケース名に含まれる文字列で絞り込み")
+    parser.add_argument('--output', type=Path, help="結果JSONの保存先（省略時は benchmarks/results/bench_<日時>.json）")
+    parser.add_argument('--compare', type=Path, help="比較する前回の結果JSON")
+    parser.add_argument('--no-save', action='store_true', help="結果をファイルに保存しない")
+    args = parser.parse_args(argv)
+
+    size = SIZES[args.size]
+    cases = [c for c in geo_cases(size) + lp_cases(size) if args.filter in c.name]
+
+    if any(c.name.startswith('geo.') for c in cases):
+        failures = check_brand_rates(size)
+        if failures:
+            print("❌ ブランド言及率が1ブランドずつの検索と一致しません:")
+            for failure in failures:
+                print(f"  {failure}")
+            sys.exit(1)
+
+    print(f"# ベンチマーク (size={args.size}, repeat={args.repeat})")
+    results = []
+    for case in cases:
+        result = time_case(case, args.repeat)
+        results.append(result)
+        print(f"  {case.name:<32} median {result['median_s'] * 1000:9.2f} ms  min {result['min_s'] * 1000:9.2f} ms")
+
+    report = {
+        'meta': {
+            'measured_at': datetime.now().isoformat(),
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'size': args.size,
+            'size_params': size,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+
+    if not args.no_save:
+        output = args.output or RESULTS_DIR / f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"\n💾 {output} に保存しました")
+
+    if args.compare:
+        regressions = compare(results, args.compare)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+回答収集（geo_collect.py）のスループット計測と動作確認
+
+同じプロセス内でスタブLLMサーバー（stub_llm_server.py）を起動し、同時リクエスト数を変えながら
+プロンプト一覧 → CSV までを通しで実行する。各回の出力は geo_analysis.read_geo_csv で読み込めるか確認し、
+途中で中断して再実行した場合に、行の重複・欠けなく再開できるかも確認する
+再試行の待ち時間は、スタブの応答時間に合わせて短くしている
+
+使い方:
+    python benchmarks/collect_throughput.py
+    python benchmarks/collect_throughput.py --prompts 500 --latency 0.2 --concurrency 1 8 32 128
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from geo_analysis import analyze, detect_models, read_geo_csv  # noqa: E402
+from geo_collect import Endpoint, collect  # noqa: E402
+from stub_llm_server import create_app, start_server  # noqa: E402
+
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+MODELS = ['GPT', 'Gemini', 'Perplexity']
+
+
+def make_endpoints(url: str, concurrency: int):
+    return [Endpoint({'name': model, 'url': url, 'model': model.lower()}, concurrency) for model in MODELS]
+
+
+def check_output(path: Path, n_prompts: int):
+    """出力CSVがそのまま分析できること・全IDが1回ずつ含まれることを確認"""
+    df = read_geo_csv(str(path))
+    assert detect_models(df) == MODELS, detect_models(df)
+    assert len(df) == n_prompts and df['ID'].nunique() == n_prompts, (len(df), df['ID'].nunique())
+    analyze(df, 'LAVA', ['zen place', 'CALDO'])
+
+
+async def run(args) -> dict:
+    app = create_app(latency=args.latency, error_rate=args.error_rate)
+    runner = await start_server(app)
+    host, port = runner.addresses[0][:2]
+    url = f"http://{host}:{port}/v1/chat/completions"
+    prompts = [(str(i), f"質問{i}: おすすめのホットヨガスタジオは？") for i in range(1, args.prompts + 1)]
+    results = []
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="geo_collect_") as tmp:
+            print(f"# 回答収集 (prompts={args.prompts}, models={len(MODELS)}, latency={args.latency}s, error_rate={args.error_rate})")
+            for concurrency in args.concurrency:
+                output = Path(tmp) / f"answers_c{concurrency}.csv"
+                stats = await collect(prompts, make_endpoints(url, concurrency), output, concurrency=concurrency,
+                                      progress=False, backoff_base=args.latency)
+                check_output(output, args.prompts)
+                rows_per_s = stats['written'] / stats['elapsed_s']
+                results.append({
+                    'concurrency': concurrency,
+                    'elapsed_s': stats['elapsed_s'],
+                    'rows_per_s': round(rows_per_s, 2),
+                    'requests': stats['requests'],
+                    'retries': stats['retries'],
+                })
+                print(f"  concurrency {concurrency:>4}: {stats['elapsed_s']:7.2f}s  {rows_per_s:8.1f}行/s  "
+                      f"リクエスト {stats['requests']} 再試行 {stats['retries']}")
+
+            # 中断 → 再開
+            output = Path(tmp) / "answers_resume.csv"
+            concurrency = max(args.concurrency)
+            endpoints = make_endpoints(url, concurrency)
+            try:
+                await asyncio.wait_for(
+                    collect(prompts, endpoints, output, concurrency=concurrency, progress=False, backoff_base=args.latency),
+                    timeout=results[-1]['elapsed_s'] / 2
+                )
+            except asyncio.TimeoutError:
+                pass
+            stats = await collect(prompts, endpoints, output, concurrency=concurrency,
+                                  progress=False, backoff_base=args.latency)
+            check_output(output, args.prompts)
+            print(f"  再開: 書き出し済み {stats['skipped']}行をスキップし、残り {stats['written']}行を収集 ✅")
+    finally:
+        await runner.cleanup()
+
+    return {
+        'meta': {
+            'measured_at': datetime.now().isoformat(),
+            'prompts': args.prompts,
+            'models': len(MODELS),
+            'latency_s': args.latency,
+            'error_rate': args.error_rate,
+        },
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="geo_collect.py のスループット計測")
+    parser.add_argument('--prompts', type=int, default=200, help="プロンプト数")
+    parser.add_argument('--latency', type=float, default=0.05, help="スタブサーバーの平均応答時間（秒）")
+    parser.add_argument('--error-rate', type=float, default=0.05, help="スタブサーバーが429/500を返す確率")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64], help="同時リクエスト数")
+    parser.add_argument('--no-save', action='store_true', help="結果をファイルに保存しない")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+
+    if not args.no_save:
+        output = RESULTS_DIR / f"collect_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"\n💾 {output} に保存しました")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+同時セッションの負荷試験（GEO分析ダッシュボード・LP Template Manager）
+
+1つのプロセス内で Streamlit の AppTest をセッション数ぶんのスレッドから同時に動かし、
+実際の利用に近い操作を行ったときの操作ごとのレイテンシ（p50 / p95 / 最大）とピークRSSを計測する
+（Streamlit サーバーと同じく、キャッシュ・GILは全セッションで共有される）
+
+- GEO: 画面を開く → CSVアップロード（読み込み処理） → 分析実行 → 詳細データのページ送り → CSVエクスポート
+- LP: 画面を開く → ライブラリ読み込み（索引の作成を含む） → Step 1入力 → HTML検証 → 一覧のプレビュー → エクスポート
+
+AppTest はファイルのアップロードを操作できないため、CSVアップロードはアップロード時と同じ
+read_geo_csv の呼び出しをセッションのスレッド内で直接実行して計測する。画面側はサンプルデータ
+（GEO_SAMPLE_PATH に合成CSVを指定）で動かす。分析履歴・CSVエクスポート・画像アセットは一時ディレクトリに保存する
+
+使い方:
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --sessions 1 4 8 16 --rows 2000 --templates 50
+    python benchmarks/load_test.py --rounds 5 --compare benchmarks/results/load_<日時>.json
+
+1回あたりのサンプル数が少ないと p95 がばらつくので、比較するときは --rounds を増やす
+（最初に計測するセッション数の結果には、モジュールの読み込み・キャッシュの作成が含まれる）
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+from unittest.mock import MagicMock
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+# アプリが読み込む前に、データの保存先を一時ディレクトリにする
+_TMP = tempfile.mkdtemp(prefix="load_test_")
+os.environ['GEO_STORE_PATH'] = os.path.join(_TMP, "geo_history.sqlite")
+os.environ['LP_ASSET_DIR'] = os.path.join(_TMP, "lp_assets")
+os.environ['GEO_SAMPLE_PATH'] = os.path.join(_TMP, "geo_sample.csv")
+os.environ['GEO_EXPORT_DIR'] = os.path.join(_TMP, "geo_exports")
+
+import numpy as np  # noqa: E402
+from streamlit import source_util  # noqa: E402
+from streamlit.runtime import Runtime  # noqa: E402
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager  # noqa: E402
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage  # noqa: E402
+from streamlit.runtime.media_file_manager import MediaFileManager  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import synthetic  # noqa: E402
+from bench_suite import REGRESSION_RATIO, _git_revision  # noqa: E402
+from geo_analysis import read_geo_csv  # noqa: E402
+from lp_records import to_records  # noqa: E402
+
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+GEO_SCRIPT = ROOT / "app.py"
+LP_SCRIPT = ROOT / "pages" / "1_🎨_LP_Template_Manager.py"
+MODEL_NAMES = ['GPT', 'Gemini', 'Perplexity']
+
+
+class Recorder:
+    """操作ごとのレイテンシ・エラーを複数スレッドから記録する"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def step(self, action: str, run: Callable[[], object]) -> bool:
+        started = time.perf_counter()
+        try:
+            run()
+            error = None
+        except Exception as e:  # 1操作の失敗でセッション全体を止めない
+            error = f"{type(e).__name__}: {e}"
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            if error is None:
+                self.samples.setdefault(action, []).append(elapsed)
+            else:
+                self.errors.setdefault(action, []).append(error)
+        return error is None
+
+    def summary(self) -> List[Dict]:
+        actions = sorted(set(self.samples) | set(self.errors))
+        rows = []
+        for action in actions:
+            samples = np.array(self.samples.get(action, []))
+            rows.append({
+                'action': action,
+                'count': int(len(samples)),
+                'errors': len(self.errors.get(action, [])),
+                'p50_s': float(np.percentile(samples, 50)) if len(samples) else None,
+                'p95_s': float(np.percentile(samples, 95)) if len(samples) else None,
+                'max_s': float(samples.max()) if len(samples) else None,
+                'first_error': (self.errors.get(action) or [None])[0],
+            })
+        return rows
+
+
+class RssSampler:
+    """実行中のRSSを一定間隔で読み取り、最大値を記録する（Linuxの /proc/self/statm）"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def current_rss() -> int:
+    """現在のRSS（バイト）。/proc がない環境では ru_maxrss（これまでの最大値）で代用"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@contextmanager
+def shared_runtime():
+    """
+    全セッションで1つの Runtime を使う（Streamlit サーバーと同じく、キャッシュの保存先を共有する）
+    あわせて、AppTest を複数スレッドから動かすときに共有されてしまうグローバルな状態を固定する
+    AppTest は実行のたびに Runtime を作り直して最後に消すため、同時に動かすと他のセッションの実行中に
+    Runtime がなくなる。実行中は Runtime.instance() / exists() が常に共有の Runtime を返すようにする
+    """
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    saved = Runtime.__dict__['instance'], Runtime.__dict__['exists']
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+
+    # ページ一覧のキャッシュはメインスクリプトを区別しない1つだけなので、2つのアプリを同時に動かすと
+    # 別のアプリのページを実行してしまう。メインスクリプトごとのページ一覧を先に作って返すようにする
+    original_get_pages = source_util.get_pages
+    pages_by_script = {}
+    for script in (GEO_SCRIPT, LP_SCRIPT):
+        with source_util._pages_cache_lock:
+            source_util._cached_pages = None
+        pages_by_script[str(script)] = original_get_pages(str(script))
+    source_util.get_pages = lambda main_script_path: pages_by_script.get(str(main_script_path)) or original_get_pages(main_script_path)
+    # アップロードの読み込みはスクリプトの外（セッションのスレッド）で実行するため、ScriptRunContext がない旨の警告を抑える
+    logging.getLogger('streamlit.runtime.scriptrunner.script_run_context').setLevel(logging.ERROR)
+    try:
+        yield runtime
+    finally:
+        Runtime.instance, Runtime.exists = saved
+        source_util.get_pages = original_get_pages
+
+
+def run_app(at: AppTest):
+    """format_func 付きの radio / selectbox を初期位置で選び直してから再実行し、アプリの例外はエラーにする
+    （Streamlit 1.31 の AppTest はこれらを含む画面を同一セッションで再実行できないため）"""
+    for widget in list(at.radio) + list(at.selectbox):
+        if str(widget.value) not in widget.options:
+            widget.set_value(widget.options[widget.proto.default])
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+
+
+def click(at: AppTest, label: str):
+    button = next((b for b in at.button if b.label == label), None)
+    if button is None:
+        # ボタンが表示されていない場合は、画面のエラー・警告をエラーの内容に含める
+        messages = [e.value for e in list(at.error) + list(at.warning)]
+        raise LookupError(f"ボタン「{label}」がありません: {messages}")
+    button.click()
+    run_app(at)
+
+
+# ===== シナリオ =====
+def geo_session(recorder: Recorder, args, csv_bytes: bytes):
+    at = AppTest.from_file(str(GEO_SCRIPT), default_timeout=args.timeout)
+    if not recorder.step('geo.open', lambda: run_app(at)):
+        return
+
+    def upload():
+        uploaded = io.BytesIO(csv_bytes)
+        uploaded.name = "upload.csv"
+        read_geo_csv(uploaded, MODEL_NAMES, {})
+
+    recorder.step('geo.upload', upload)
+    if not recorder.step('geo.analyze', lambda: click(at, "🔍 分析実行")):
+        return
+    for _ in range(args.pages):
+        recorder.step('geo.browse', lambda: click(at, "次へ ▶"))
+    recorder.step('geo.export', lambda: click(at, "📄 CSVを作成"))
+
+
+def lp_session(recorder: Recorder, args, library: List[Dict], html: str):
+    at = AppTest.from_file(str(LP_SCRIPT), default_timeout=args.timeout)
+    if not recorder.step('lp.open', lambda: run_app(at)):
+        return
+
+    def load_library():
+        at.session_state['templates'] = to_records(dict(t) for t in library)
+        run_app(at)
+
+    def fill_step1():
+        next(t for t in at.text_input if t.label == "テンプレート名").input("負荷試験LP")
+        click(at, "✅ Step 2へ進む")
+
+    def validate():
+        next(t for t in at.text_area if t.label == "HTML+CSSコード").input(html)
+        click(at, "✅ HTMLを検証してStep 3へ")
+
+    def preview():
+        template_id = library[len(library) // 2]['id']
+        at.button(key=f"preview_{template_id}").click()
+        run_app(at)
+
+    recorder.step('lp.library', load_library)
+    recorder.step('lp.step1', fill_step1)
+    recorder.step('lp.validate', validate)
+    recorder.step('lp.browse', preview)
+    recorder.step('lp.export', lambda: click(at, "📤 全データをエクスポート"))
+
+
+def run_level(sessions: int, args, csv_bytes: bytes, library: List[Dict], html: str) -> Dict:
+    """sessions 個のセッションを同時に動かす（各セッションは rounds 回シナリオを繰り返す）"""
+    recorder = Recorder()
+
+    def user(index: int):
+        for _ in range(args.rounds):
+            if args.app == 'geo' or (args.app == 'both' and index % 2 == 0):
+                geo_session(recorder, args, csv_bytes)
+            else:
+                lp_session(recorder, args, library, html)
+
+    started = time.perf_counter()
+    with RssSampler() as rss, ThreadPoolExecutor(max_workers=sessions) as pool:
+        list(pool.map(user, range(sessions)))
+    return {
+        'sessions': sessions,
+        'elapsed_s': round(time.perf_counter() - started, 3),
+        'peak_rss_mb': round(rss.peak / 1024 ** 2, 1),
+        'actions': recorder.summary(),
+    }
+
+
+def print_level(level: Dict):
+    print(f"\n## 同時 {level['sessions']} セッション（{level['elapsed_s']:.1f}s・ピークRSS {level['peak_rss_mb']} MB）")
+    for row in level['actions']:
+        if row['count']:
+            print(f"  {row['action']:<14} n={row['count']:<4} p50 {row['p50_s'] * 1000:9.1f} ms  "
+                  f"p95 {row['p95_s'] * 1000:9.1f} ms  max {row['max_s'] * 1000:9.1f} ms"
+                  + (f"  ❌ エラー {row['errors']}" if row['errors'] else ""))
+        else:
+            print(f"  {row['action']:<14} ❌ エラー {row['errors']}: {row['first_error']}")
+
+
+def compare(levels: List[Dict], baseline_path: Path) -> List[str]:
+    """前回結果との比較（同じセッション数・操作の p95 の比率）。劣化した項目を返す"""
+    baseline = {
+        (level['sessions'], row['action']): row
+        for level in json.loads(baseline_path.read_text(encoding='utf-8'))['levels']
+        for row in level['actions']
+    }
+    regressions = []
+    print(f"\n## 比較: {baseline_path.name}")
+    for level in levels:
+        for row in level['actions']:
+            old = baseline.get((level['sessions'], row['action']))
+            if not old or not old['p95_s'] or not row['p95_s']:
+                continue
+            ratio = row['p95_s'] / old['p95_s']
+            flag = "⚠️ 劣化" if ratio > REGRESSION_RATIO else ""
+            if flag:
+                regressions.append(f"{level['sessions']}:{row['action']}")
+            print(f"  {level['sessions']:>3} {row['action']:<14} p95 {old['p95_s'] * 1000:9.1f} ms → "
+                  f"{row['p95_s'] * 1000:9.1f} ms  x{ratio:5.2f} {flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GEO分析ダッシュボード・LP Template Manager の同時セッション負荷試験")
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 4, 8], help="同時セッション数（複数指定で順に計測）")
+    parser.add_argument('--app', choices=['both', 'geo', 'lp'], default='both', help="対象アプリ（both はセッションを交互に割り当て）")
+    parser.add_argument('--rounds', type=int, default=1, help="1セッションあたりのシナリオの繰り返し回数")
+    parser.add_argument('--rows', type=int, default=1000, help="GEO: CSVの行数")
+    parser.add_argument('--pages', type=int, default=2, help="GEO: 詳細データのページ送り回数")
+    parser.add_argument('--templates', type=int, default=30, help="LP: ライブラリのテンプレート数")
+    parser.add_argument('--html-kb', type=int, default=50, help="LP: テンプレート1件のHTMLサイズ（KB）")
+    parser.add_argument('--timeout', type=float, default=300, help="1回の実行のタイムアウト（秒）")
+    parser.add_argument('--output', type=Path, help="結果JSONの保存先（省略時は benchmarks/results/load_<日時>.json）")
+    parser.add_argument('--compare', type=Path, help="比較する前回の結果JSON")
+    parser.add_argument('--no-save', action='store_true', help="結果をファイルに保存しない")
+    args = parser.parse_args(argv)
+
+    csv_text = synthetic.geo_csv_text(rows=args.rows, variants=True)
+    Path(os.environ['GEO_SAMPLE_PATH']).write_text(csv_text, encoding='utf-8')
+    csv_bytes = csv_text.encode('utf-8')
+    library = synthetic.lp_template_records(count=args.templates, size_kb=args.html_kb)
+    for template in library:
+        # 一覧のメモ欄はテンプレートの expander 内の expander になり AppTest で描画できないため、メモなしにする
+        template['notes'] = ''
+    html = synthetic.lp_html(size_kb=args.html_kb, base64_images=2, seed=99)
+
+    baseline_rss = current_rss()
+    print(f"# 同時セッション負荷試験 (app={args.app}, rows={args.rows}, templates={args.templates}, "
+          f"html={args.html_kb}KB, rounds={args.rounds}, CPU={os.cpu_count()})")
+    print(f"  開始時のRSS {baseline_rss / 1024 ** 2:.1f} MB")
+
+    levels = []
+    with shared_runtime():
+        for sessions in args.sessions:
+            level = run_level(sessions, args, csv_bytes, library, html)
+            levels.append(level)
+            print_level(level)
+
+    report = {
+        'meta': {
+            'measured_at': datetime.now().isoformat(),
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'app': args.app,
+            'rows': args.rows,
+            'pages': args.pages,
+            'templates': args.templates,
+            'html_kb': args.html_kb,
+            'rounds': args.rounds,
+            'baseline_rss_mb': round(baseline_rss / 1024 ** 2, 1),
+        },
+        'levels': levels,
+    }
+
+    if not args.no_save:
+        output = args.output or RESULTS_DIR / f"load_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"\n💾 {output} に保存しました")
+
+    if args.compare:
+        regressions = compare(levels, args.compare)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+起動時間・再実行レイテンシの計測レポート
+
+各計測は新しいPythonプロセスで行い、コールドスタートの値を取る
+- import時間: 主要ライブラリ（streamlit / pandas / plotly など）の単体import時間
+- 初回描画: AppTest でスクリプトを初めて実行し終えるまでの時間
+- 再実行: import・キャッシュが温まったプロセスでスクリプトを再実行したときのレイテンシ（中央値・最大）
+- 初回描画までにアプリが追加で読み込んだ重いライブラリ（遅延importの確認用）
+
+使い方:
+    python benchmarks/startup_report.py
+    python benchmarks/startup_report.py --reruns 10 --output benchmarks/results/startup_history.jsonl
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_OUTPUT = ROOT / "benchmarks" / "results" / "startup_history.jsonl"
+
+IMPORT_TARGETS = ['streamlit', 'pandas', 'numpy', 'plotly.express', 'plotly.graph_objects']
+APP_SCRIPTS = ['app.py', 'lp_builder_bu.py']
+# streamlit 本体が読み込むもの（pandas / numpy / plotly.graph_objects）は除外して判定する
+HEAVY_MODULES = ['plotly.express', 'plotly.subplots', 'plotly.graph_objs', 'scipy', 'pandas', 'numpy']
+
+_IMPORT_CHILD = """
+import sys, time
+t = time.perf_counter()
+import {module}
+print(time.perf_counter() - t)
+"""
+
+_APP_CHILD = """
+import json, sys, time
+t = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+import_s = time.perf_counter() - t
+
+at = AppTest.from_file({script!r}, default_timeout=120)
+preloaded = set(sys.modules)
+t = time.perf_counter()
+at.run()
+first_paint_s = time.perf_counter() - t
+loaded = [m for m in {heavy!r} if m in sys.modules and m not in preloaded]
+
+# 再実行はウォームなプロセス上で新しいセッションとして実行する
+# （Streamlit 1.31 の AppTest は format_func 付きradioを含む画面を同一セッションで再実行できないため）
+reruns = []
+for _ in range({reruns}):
+    t = time.perf_counter()
+    AppTest.from_file({script!r}, default_timeout=120).run()
+    reruns.append(time.perf_counter() - t)
+
+print(json.dumps({{
+    'streamlit_import_s': import_s,
+    'first_paint_s': first_paint_s,
+    'rerun_s': reruns,
+    'heavy_modules_loaded_by_app': loaded,
+    'exceptions': [str(e.value) for e in at.exception],
+}}))
+"""
+
+
+def _run_child(code: str) -> str:
+    """新しいPythonプロセスでコードを実行し、標準出力の最終行を返す"""
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return result.stdout.strip().splitlines()[-1]
+
+
+def measure_imports(modules: List[str]) -> Dict[str, float]:
+    """ライブラリごとのコールドimport時間（秒）"""
+    return {m: round(float(_run_child(_IMPORT_CHILD.format(module=m))), 4) for m in modules}
+
+
+def measure_app(script: str, reruns: int) -> Dict:
+    """アプリの初回描画時間と再実行レイテンシ（秒）"""
+    raw = json.loads(_run_child(_APP_CHILD.format(script=script, heavy=HEAVY_MODULES, reruns=reruns)))
+    rerun_s = raw.pop('rerun_s')
+    raw['rerun_median_s'] = round(statistics.median(rerun_s), 4) if rerun_s else None
+    raw['rerun_max_s'] = round(max(rerun_s), 4) if rerun_s else None
+    raw['first_paint_s'] = round(raw['first_paint_s'], 4)
+    raw['streamlit_import_s'] = round(raw['streamlit_import_s'], 4)
+    return raw
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def build_report(reruns: int) -> Dict:
+    started = time.perf_counter()
+    report = {
+        'measured_at': datetime.now().isoformat(),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'imports_s': measure_imports(IMPORT_TARGETS),
+        'apps': {script: measure_app(script, reruns) for script in APP_SCRIPTS},
+    }
+    report['elapsed_s'] = round(time.perf_counter() - started, 2)
+    return report
+
+
+def print_report(report: Dict):
+    print(f"# 起動時間レポート ({report['measured_at']}, rev {report['revision'] or '-'})")
+    print("\n## import時間（コールド）")
+    for module, seconds in report['imports_s'].items():
+        print(f"  {module:<24} {seconds * 1000:8.1f} ms")
+    print("\n## アプリ")
+    for script, m in report['apps'].items():
+        print(f"  {script}")
+        print(f"    初回描画          {m['first_paint_s'] * 1000:8.1f} ms")
+        if m['rerun_median_s'] is not None:
+            print(f"    再実行 (中央値)   {m['rerun_median_s'] * 1000:8.1f} ms")
+            print(f"    再実行 (最大)     {m['rerun_max_s'] * 1000:8.1f} ms")
+        print(f"    初回描画でアプリが読み込んだ重いライブラリ: {', '.join(m['heavy_modules_loaded_by_app']) or 'なし'}")
+        if m['exceptions']:
+            print(f"    ⚠️ 例外: {m['exceptions']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="起動時間・再実行レイテンシの計測")
+    parser.add_argument('--reruns', type=int, default=5, help="再実行の計測回数")
+    parser.add_argument('--output', type=Path, default=DEFAULT_OUTPUT, help="結果を追記するJSONLファイル")
+    parser.add_argument('--no-save', action='store_true', help="結果をファイルに保存しない")
+    args = parser.parse_args(argv)
+
+    report = build_report(args.reruns)
+    print_report(report)
+
+    if not args.no_save:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(report, ensure_ascii=False) + "\n")
+        print(f"\n💾 {args.output} に追記しました")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+回答収集（geo_collect.py）の動作確認・計測用のスタブLLMサーバー
+OpenAI互換の /v1/chat/completions を模し、合成データ（synthetic.py）の回答テキストを返す
+
+使い方:
+    python benchmarks/stub_llm_server.py --port 8765 --latency 0.2 --error-rate 0.1
+    （エンドポイント設定の url を http://127.0.0.1:8765/v1/chat/completions にして geo_collect.py を実行）
+"""
+
+import argparse
+import asyncio
+import hashlib
+import random
+import sys
+from pathlib import Path
+
+from aiohttp import web
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import synthetic  # noqa: E402
+
+
+def create_app(latency: float = 0.1, error_rate: float = 0.0, answer_chars: int = 400, seed: int = 0) -> web.Application:
+    """
+    latency: 応答までの平均秒数（±50%のばらつき）
+    error_rate: 429（Retry-After付き）または500を返す確率
+    """
+    rng = random.Random(seed)
+    app = web.Application()
+    app['stats'] = {'requests': 0, 'errors': 0}
+
+    async def chat_completions(request: web.Request) -> web.Response:
+        body = await request.json()
+        app['stats']['requests'] += 1
+        await asyncio.sleep(latency * rng.uniform(0.5, 1.5))
+
+        if rng.random() < error_rate:
+            app['stats']['errors'] += 1
+            if rng.random() < 0.5:
+                return web.json_response({'error': 'rate limited'}, status=429, headers={'Retry-After': '0.05'})
+            return web.json_response({'error': 'internal error'}, status=500)
+
+        # 同じプロンプト・モデルには同じ回答を返す（再現性のため）
+        prompt = body['messages'][-1]['content']
+        key = f"{body.get('model', '')}:{prompt}".encode('utf-8')
+        answer_rng = random.Random(int(hashlib.sha1(key).hexdigest()[:8], 16))
+        answer = synthetic._answer_text(
+            answer_rng, answer_chars, synthetic.DEFAULT_BRANDS,
+            brand_density=0.05, url_density=1.0, japanese=True, variants=False
+        )
+        return web.json_response({
+            'object': 'chat.completion',
+            'model': body.get('model', ''),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': answer}, 'finish_reason': 'stop'}],
+        })
+
+    app.router.add_post('/v1/chat/completions', chat_completions)
+    return app
+
+
+async def start_server(app: web.Application, host: str = '127.0.0.1', port: int = 0) -> web.AppRunner:
+    """同じイベントループ内でサーバーを起動（port=0 なら空きポート。runner.addresses で確認）"""
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="geo_collect.py 確認用のスタブLLMサーバー")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.1, help="平均応答時間（秒）")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="429/500を返す確率")
+    parser.add_argument('--answer-chars', type=int, default=400, help="回答の長さ（文字数）")
+    args = parser.parse_args(argv)
+
+    app = create_app(args.latency, args.error_rate, args.answer_chars)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+ベンチマーク用の合成データ生成（シード固定で再現可能）
+- GEO分析用CSV: 行数・回答の長さ・ブランド密度・URL密度・日本語/英語を指定
+- LP用HTML: サイズ・入れ子の深さ・base64画像・サニタイズ対象の悪意あるパターンを指定
+"""
+
+import base64
+import csv
+import io
+import random
+from typing import List, Optional
+
+import pandas as pd
+
+GEO_COLUMNS = ['ID', 'プロンプト', 'GPT回答', 'Gemini回答', 'Perplexity回答']
+DEFAULT_BRANDS = ['LAVA', 'zen place', 'CALDO', 'loIve']
+
+# 表記ゆれを含むブランド表記（正規化・別名処理の計測用）
+BRAND_VARIANTS = {
+    'LAVA': ['LAVA', 'lava', 'ＬＡＶＡ', 'ラバ'],
+    'zen place': ['zen place', 'Zen Place', 'ゼンプレイス'],
+    'CALDO': ['CALDO', 'caldo', 'カルド'],
+    'loIve': ['loIve', 'LOIVE', 'ロイブ'],
+}
+
+JA_WORDS = [
+    'ホットヨガ', 'スタジオ', 'おすすめ', '初心者', '料金', '体験レッスン', '駅近', '女性専用',
+    '口コミ', '評判', 'プラン', '月額', 'インストラクター', 'ダイエット', '効果', '比較',
+    'です。', 'ます。', 'ですが、', 'また、', 'そのため', '人気の', '充実した', '清潔な'
+]
+EN_WORDS = [
+    'hot', 'yoga', 'studio', 'recommended', 'beginner', 'price', 'trial', 'lesson', 'station',
+    'reviews', 'plan', 'monthly', 'instructor', 'effect', 'compare', 'popular', 'clean', 'the', 'and'
+]
+URL_HOSTS = [
+    'www.hotpepper.jp', 'lava.co.jp', 'zen-place.com', 'caldo.co.jp', 'ameblo.jp', 'note.com',
+    'www.youtube.com', 'ja.wikipedia.org', 'prtimes.jp', 'www.instagram.com'
+]
+
+
+def _answer_text(
+    rng: random.Random,
+    answer_chars: int,
+    brands: List[str],
+    brand_density: float,
+    url_density: float,
+    japanese: bool,
+    variants: bool
+) -> str:
+    """
+    回答テキストを1件生成
+    brand_density: 単語あたりのブランド出現確率 / url_density: 回答あたりの平均URL数
+    """
+    words = JA_WORDS if japanese else EN_WORDS
+    sep = '' if japanese else ' '
+    parts = []
+    length = 0
+    while length < answer_chars:
+        if rng.random() < brand_density:
+            brand = rng.choice(brands)
+            word = rng.choice(BRAND_VARIANTS.get(brand, [brand])) if variants else brand
+        else:
+            word = rng.choice(words)
+        parts.append(word)
+        length += len(word) + len(sep)
+
+    # URLは回答内のランダムな位置に差し込む（平均 url_density 個）
+    n_urls = int(url_density) + (1 if rng.random() < url_density - int(url_density) else 0)
+    for _ in range(n_urls):
+        url = f"https://{rng.choice(URL_HOSTS)}/{rng.randrange(10 ** 6)}"
+        parts.insert(rng.randrange(len(parts) + 1), f" {url} ")
+    return sep.join(parts)
+
+
+def geo_rows(
+    rows: int = 1000,
+    answer_chars: int = 400,
+    brand_density: float = 0.05,
+    url_density: float = 1.0,
+    japanese: bool = True,
+    brands: Optional[List[str]] = None,
+    variants: bool = False,
+    models: int = 3,
+    seed: int = 0
+) -> List[List]:
+    """GEO分析用CSVの行（ヘッダーなし: ID, プロンプト, 回答×models）"""
+    rng = random.Random(seed)
+    brands = brands or DEFAULT_BRANDS
+    data = []
+    for i in range(rows):
+        prompt = f"質問{i + 1}: {rng.choice(JA_WORDS)}の{rng.choice(JA_WORDS)}は？" if japanese else f"Q{i + 1}: {rng.choice(EN_WORDS)}?"
+        answers = [
+            _answer_text(rng, answer_chars, brands, brand_density, url_density, japanese, variants)
+            for _ in range(models)
+        ]
+        data.append([i + 1, prompt] + answers)
+    return data
+
+
+def geo_csv_text(**kwargs) -> str:
+    """GEO分析用CSV（アップロードされるファイルと同じヘッダーなし形式）"""
+    buf = io.StringIO()
+    csv.writer(buf).writerows(geo_rows(**kwargs))
+    return buf.getvalue()
+
+
+def geo_dataframe(**kwargs) -> pd.DataFrame:
+    """GEO分析用DataFrame（read_geo_csv が付けるのと同じ列名。4列目以降の回答列は「モデル4回答」のような連番）"""
+    data = geo_rows(**kwargs)
+    n_cols = len(data[0]) if data else len(GEO_COLUMNS)
+    columns = GEO_COLUMNS + [f'モデル{i - 1}回答' for i in range(len(GEO_COLUMNS), n_cols)]
+    return pd.DataFrame(data, columns=columns[:n_cols])
+
+
+# ===== LP HTML =====
+ADVERSARIAL_SNIPPETS = [
+    '<script>alert(1)</script>',
+    '<SCRIPT type="text/javascript">document.cookie</SCRIPT>',
+    '<img src="x.png" onerror="alert(1)">',
+    "<div onclick='steal()' onmouseover=\"x()\">hover</div>",
+    '<a href="javascript:alert(1)">link</a>',
+    "<a HREF = 'JavaScript:void(0)'>link</a>",
+    '<script src="https://evil.example/x.js">',  # 閉じタグなし（正規表現の走査コストが増える）
+    '<div ' + ' '.join(f'data-a{i}="{i}"' for i in range(50)) + '>many attrs</div>',
+]
+
+
+def _base64_image(rng: random.Random, size_bytes: int) -> str:
+    payload = base64.b64encode(bytes(rng.getrandbits(8) for _ in range(size_bytes))).decode('ascii')
+    return f'<img src="data:image/png;base64,{payload}" alt="embedded">'
+
+
+def lp_html(
+    size_kb: int = 50,
+    depth: int = 5,
+    base64_images: int = 0,
+    base64_image_kb: int = 20,
+    adversarial: float = 0.0,
+    seed: int = 0
+) -> str:
+    """
+    ChatGPT生成LPを模したHTML
+    - depth: セクション内の div の入れ子の深さ
+    - adversarial: ブロックあたりに悪意あるパターンを混ぜる確率
+    """
+    rng = random.Random(seed)
+    head = (
+        '<!DOCTYPE html>\n<html lang="ja">\n<head>\n<meta charset="UTF-8">\n'
+        '<script src="https://cdn.tailwindcss.com"></script>\n'
+        '<style>body{font-family:sans-serif}.hero{padding:4rem}</style>\n</head>\n<body>\n'
+    )
+    tail = '</body>\n</html>\n'
+    target = size_kb * 1024
+    blocks = []
+    length = len(head) + len(tail)
+
+    for _ in range(base64_images):
+        image = _base64_image(rng, base64_image_kb * 1024 * 3 // 4)
+        blocks.append(f'<section class="hero">{image}</section>\n')
+        length += len(blocks[-1])
+
+    while length < target:
+        text = ''.join(rng.choice(JA_WORDS) for _ in range(rng.randint(10, 40)))
+        inner = f'<p class="text-lg text-gray-700">{text}</p><a href="https://example.com/{rng.randrange(1000)}" class="btn">詳しく見る</a>'
+        if rng.random() < adversarial:
+            inner += rng.choice(ADVERSARIAL_SNIPPETS)
+        for level in range(depth):
+            inner = f'<div class="level-{level} flex p-4">{inner}</div>'
+        block = f'<section class="py-16">{inner}</section>\n'
+        blocks.append(block)
+        length += len(block.encode('utf-8'))
+
+    return head + ''.join(blocks) + tail
+
+
+def lp_template_records(count: int = 100, size_kb: int = 30, seed: int = 0) -> List[dict]:
+    """st.session_state.templates と同じ形のテンプレート辞書"""
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        html = lp_html(size_kb=size_kb, depth=rng.randint(2, 6), seed=seed + i)
+        records.append({
+            'name': f"テンプレート{i + 1}",
+            'category': rng.choice(["BtoB SaaS", "EC/通販", "教育", "金融", "医療", "その他"]),
+            'source_url': f"https://example.com/{i}",
+            'industry': rng.choice(JA_WORDS),
+            'template_type': 'html',
+            'notes': ''.join(rng.choice(JA_WORDS) for _ in range(20)),
+            'html_content': html,
+            'html_sanitized': html,
+            'created_at': "2025-01-01T00:00:00",
+            'id': i + 1
+        })
+    return records
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+テンプレートのメモリ使用量の比較（辞書 vs TemplateRecord）
+
+合成テンプレート（synthetic.py）のライブラリを、これまでの辞書のままの場合と
+lp_records.TemplateRecord（メタデータは __slots__、HTMLは zlib 圧縮）に変換した場合とで、
+保持しているメモリ量を tracemalloc で計測する。プレビュー・ダウンロード時の展開時間も計測する
+セッション数を指定すると、その数のセッションが同じ量のライブラリを持った場合の合計も表示する
+
+使い方:
+    python benchmarks/template_memory.py
+    python benchmarks/template_memory.py --templates 300 --html-kb 200 --sessions 20
+"""
+
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import synthetic  # noqa: E402
+from lp_records import to_records  # noqa: E402
+
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+
+def retained_bytes(build):
+    """build() が返したオブジェクトを保持したまま増えたメモリ量（返り値, バイト数）"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, after - before
+
+
+def run(args) -> dict:
+    def make_dicts():
+        records = synthetic.lp_template_records(count=args.templates, size_kb=args.html_kb)
+        # サニタイズで本文が変わった場合を模して、html_sanitized は別の文字列にする
+        for record in records:
+            record['html_sanitized'] = record['html_content'].replace('<!DOCTYPE html>', '<!doctype html>')
+        return records
+
+    dicts, dict_bytes = retained_bytes(make_dicts)
+
+    started = time.perf_counter()
+    records, record_bytes = retained_bytes(lambda: to_records(dicts))
+    convert_s = time.perf_counter() - started
+
+    timings = []
+    for record in records[:50]:
+        started = time.perf_counter()
+        record.html_sanitized
+        timings.append(time.perf_counter() - started)
+
+    html_bytes = sum(len(d['html_content'].encode('utf-8')) for d in dicts)
+    return {
+        'meta': {
+            'measured_at': datetime.now().isoformat(),
+            'python': sys.version.split()[0],
+            'templates': args.templates,
+            'html_kb': args.html_kb,
+            'sessions': args.sessions,
+        },
+        'html_mb': round(html_bytes / 1024 ** 2, 2),
+        'dict_mb': round(dict_bytes / 1024 ** 2, 2),
+        'record_mb': round(record_bytes / 1024 ** 2, 2),
+        'ratio': round(dict_bytes / max(record_bytes, 1), 1),
+        'convert_s': round(convert_s, 3),
+        'decompress_ms_median': round(statistics.median(timings) * 1000, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="テンプレート表現のメモリ使用量の比較")
+    parser.add_argument('--templates', type=int, default=100, help="テンプレート数")
+    parser.add_argument('--html-kb', type=int, default=50, help="1テンプレートあたりのHTMLサイズ（KB）")
+    parser.add_argument('--sessions', type=int, default=10, help="同時セッション数（合計の見積もり用）")
+    parser.add_argument('--no-save', action='store_true', help="結果をファイルに保存しない")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    sessions = args.sessions
+    print(f"# テンプレートのメモリ使用量 (templates={args.templates}, html={args.html_kb}KB, HTML合計 {report['html_mb']}MB)")
+    print(f"  辞書            {report['dict_mb']:8.2f} MB  （{sessions}セッション: {report['dict_mb'] * sessions:8.1f} MB）")
+    print(f"  TemplateRecord  {report['record_mb']:8.2f} MB  （{sessions}セッション: {report['record_mb'] * sessions:8.1f} MB）")
+    print(f"  削減率 {report['ratio']}倍 / 変換 {report['convert_s']}s / 展開（1件・中央値） {report['decompress_ms_median']}ms")
+    print("  ※ 合成HTMLは繰り返しが多く、実際のLPより圧縮されやすい点に注意")
+
+    if not args.no_save:
+        output = RESULTS_DIR / f"template_memory_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f"\n💾 {output} に保存しました")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+# -*- coding: utf-8 -*-
+"""
+GEO分析 - 分析エンジン
+回答テキストからのブランド言及数のカウント、URL・ドメインの抽出と、モデル別の集計
+ダッシュボード（app.py）とバッチ処理（geo_batch.py）の両方から使う
+
+ブランド照合は正規化済みのテキスト（NFKC・小文字化・任意でカナ統一）に対して行う
+回答列の正規化は読み込み時に1回だけ行い、ブランド名と別名は1つの正規表現にまとめて1回の走査で数える
+
+回答列の数は固定しない（「<モデル名>回答」の列をすべて分析対象にする）
+列ごとの分析は独立したタスクなので、executor を渡すと並列に実行する
+"""
+
+import csv
+import re
+import unicodedata
+from collections import Counter
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from perf import current as current_perf
+
+if TYPE_CHECKING:
+    from scipy import sparse  # 分析時に読み込む（CSVの読み込みだけなら scipy は不要）
+
+URL_PATTERN = re.compile(r'https?://[^\s\)\]\,]+')
+DOMAIN_PATTERN = re.compile(r'https?://([^/]+)')
+
+# CSVの列構成（ID, プロンプト, 各モデルの回答 × N）
+# ヘッダーなしのCSVでモデル名を指定しない場合は、回答列に左から MODELS の名前を付ける
+MODELS = ['GPT', 'Gemini', 'Perplexity']
+ANSWER_SUFFIX = '回答'
+MODEL_COLUMNS = [f'{model}{ANSWER_SUFFIX}' for model in MODELS]
+BASE_COLUMNS = ['ID', 'プロンプト'] + MODEL_COLUMNS
+
+TOP_DOMAINS = 10
+
+# ひらがな → カタカナ（カナ統一）
+KANA_TABLE = {code: code + 0x60 for code in range(0x3041, 0x3097)}
+
+
+def count_brand_mentions(text, brand_name):
+    """テキスト内のブランド言及数をカウント"""
+    if pd.isna(text) or text == '':
+        return 0
+    pattern = re.compile(re.escape(brand_name), re.IGNORECASE)
+    return len(pattern.findall(str(text)))
+
+
+def extract_urls(text):
+    """テキストからURLを抽出"""
+    if pd.isna(text) or text == '':
+        return []
+    return URL_PATTERN.findall(str(text))
+
+
+def extract_domains(urls: List[str]) -> List[str]:
+    """URLのリストからドメインを抽出"""
+    domains = []
+    for url in urls:
+        match = DOMAIN_PATTERN.match(url)
+        if match:
+            domains.append(match.group(1))
+    return domains
+
+
+def normalize_text(text, unify_kana: bool = False) -> str:
+    """
+    照合用にテキストを正規化
+    NFKC（全角英数・半角カナなどの幅の統一）→ 小文字化、unify_kana=True ならひらがなをカタカナに揃える
+    """
+    if pd.isna(text) or text == '':
+        return ''
+    text = unicodedata.normalize('NFKC', str(text)).casefold()
+    return text.translate(KANA_TABLE) if unify_kana else text
+
+
+def normalize_answers(df: pd.DataFrame, models: Optional[List[str]] = None, unify_kana: bool = False) -> Dict[str, pd.Series]:
+    """回答列を正規化したコピー（モデル名をキーにした辞書。元の列はそのまま残す）"""
+    normalized = {}
+    for model in models or detect_models(df):
+        column = answer_column(model)
+        if column in df.columns:
+            normalized[model] = df[column].map(lambda x: normalize_text(x, unify_kana))
+    return normalized
+
+
+def parse_aliases(text: str) -> Dict[str, List[str]]:
+    """
+    別名の設定を読み込む（1行に「ブランド: 別名, 別名」）
+    例: "LAVA: ラバ, らば" → {'LAVA': ['ラバ', 'らば']}
+    """
+    aliases: Dict[str, List[str]] = {}
+    for line in text.splitlines():
+        brand, sep, names = line.partition(':')
+        if not sep or not brand.strip():
+            continue
+        aliases.setdefault(brand.strip(), []).extend(n.strip() for n in names.split(',') if n.strip())
+    return aliases
+
+
+def parse_column_map(text: str) -> Dict[str, str]:
+    """
+    列の対応の設定を読み込む（1行に「CSVの列名: モデル名」）
+    例: "gpt_answer: GPT" → {'gpt_answer': 'GPT'}
+    """
+    mapping = {}
+    for line in text.splitlines():
+        column, sep, model = line.partition(':')
+        if sep and column.strip() and model.strip():
+            mapping[column.strip()] = model.strip()
+    return mapping
+
+
+def _has_partial_overlap(names: List[str]) -> bool:
+    """ある表記の末尾が別の表記の先頭と重なるか（「ab」と「bc」）。重なると左から順の一致では後の表記を落とす"""
+    prefixes: Dict[str, set] = {}
+    for name in names:
+        for k in range(1, len(name)):
+            prefixes.setdefault(name[:k], set()).add(name)
+    return any(
+        prefixes.get(name[-k:], set()) - {name}
+        for name in names for k in range(1, len(name))
+    )
+
+
+class BrandMatcher:
+    """
+    ブランド名と別名を正規化して1つの正規表現にまとめたもの
+    正規化済みテキストを1回走査するだけで、全ブランドの言及数を行ごとに数える
+    """
+
+    def __init__(self, brands: List[str], aliases: Optional[Dict[str, List[str]]] = None, unify_kana: bool = False):
+        self.brands = list(dict.fromkeys(brands))
+        self.unify_kana = unify_kana
+        aliases = aliases or {}
+
+        # 正規化した表記 → ブランドの位置（同じ表記が複数ブランドの別名なら全ブランドに数える）
+        self.lookup: Dict[str, List[int]] = {}
+        for index, brand in enumerate(self.brands):
+            for name in [brand] + list(aliases.get(brand, [])):
+                key = normalize_text(name, unify_kana)
+                if key and index not in self.lookup.setdefault(key, []):
+                    self.lookup[key].append(index)
+
+        # 長い表記を先に並べ、別名の一部だけに一致しないようにする
+        names = sorted(self.lookup, key=len, reverse=True)
+        alternation = '|'.join(map(re.escape, names))
+
+        # ブランドごとに独立して数えていた従来の集計と同じく、他ブランドの名前の一部になっている言及も落とさない
+        # - 通常: 一致した表記に含まれる他ブランドの表記も数える（「zen place」の一致は「zen」「place」の言及にもなる）
+        # - 一部が重なる表記がある場合（「ab」と「bc」の「abc」）: 一致を読み飛ばすと後の表記を落とすので、
+        #   先読みで1文字ずつ進めて各位置で始まる最も長い表記を取り、同じ位置で始まる短い表記も数える
+        #   （言及数は開始位置ごとに数えるので、「aa」の「aaa」のように自身と重なる表記は多めになる。言及率は同じ）
+        self.overlapping = _has_partial_overlap(names)
+        if not names:
+            self.pattern = None
+        elif self.overlapping:
+            self.pattern = re.compile(f'(?=({alternation}))')
+        else:
+            self.pattern = re.compile(alternation)
+        contains = str.startswith if self.overlapping else (lambda key, other: other in key)
+        self.credits: Dict[str, List[int]] = {
+            key: sorted({index for other, indices in self.lookup.items() if contains(key, other) for index in indices})
+            for key in self.lookup
+        }
+
+    def index(self, brand: str) -> int:
+        return self.brands.index(brand)
+
+    def scan(self, normalized: pd.Series) -> Tuple['sparse.csr_matrix', np.ndarray]:
+        """
+        正規化済みテキストを1回走査し、一致位置から次の2つを作る
+        - 行×ブランドの言及数（疎行列。言及のないセルは持たない）
+        - 行ごとに最初に言及されたブランドの位置（言及なしは -1）
+        """
+        from scipy import sparse
+
+        n_rows, n_brands = len(normalized), len(self.brands)
+        first = np.full(n_rows, -1, dtype=np.int32)
+        if self.pattern is None or n_rows == 0:
+            return sparse.csr_matrix((n_rows, n_brands), dtype=np.int32), first
+
+        # 行ごとの一致（出現順）を縦に並べる
+        found = pd.Series(normalized.to_numpy(), dtype=object).str.findall(self.pattern)
+        matches = found.explode().dropna()
+        categories = list(self.lookup)
+        codes = pd.Categorical(matches.to_numpy(), categories=categories).codes
+
+        # 表記 → ブランドの対応（複数ブランドの別名になっている表記・他ブランドの表記を含む表記は該当する全ブランドに数える）
+        primary = np.array([self.lookup[c][0] for c in categories], dtype=np.int32)
+        match_rows = matches.index.to_numpy()
+        rows, cols = [match_rows], [primary[codes]]
+        for code, category in enumerate(categories):
+            extra = [index for index in self.credits[category] if index != primary[code]]
+            if not extra:
+                continue
+            hit_rows = match_rows[codes == code]
+            for index in extra:
+                rows.append(hit_rows)
+                cols.append(np.full(len(hit_rows), index, dtype=np.int32))
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+
+        hits = sparse.coo_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=(n_rows, n_brands)
+        ).tocsr()  # 同じセルの重複は合計される
+
+        first_codes = pd.Categorical(found.str[0], categories=categories).codes
+        has_first = first_codes >= 0
+        first[has_first] = primary[first_codes[has_first]]
+        return hits, first
+
+
+def co_mention_counts(hits: 'sparse.csr_matrix') -> np.ndarray:
+    """
+    ブランド×ブランドの共起回数（同じ回答で両方が言及された行数）
+    対角成分はそのブランドが言及された行数
+    """
+    mentioned = (hits > 0).astype(np.int32)
+    return (mentioned.T @ mentioned).toarray()
+
+
+def first_mention_share(first: np.ndarray, n_brands: int) -> np.ndarray:
+    """いずれかのブランドが言及された行のうち、各ブランドが最初に言及された割合（%）"""
+    named = first[first >= 0]
+    if len(named) == 0:
+        return np.zeros(n_brands)
+    return np.bincount(named, minlength=n_brands) / len(named) * 100
+
+
+def answer_column(model: str) -> str:
+    return f'{model}{ANSWER_SUFFIX}'
+
+
+def detect_models(df: pd.DataFrame) -> List[str]:
+    """「<モデル名>回答」の列からモデル名を取り出す（列の並び順）"""
+    return [
+        str(column)[:-len(ANSWER_SUFFIX)] for column in df.columns
+        if str(column).endswith(ANSWER_SUFFIX) and str(column) != ANSWER_SUFFIX
+    ]
+
+
+def _has_header(source, columns: Optional[Dict[str, str]] = None) -> bool:
+    """
+    1行目が列名かどうか
+    1列目が「ID」、または1列目が数値でなく「〜回答」の列（columns で指定した列）がある場合に列名とみなす
+    （ヘッダーなしCSVの1行目は1列目がID（数値）なので、回答の文中に「〜回答」があっても列名と取り違えない）
+    """
+    if hasattr(source, 'read'):
+        position = source.tell()
+        line = source.readline()
+        source.seek(position)
+    else:
+        with open(source, 'rb') as f:
+            line = f.readline()
+    if isinstance(line, bytes):
+        line = line.decode('utf-8-sig', errors='replace')
+    cells = [cell.strip() for cell in next(csv.reader([line.rstrip('\r\n')]), [])]
+    if not cells:
+        return False
+    if cells[0].upper() == 'ID':
+        return True
+    if _is_number(cells[0]):
+        return False
+    return any(cell.endswith(ANSWER_SUFFIX) or cell in (columns or {}) for cell in cells)
+
+
+def _is_number(value: str) -> bool:
+    try:
+        float(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _check_unique_models(columns: List[str]):
+    """同じ回答列が2つ以上になる場合はエラー（列名が重なると後の集計で列を取り違える）"""
+    duplicates = sorted({str(c) for c in columns if str(c).endswith(ANSWER_SUFFIX) and columns.count(c) > 1})
+    if duplicates:
+        names = ', '.join(d[:-len(ANSWER_SUFFIX)] for d in duplicates)
+        raise ValueError(f"モデル名が重複しています: {names}（回答列ごとに別の名前を指定してください）")
+
+
+def read_geo_csv(source, models: Optional[List[str]] = None, columns: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    GEO分析用CSVを読み込み、回答列を「<モデル名>回答」にそろえる
+    - ヘッダーなし: ID, プロンプト, 回答 × N。回答列には左から models の名前を付ける
+      （省略時は MODELS。足りない分は回答列の番号で「モデル4」のように付ける）
+    - ヘッダーあり: 「〜回答」の列を回答列として使う。columns（CSVの列名 → モデル名）で任意の列を回答列にできる
+      （columns の値が "ID" / "プロンプト" の場合は、その列をID列・プロンプト列として扱う）
+    同じモデル名の回答列が2つ以上になる場合は ValueError
+    """
+    if not _has_header(source, columns):
+        df = pd.read_csv(source, header=None)
+        if len(df.columns) < 3:
+            df.columns = [f'列{i}' for i in range(len(df.columns))]
+            return df
+        names = list(models or MODELS)
+        names += [f'モデル{i + 1}' for i in range(len(names), len(df.columns) - 2)]
+        df.columns = ['ID', 'プロンプト'] + [answer_column(name) for name in names[:len(df.columns) - 2]]
+        _check_unique_models(list(df.columns))
+        return df
+
+    df = pd.read_csv(source)
+    if columns:
+        df = df.rename(columns={
+            column: model if model in ('ID', 'プロンプト') else answer_column(model)
+            for column, model in columns.items()
+        })
+    _check_unique_models(list(df.columns))
+    return df
+
+
+def analyze_column(
+    series: pd.Series,
+    main_brand: str,
+    competitors: List[str],
+    top_domains: int = TOP_DOMAINS,
+    matcher: Optional[BrandMatcher] = None,
+    normalized: Optional[pd.Series] = None
+) -> Dict:
+    """
+    1モデル分の回答列を分析
+    matcher / normalized を省略した場合はここで作成する（別名なし・カナ統一なし）
+    Returns: {'result': 集計値, 'row_mentions': 行ごとのメインブランド言及数, 'row_domains': 行ごとの引用ドメイン}
+    集計値の co_mentions はブランド×ブランドの共起行数、first_mention_share は最初に言及された割合（%）
+    """
+    perf = current_perf()
+    matcher = matcher or BrandMatcher([main_brand] + competitors)
+    if normalized is None:
+        with perf.stage("テキスト正規化"):
+            normalized = series.map(lambda x: normalize_text(x, matcher.unify_kana))
+
+    with perf.stage("ブランド言及スキャン"):
+        # 全ブランド（別名を含む）を1回の走査で数える
+        hits, first = matcher.scan(normalized)
+        rates = np.asarray((hits > 0).sum(axis=0)).ravel() / len(series) * 100 if len(series) else np.zeros(len(matcher.brands))
+
+        # メインブランドの言及分析
+        main_mentions = hits[:, matcher.index(main_brand)].toarray().ravel()
+        main_mention_rate = rates[matcher.index(main_brand)]
+
+        # 競合ブランドの言及分析
+        competitor_rates = {}
+        for competitor in competitors:
+            competitor_rates[competitor] = rates[matcher.index(competitor)]
+    perf.count("スキャンしたセル数", len(series))
+
+    with perf.stage("共起・初出集計"):
+        # 同じ回答での共起回数と、最初に言及されたブランドの割合
+        co_counts = co_mention_counts(hits)
+        first_share = first_mention_share(first, len(matcher.brands))
+        co_mentions = {
+            brand: {other: int(co_counts[i, j]) for j, other in enumerate(matcher.brands)}
+            for i, brand in enumerate(matcher.brands)
+        }
+
+    with perf.stage("URLスキャン"):
+        # URL・ドメイン分析（行ごとの抽出ドメインも保持）
+        total_urls = 0
+        domain_counts = Counter()
+        row_domains = []
+        for text in series:
+            urls = extract_urls(text)
+            total_urls += len(urls)
+
+            text_domains = extract_domains(urls)
+            domain_counts.update(text_domains)
+            row_domains.append(text_domains)
+    perf.count("抽出URL数", total_urls)
+
+    return {
+        'result': {
+            'main_brand_rate': float(main_mention_rate),
+            'competitor_rates': {k: float(v) for k, v in competitor_rates.items()},
+            'total_urls': total_urls,
+            'unique_domains': len(domain_counts),
+            'top_domains': dict(domain_counts.most_common(top_domains)),
+            'co_mentions': co_mentions,
+            'first_mention_share': {b: float(first_share[i]) for i, b in enumerate(matcher.brands)}
+        },
+        'row_mentions': main_mentions,
+        'row_domains': row_domains,
+    }
+
+
+def analyze(
+    df: pd.DataFrame,
+    main_brand: str,
+    competitors: List[str],
+    models: Optional[List[str]] = None,
+    top_domains: int = TOP_DOMAINS,
+    aliases: Optional[Dict[str, List[str]]] = None,
+    unify_kana: bool = False,
+    normalized: Optional[Dict[str, pd.Series]] = None,
+    executor: Optional[Executor] = None
+) -> Dict:
+    """
+    全モデルの回答を分析
+    models: 省略時は「〜回答」の列をすべて対象にする
+    aliases: ブランドごとの別名 / normalized: 読み込み時に normalize_answers で作成した正規化済みの回答列
+    （unify_kana と同じ設定で作成したもの。省略時はここで正規化する）
+    executor: 指定すると列ごとの分析を並列に実行する（結果の順序は models の順）
+    Returns: {'models', 'results', 'row_mentions', 'row_domains'}（結果はモデル名をキーにした辞書）
+    """
+    # 列が存在するモデルのみ
+    models = [model for model in (models or detect_models(df)) if answer_column(model) in df.columns]
+    analysis = {'models': models, 'results': {}, 'row_mentions': {}, 'row_domains': {}}
+    matcher = BrandMatcher([main_brand] + competitors, aliases, unify_kana)
+    normalized = normalized or {}
+
+    tasks = {
+        model: (df[answer_column(model)], main_brand, competitors, top_domains, matcher, normalized.get(model))
+        for model in models
+    }
+    if executor is not None and len(tasks) > 1:
+        futures = {model: executor.submit(analyze_column, *args) for model, args in tasks.items()}
+        column_results = {model: future.result() for model, future in futures.items()}
+    else:
+        column_results = {model: analyze_column(*args) for model, args in tasks.items()}
+
+    for model, column_analysis in column_results.items():
+        analysis['results'][model] = column_analysis['result']
+        analysis['row_mentions'][model] = column_analysis['row_mentions']
+        analysis['row_domains'][model] = column_analysis['row_domains']
+
+    return analysis
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GEO分析 - バッチ処理（ブラウザ不要のコマンドライン版）
+
+ディレクトリ内のCSVをまとめて分析し、モデル別の言及率・競合言及率・URL数・ドメイン数を
+JSON または Parquet で書き出す。ファイル単位で複数プロセスに分散して並列に処理する
+
+使い方:
+    python geo_batch.py data/ --brands brands.json --output results.json
+    python geo_batch.py data/ --main-brand LAVA --competitors "zen place,CALDO" --format parquet --output results/
+    python geo_batch.py data/ --brands brands.json --jobs 8 --recursive
+    python geo_batch.py data/ --brands brands.json --output results.json --store data/geo_history.sqlite
+
+ブランド設定（--brands）の形式:
+    {
+      "default": {"main_brand": "LAVA", "competitors": ["zen place", "CALDO"], "aliases": {"LAVA": ["ラバ"]}},
+      "files": {"client_a.csv": {"main_brand": "...", "competitors": ["..."]}}
+    }
+    "files" のキーはCSVのファイル名（または入力ディレクトリからの相対パス）
+    "aliases"（ブランドごとの別名）と "unify_kana"（ひらがな・カタカナを区別しない）は省略可
+    回答列の構成も同じ場所に書ける（省略可）:
+      "models": ["GPT", "Gemini", "Perplexity", "Claude"]   ヘッダーなしCSVの回答列のモデル名（左から順）
+      "columns": {"claude_answer": "Claude"}                ヘッダーありCSVの列名 → モデル名
+
+--store を指定すると、各ファイルの集計値をダッシュボードと共通の履歴ストア（geo_store.py）にも保存する
+日時にはCSVの更新日時を使うので、過去のスナップショットもまとめて取り込める
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from geo_analysis import TOP_DOMAINS, analyze, read_geo_csv
+from geo_store import ResultStore, dataset_hash
+
+
+# ===== ブランド設定 =====
+def load_brand_config(
+    path: Optional[Path],
+    main_brand: Optional[str],
+    competitors: Optional[str],
+    models: Optional[str] = None
+) -> Dict:
+    """ブランド設定ファイルとコマンドライン引数から設定を組み立てる（引数が default を上書き）"""
+    config = {'default': {}, 'files': {}}
+    if path is not None:
+        loaded = json.loads(Path(path).read_text(encoding='utf-8'))
+        config['default'] = loaded.get('default', {})
+        config['files'] = loaded.get('files', {})
+
+    if main_brand:
+        config['default']['main_brand'] = main_brand
+    if competitors is not None:
+        config['default']['competitors'] = [b.strip() for b in competitors.split(',') if b.strip()]
+    if models is not None:
+        config['default']['models'] = [m.strip() for m in models.split(',') if m.strip()]
+    return config
+
+
+def brands_for(config: Dict, relative_path: str) -> Dict:
+    """ファイルに適用するブランド設定（相対パス → ファイル名 → default の順で探す）"""
+    files = config['files']
+    brands = dict(config['default'])
+    brands.update(files.get(relative_path) or files.get(Path(relative_path).name) or {})
+    if not brands.get('main_brand'):
+        raise ValueError(f"メインブランドが設定されていません: {relative_path}")
+    brands.setdefault('competitors', [])
+    brands.setdefault('aliases', {})
+    brands.setdefault('unify_kana', False)
+    return brands
+
+
+# ===== 分析（ワーカープロセスで実行） =====
+def analyze_file(path: str, relative_path: str, brands: Dict, top_domains: int = TOP_DOMAINS) -> Dict:
+    """CSVを1件分析する（行ごとの値は返さず、集計値のみ返す）"""
+    started = time.perf_counter()
+    try:
+        df = read_geo_csv(path, brands.get('models'), brands.get('columns'))
+        analysis = analyze(
+            df, brands['main_brand'], brands['competitors'], top_domains=top_domains,
+            aliases=brands['aliases'], unify_kana=brands['unify_kana']
+        )
+    except Exception as e:
+        return {'file': relative_path, 'error': f"{type(e).__name__}: {e}"}
+
+    return {
+        'file': relative_path,
+        'main_brand': brands['main_brand'],
+        'competitors': brands['competitors'],
+        'settings': {'aliases': brands['aliases'], 'unify_kana': brands['unify_kana']},
+        'rows': len(df),
+        'dataset_hash': dataset_hash(df),
+        'results': analysis['results'],
+        'elapsed_s': round(time.perf_counter() - started, 3),
+    }
+
+
+def find_csv_files(directory: Path, recursive: bool = False) -> List[Path]:
+    pattern = "**/*.csv" if recursive else "*.csv"
+    return sorted(p for p in directory.glob(pattern) if p.is_file())
+
+
+def run_batch(
+    directory: Path,
+    config: Dict,
+    jobs: Optional[int] = None,
+    recursive: bool = False,
+    top_domains: int = TOP_DOMAINS,
+    progress: bool = True
+) -> List[Dict]:
+    """ディレクトリ内のCSVを並列に分析し、ファイル名順の結果リストを返す"""
+    tasks = []
+    for path in find_csv_files(directory, recursive):
+        relative_path = path.relative_to(directory).as_posix()
+        try:
+            tasks.append((str(path), relative_path, brands_for(config, relative_path)))
+        except ValueError as e:
+            tasks.append((str(path), relative_path, e))
+
+    reports = []
+    runnable = [t for t in tasks if not isinstance(t[2], Exception)]
+    reports.extend({'file': rel, 'error': str(err)} for _, rel, err in tasks if isinstance(err, Exception))
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(analyze_file, path, rel, brands, top_domains) for path, rel, brands in runnable]
+        for done, future in enumerate(as_completed(futures), start=1):
+            report = future.result()
+            reports.append(report)
+            if progress:
+                status = f"❌ {report['error']}" if 'error' in report else f"{report['rows']}行 {report['elapsed_s']}s"
+                print(f"[{done}/{len(futures)}] {report['file']}: {status}", file=sys.stderr)
+
+    return sorted(reports, key=lambda r: r['file'])
+
+
+# ===== 書き出し =====
+def write_json(reports: List[Dict], output: Path):
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({'files': reports}, indent=2, ensure_ascii=False), encoding='utf-8')
+
+
+def report_tables(reports: List[Dict]) -> Dict[str, List[Dict]]:
+    """
+    結果を縦持ちの表に変換
+    - summary: ファイル×モデルごとの行数・URL数・ユニークドメイン数
+    - rates: ファイル×モデル×ブランドごとの言及率
+    - domains: ファイル×モデル×ドメインごとの引用回数
+    - errors: 失敗したファイル
+    """
+    tables = {'summary': [], 'rates': [], 'domains': [], 'errors': []}
+    for report in reports:
+        if 'error' in report:
+            tables['errors'].append({'file': report['file'], 'error': report['error']})
+            continue
+        for model, result in report['results'].items():
+            key = {'file': report['file'], 'model': model}
+            tables['summary'].append(dict(
+                key, rows=report['rows'], total_urls=result['total_urls'], unique_domains=result['unique_domains']
+            ))
+            tables['rates'].append(dict(key, brand=report['main_brand'], is_main=True, mention_rate=result['main_brand_rate']))
+            for brand, rate in result['competitor_rates'].items():
+                tables['rates'].append(dict(key, brand=brand, is_main=False, mention_rate=rate))
+            for domain, count in result['top_domains'].items():
+                tables['domains'].append(dict(key, domain=domain, count=count))
+    return tables
+
+
+def write_parquet(reports: List[Dict], output: Path):
+    """表ごとに <output>/<表名>.parquet を書き出す"""
+    import pandas as pd
+
+    output.mkdir(parents=True, exist_ok=True)
+    for name, rows in report_tables(reports).items():
+        pd.DataFrame(rows).to_parquet(output / f"{name}.parquet", index=False)
+
+
+def save_to_store(reports: List[Dict], directory: Path, store_path: Path) -> int:
+    """成功したファイルの集計値を履歴ストアに保存（同じデータ・同じ設定の結果は重複して保存しない）"""
+    store = ResultStore(store_path)
+    saved = 0
+    for report in reports:
+        if 'error' in report:
+            continue
+        modified = datetime.fromtimestamp((directory / report['file']).stat().st_mtime)
+        store.save_run(
+            report['results'],
+            report['main_brand'],
+            report['competitors'],
+            report['dataset_hash'],
+            rows=report['rows'],
+            dataset_name=report['file'],
+            created_at=modified.isoformat(timespec='seconds'),
+            settings=report['settings']
+        )
+        saved += 1
+    return saved
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GEO分析のバッチ処理（CSVディレクトリ → JSON / Parquet）")
+    parser.add_argument('directory', type=Path, help="CSVファイルのディレクトリ")
+    parser.add_argument('--brands', type=Path, help="ブランド設定JSON")
+    parser.add_argument('--main-brand', help="メインブランド名（設定ファイルの default を上書き）")
+    parser.add_argument('--competitors', help="競合ブランド（カンマ区切り。設定ファイルの default を上書き）")
+    parser.add_argument('--models', help="ヘッダーなしCSVの回答列のモデル名（カンマ区切り・左から順）")
+    parser.add_argument('--format', choices=['json', 'parquet'], default='json', help="出力形式")
+    parser.add_argument('--output', type=Path, required=True, help="出力先（json: ファイル / parquet: ディレクトリ）")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help="並列プロセス数")
+    parser.add_argument('--recursive', action='store_true', help="サブディレクトリのCSVも対象にする")
+    parser.add_argument('--top-domains', type=int, default=TOP_DOMAINS, help="モデルごとに出力する上位ドメイン数")
+    parser.add_argument('--store', type=Path, help="集計値を保存する履歴ストア（SQLite）のパス")
+    args = parser.parse_args(argv)
+
+    if not args.directory.is_dir():
+        parser.error(f"ディレクトリが見つかりません: {args.directory}")
+
+    config = load_brand_config(args.brands, args.main_brand, args.competitors, args.models)
+    started = time.perf_counter()
+    reports = run_batch(args.directory, config, args.jobs, args.recursive, args.top_domains)
+
+    if args.format == 'json':
+        write_json(reports, args.output)
+    else:
+        write_parquet(reports, args.output)
+
+    if args.store:
+        saved = save_to_store(reports, args.directory, args.store)
+        print(f"💾 {saved}件を履歴ストアに保存 → {args.store}", file=sys.stderr)
+
+    failed = sum(1 for r in reports if 'error' in r)
+    print(
+        f"✅ {len(reports) - failed}件を分析（失敗 {failed}件, {time.perf_counter() - started:.1f}s） → {args.output}",
+        file=sys.stderr
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
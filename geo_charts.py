@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+GEO分析ダッシュボード - グラフ生成
+分析結果からplotlyのグラフを組み立てる。ブランド・ドメインは上位N件＋「その他」に集約してから描画する
+"""
+
+import hashlib
+import json
+from typing import Dict, List, Tuple
+
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+OTHER_LABEL = "その他"
+
+
+def result_hash(results: Dict, main_brand: str, **options) -> str:
+    """分析結果（と描画オプション）から、グラフキャッシュ用のハッシュを計算"""
+    payload = {'main_brand': main_brand, 'results': results, 'options': options}
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=float)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+def top_brands(results: Dict, main_brand: str, top_n: int) -> List[str]:
+    """全モデル平均の言及率で上位のブランドを選ぶ（メインブランドは常に含む）"""
+    totals: Dict[str, float] = {}
+    for result in results.values():
+        for brand, rate in result['competitor_rates'].items():
+            totals[brand] = totals.get(brand, 0.0) + rate
+    ranked = sorted(totals, key=totals.get, reverse=True)
+    return [main_brand] + [b for b in ranked if b != main_brand][:max(top_n - 1, 0)]
+
+
+def brand_frame(results: Dict, models: List[str], main_brand: str, top_n: int) -> pd.DataFrame:
+    """ブランド比較グラフ用のデータ（上位 top_n ブランド＋その他（平均））"""
+    shown = set(top_brands(results, main_brand, top_n))
+    rows = []
+    for model in models:
+        if model not in results:
+            continue
+        rows.append({'ブランド': main_brand, 'モデル': model, '言及率': results[model]['main_brand_rate'], 'タイプ': 'メイン'})
+
+        others = []
+        for competitor, rate in results[model]['competitor_rates'].items():
+            if competitor in shown:
+                rows.append({'ブランド': competitor, 'モデル': model, '言及率': rate, 'タイプ': '競合'})
+            else:
+                others.append(rate)
+        if others:
+            rows.append({
+                'ブランド': f"{OTHER_LABEL}（{len(others)}社平均）",
+                'モデル': model,
+                '言及率': sum(others) / len(others),
+                'タイプ': OTHER_LABEL
+            })
+    return pd.DataFrame(rows)
+
+
+def build_brand_figure(brand_df: pd.DataFrame) -> go.Figure:
+    """ブランド別・モデル別言及率の棒グラフ"""
+    fig = px.bar(
+        brand_df,
+        x='ブランド',
+        y='言及率',
+        color='モデル',
+        title="ブランド別・モデル別言及率比較",
+        labels={'言及率': '言及率 (%)', 'ブランド': 'ブランド名'},
+        height=400
+    )
+    fig.update_layout(showlegend=True)
+    return fig
+
+
+def build_radar_figure(perf_df: pd.DataFrame, main_brand: str) -> go.Figure:
+    """モデル別パフォーマンスのレーダーチャート"""
+    fig = go.Figure()
+    angles = ['言及率', 'URL引用数', 'ユニークドメイン数']
+
+    for _, row in perf_df.iterrows():
+        values = [
+            row[f'{main_brand}言及率'],
+            row['URL引用数'] / 10,  # スケール調整
+            row['ユニークドメイン数'] * 5  # スケール調整
+        ]
+        fig.add_trace(go.Scatterpolar(
+            r=values,
+            theta=angles,
+            fill='toself',
+            name=row['モデル']
+        ))
+
+    fig.update_layout(
+        polar=dict(
+            radialaxis=dict(visible=True, range=[0, 100])
+        ),
+        title="モデル別パフォーマンス比較（正規化）",
+        height=500
+    )
+    return fig
+
+
+def domain_frame(result: Dict, top_n: int) -> pd.DataFrame:
+    """ドメイン別引用回数（上位 top_n 件＋その他）"""
+    top = dict(list(result['top_domains'].items())[:top_n])
+    other = result['total_urls'] - sum(top.values())
+    if other > 0:
+        top[OTHER_LABEL] = other
+    return pd.DataFrame(list(top.items()), columns=['ドメイン', '引用回数'])
+
+
+def build_domain_figure(domain_df: pd.DataFrame, model: str, top_n: int) -> go.Figure:
+    """モデル別引用ドメインの横棒グラフ"""
+    fig = px.bar(
+        domain_df,
+        x='引用回数',
+        y='ドメイン',
+        orientation='h',
+        title=f"{model} 引用ドメイン TOP{top_n}",
+        height=300
+    )
+    fig.update_layout(yaxis={'categoryorder': 'total ascending'})
+    return fig
+
+
+def domain_matrix(results: Dict, models: List[str], top_n: int) -> pd.DataFrame:
+    """ドメイン×モデルの引用回数（全モデル合計で上位 top_n ドメイン）"""
+    counts = pd.DataFrame(
+        {model: pd.Series(results[model]['top_domains'], dtype=float) for model in models if model in results}
+    ).fillna(0)
+    if counts.empty:
+        return counts
+    return counts.loc[counts.sum(axis=1).sort_values(ascending=False).index[:top_n]]
+
+
+def build_domain_heatmap(domain_df: pd.DataFrame) -> go.Figure:
+    """ドメイン×モデルの引用回数のヒートマップ（モデル数が増えてもグラフは1つ）"""
+    fig = px.imshow(
+        domain_df,
+        text_auto=True,
+        color_continuous_scale='Blues',
+        labels={'x': 'モデル', 'y': 'ドメイン', 'color': '引用回数'},
+        title=f"モデル別引用ドメイン TOP{len(domain_df)}",
+        aspect='auto',
+        height=max(400, 28 * len(domain_df) + 150)
+    )
+    return fig
+
+
+def build_result_figures(
+    results: Dict,
+    models: List[str],
+    main_brand: str,
+    brand_top_n: int = 10,
+    domain_top_n: int = 5
+) -> Tuple[Dict[str, go.Figure], Dict[str, pd.DataFrame]]:
+    """
+    分析結果から全タブのグラフと表をまとめて生成
+    Returns: (figures, tables)
+    """
+    figures: Dict[str, go.Figure] = {}
+    tables: Dict[str, pd.DataFrame] = {}
+
+    brand_df = brand_frame(results, models, main_brand, brand_top_n)
+    if not brand_df.empty:
+        figures['brand'] = build_brand_figure(brand_df)
+        tables['ranking'] = brand_ranking(results, models, main_brand)
+
+    perf_rows = [
+        {
+            'モデル': model,
+            f'{main_brand}言及率': results[model]['main_brand_rate'],
+            'URL引用数': results[model]['total_urls'],
+            'ユニークドメイン数': results[model]['unique_domains']
+        }
+        for model in models if model in results
+    ]
+    if perf_rows:
+        tables['performance'] = pd.DataFrame(perf_rows)
+        figures['radar'] = build_radar_figure(tables['performance'], main_brand)
+
+    domain_df = domain_matrix(results, models, domain_top_n * 3)
+    if not domain_df.empty:
+        figures['domains'] = build_domain_heatmap(domain_df)
+
+    first_df = first_mention_frame(results, models, top_brands(results, main_brand, brand_top_n))
+    if not first_df.empty:
+        figures['first_mention'] = build_first_mention_figure(first_df)
+
+    return figures, tables
+
+
+def co_mention_frame(results: Dict, models: List[str], brands: List[str], percent: bool = False) -> pd.DataFrame:
+    """
+    ブランド×ブランドの共起行数（models の合計）
+    percent=True なら行のブランドが言及された回答のうち、列のブランドも言及された割合（%）
+    """
+    matrix = pd.DataFrame(0.0, index=brands, columns=brands)
+    for model in models:
+        co_mentions = results.get(model, {}).get('co_mentions', {})
+        for brand in brands:
+            row = co_mentions.get(brand, {})
+            matrix.loc[brand] += [row.get(other, 0) for other in brands]
+    if percent:
+        diagonal = pd.Series([matrix.at[b, b] for b in brands], index=brands)
+        matrix = matrix.div(diagonal.where(diagonal > 0), axis=0).fillna(0.0) * 100
+    return matrix
+
+
+def build_co_mention_heatmap(matrix: pd.DataFrame, title: str, percent: bool = False) -> go.Figure:
+    """共起行数（割合）のヒートマップ"""
+    fig = px.imshow(
+        matrix,
+        text_auto='.1f' if percent else True,
+        color_continuous_scale='Blues',
+        labels={'x': '同時に言及されたブランド', 'y': 'ブランド', 'color': '割合 (%)' if percent else '回答数'},
+        title=title,
+        aspect='auto',
+        height=max(400, 40 * len(matrix) + 150)
+    )
+    return fig
+
+
+def first_mention_frame(results: Dict, models: List[str], brands: List[str]) -> pd.DataFrame:
+    """モデル別・ブランド別の初出シェア（いずれかのブランドが言及された回答のうち、最初に言及された割合）"""
+    rows = [
+        {'ブランド': brand, 'モデル': model, '初出シェア': results[model]['first_mention_share'].get(brand, 0.0)}
+        for model in models if 'first_mention_share' in results.get(model, {})
+        for brand in brands
+    ]
+    return pd.DataFrame(rows)
+
+
+def build_first_mention_figure(first_df: pd.DataFrame) -> go.Figure:
+    """最初に言及されたブランドの割合（モデル別）"""
+    fig = px.bar(
+        first_df,
+        x='ブランド',
+        y='初出シェア',
+        color='モデル',
+        barmode='group',
+        title="最初に言及されたブランドの割合（モデル別）",
+        labels={'初出シェア': '初出シェア (%)'},
+        height=400
+    )
+    return fig
+
+
+def brand_ranking(results: Dict, models: List[str], main_brand: str) -> pd.DataFrame:
+    """全ブランドの平均言及率ランキング（集約前の全ブランドを対象）"""
+    rates: Dict[str, List[float]] = {}
+    for model in models:
+        if model not in results:
+            continue
+        rates.setdefault(main_brand, []).append(results[model]['main_brand_rate'])
+        for competitor, rate in results[model]['competitor_rates'].items():
+            rates.setdefault(competitor, []).append(rate)
+
+    avg_rates = sorted(((b, sum(v) / len(v)) for b, v in rates.items()), key=lambda x: x[1], reverse=True)
+    return pd.DataFrame({
+        'ランク': range(1, len(avg_rates) + 1),
+        'ブランド': [b for b, _ in avg_rates],
+        '平均言及率 (%)': [round(r, 1) for _, r in avg_rates]
+    })
+
+
+# ===== 推移（履歴ストア geo_store.py の集計値から描画） =====
+def trend_frame(trend_df: pd.DataFrame, model: str = None, monthly: bool = False) -> pd.DataFrame:
+    """
+    ブランド別言及率の推移データ
+    model を省略すると実行ごとの全モデル平均、monthly=True なら月ごとの平均にまとめる
+    """
+    if model:
+        trend_df = trend_df[trend_df['model'] == model]
+    frame = trend_df.groupby(['run_id', 'created_at', 'brand'], as_index=False)['mention_rate'].mean()
+    if monthly:
+        frame['created_at'] = frame['created_at'].dt.to_period('M').dt.to_timestamp()
+        frame = frame.groupby(['created_at', 'brand'], as_index=False)['mention_rate'].mean()
+    return frame.rename(columns={'created_at': '日時', 'brand': 'ブランド', 'mention_rate': '言及率'})
+
+
+def build_trend_figure(frame: pd.DataFrame, title: str) -> go.Figure:
+    """ブランド別言及率の推移の折れ線グラフ"""
+    fig = px.line(
+        frame.sort_values('日時'),
+        x='日時',
+        y='言及率',
+        color='ブランド',
+        markers=True,
+        title=title,
+        labels={'言及率': '言及率 (%)'},
+        height=400
+    )
+    return fig
+
+
+def domain_trend_frame(domain_df: pd.DataFrame, monthly: bool = False) -> pd.DataFrame:
+    """引用ドメインの推移データ（monthly=True なら月ごとの合計）"""
+    frame = domain_df.rename(columns={'created_at': '日時', 'domain': 'ドメイン', 'count': '引用回数'})
+    if monthly:
+        frame = frame.assign(日時=frame['日時'].dt.to_period('M').dt.to_timestamp())
+        frame = frame.groupby(['日時', 'ドメイン'], as_index=False)['引用回数'].sum()
+    return frame
+
+
+def build_domain_trend_figure(frame: pd.DataFrame, top_n: int) -> go.Figure:
+    """上位ドメインの引用回数の推移"""
+    fig = px.line(
+        frame.sort_values('日時'),
+        x='日時',
+        y='引用回数',
+        color='ドメイン',
+        markers=True,
+        title=f"引用ドメイン TOP{top_n} の推移（全モデル合計）",
+        height=400
+    )
+    return fig
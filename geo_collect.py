@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GEO分析 - 回答収集（プロンプト一覧 → 複数のLLM APIへ並行して問い合わせ → GEO分析用CSV）
+
+各エンドポイントへの問い合わせを asyncio で並行に実行する
+- エンドポイントごとの同時実行数・レート制限（1分あたりのリクエスト数）
+- 1つのセッションでコネクションを使い回す（コネクションプール）
+- 429・5xx・タイムアウトは指数バックオフで再試行（Retry-After があればそれに従う）
+- 回答は1件ずつチェックポイントに記録し、全モデルの回答がそろった行から順にCSVへ追記する
+  途中で止めても、同じコマンドで再実行すれば続きから再開する
+
+出力CSVは「ID, プロンプト, <モデル名>回答 …」のヘッダー付き（列の並びはエンドポイント設定の順）
+ダッシュボード（app.py）とバッチ処理（geo_batch.py）でそのまま読み込める
+
+使い方:
+    python geo_collect.py prompts.txt --endpoints endpoints.json --output answers.csv
+    python geo_collect.py prompts.csv --endpoints endpoints.json --output answers.csv --concurrency 32
+
+プロンプト一覧: .txt は1行1プロンプト（IDは行番号）。.csv は「ID, プロンプト」の2列（ヘッダーは任意）
+
+エンドポイント設定（--endpoints）の形式:
+    {
+      "endpoints": [
+        {"name": "GPT", "url": "https://api.openai.com/v1/chat/completions", "model": "gpt-4o-mini",
+         "api_key_env": "OPENAI_API_KEY", "requests_per_minute": 500, "concurrency": 8},
+        {"name": "Perplexity", "url": "https://api.perplexity.ai/chat/completions", "model": "sonar",
+         "api_key_env": "PERPLEXITY_API_KEY", "requests_per_minute": 50}
+      ]
+    }
+    OpenAI互換の chat/completions API（POST {"model", "messages"} → choices[0].message.content）を想定
+    "params" に書いた値（temperature など）はリクエストにそのまま追加する
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+from geo_analysis import answer_column
+
+RETRY_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+
+class RetryableError(Exception):
+    """再試行する応答（429・5xx など）"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """
+    1分あたりのリクエスト数の制限（GCRA方式）
+    burst 件までは間隔を空けずに送り、それ以降は一定間隔に均す
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, burst: int = 1):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self.burst = max(burst, 1)
+        self._tat = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            self._tat = max(self._tat, now)
+            delay = self._tat - (self.burst - 1) * self.interval - now
+            self._tat += self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class Endpoint:
+    """問い合わせ先1件（設定ファイルの endpoints の要素）"""
+
+    def __init__(self, config: Dict, default_concurrency: int):
+        self.name = config['name']
+        self.url = config['url']
+        self.model = config.get('model', '')
+        self.params = config.get('params', {})
+        self.concurrency = int(config.get('concurrency', default_concurrency))
+        self.limiter = RateLimiter(config.get('requests_per_minute'), config.get('burst', 1))
+        api_key = os.environ.get(config['api_key_env'], '') if config.get('api_key_env') else ''
+        self.headers = {'Authorization': f"Bearer {api_key}"} if api_key else {}
+
+    def payload(self, prompt: str) -> Dict:
+        return dict(self.params, model=self.model, messages=[{'role': 'user', 'content': prompt}])
+
+
+def load_endpoints(path: Path, default_concurrency: int) -> List[Endpoint]:
+    config = json.loads(Path(path).read_text(encoding='utf-8'))
+    endpoints = [Endpoint(e, default_concurrency) for e in config['endpoints']]
+    names = [e.name for e in endpoints]
+    if len(set(names)) != len(names):
+        raise ValueError(f"エンドポイント名が重複しています: {names}")
+    return endpoints
+
+
+def load_prompts(path: Path) -> List[Tuple[str, str]]:
+    """プロンプト一覧を (ID, プロンプト) のリストで読み込む"""
+    path = Path(path)
+    if path.suffix.lower() != '.csv':
+        lines = path.read_text(encoding='utf-8').splitlines()
+        return [(str(i), line.strip()) for i, line in enumerate(lines, start=1) if line.strip()]
+
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        rows = [row for row in csv.reader(f) if row]
+    if rows and rows[0][0].strip().upper() == 'ID':
+        rows = rows[1:]
+    return [(row[0].strip(), row[1]) for row in rows if len(row) >= 2]
+
+
+# ===== 再開用の記録 =====
+def load_checkpoint(path: Path) -> Dict[str, Dict[str, str]]:
+    """チェックポイントから回答済みの {ID: {モデル名: 回答}} を読み込む（書きかけの行は無視）"""
+    answers: Dict[str, Dict[str, str]] = {}
+    if not path.exists():
+        return answers
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            answers.setdefault(record['id'], {})[record['endpoint']] = record['answer']
+    return answers
+
+
+def written_ids(path: Path) -> set:
+    """出力CSVに書き出し済みのID"""
+    if not path.exists():
+        return set()
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # ヘッダー
+        return {row[0] for row in reader if row}
+
+
+# ===== 問い合わせ =====
+async def ask(
+    session: aiohttp.ClientSession,
+    endpoint: Endpoint,
+    prompt: str,
+    max_retries: int,
+    total_limit: asyncio.Semaphore,
+    stats: Dict,
+    backoff_base: float = BACKOFF_BASE
+) -> str:
+    """
+    1件問い合わせて回答テキストを返す（再試行しても失敗した場合は例外）
+    total_limit は送信中のみ確保する（バックオフの待ち時間は他のリクエストに譲る）
+    """
+    for attempt in range(max_retries + 1):
+        await endpoint.limiter.wait()
+        try:
+            async with total_limit, session.post(
+                endpoint.url, json=endpoint.payload(prompt), headers=endpoint.headers
+            ) as resp:
+                stats['requests'] += 1
+                if resp.status in RETRY_STATUS:
+                    retry_after = resp.headers.get('Retry-After')
+                    raise RetryableError(
+                        f"HTTP {resp.status}",
+                        float(retry_after) if retry_after and retry_after.replace('.', '', 1).isdigit() else None
+                    )
+                resp.raise_for_status()
+                data = await resp.json(content_type=None)
+                return data['choices'][0]['message']['content']
+        except (RetryableError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+            if attempt == max_retries:
+                raise
+            stats['retries'] += 1
+            delay = getattr(e, 'retry_after', None)
+            if delay is None:
+                delay = min(BACKOFF_MAX, backoff_base * 2 ** attempt) * random.uniform(0.5, 1.0)
+            await asyncio.sleep(delay)
+
+
+async def collect(
+    prompts: List[Tuple[str, str]],
+    endpoints: List[Endpoint],
+    output: Path,
+    checkpoint: Optional[Path] = None,
+    concurrency: int = 16,
+    max_retries: int = 5,
+    timeout: float = 120.0,
+    progress: bool = True,
+    backoff_base: float = BACKOFF_BASE
+) -> Dict:
+    """
+    全プロンプト×全エンドポイントに問い合わせ、行がそろった順に output へ追記する
+    concurrency は全エンドポイント合計の同時リクエスト数の上限
+    Returns: 件数・再試行回数・失敗一覧などの集計
+    """
+    checkpoint = checkpoint or output.with_name(output.name + '.checkpoint.jsonl')
+    done_ids = written_ids(output)
+    answers = load_checkpoint(checkpoint)
+    pending = [(pid, prompt) for pid, prompt in prompts if pid not in done_ids]
+    prompt_text = dict(pending)
+
+    stats = {'prompts': len(prompts), 'skipped': len(prompts) - len(pending), 'written': 0,
+             'requests': 0, 'retries': 0, 'failed': []}
+
+    header = ['ID', 'プロンプト'] + [answer_column(e.name) for e in endpoints]
+    output.parent.mkdir(parents=True, exist_ok=True)
+    new_file = not output.exists()
+    if not new_file:
+        with open(output, newline='', encoding='utf-8') as f:
+            existing = next(csv.reader(f), None)
+        if existing and existing != header:
+            raise ValueError(f"出力CSVの列がエンドポイント設定と一致しません: {existing} / {header}")
+    # ファイルは with で開く（ヘッダーの書き込み・セッションの作成などで例外が出ても必ず閉じる）
+    with open(output, 'a', newline='', encoding='utf-8') as out_f, open(checkpoint, 'a', encoding='utf-8') as ckpt_f:
+        writer = csv.writer(out_f)
+        if new_file:
+            writer.writerow(header)
+            out_f.flush()
+
+        started = time.perf_counter()
+
+        def write_if_complete(pid: str):
+            row_answers = answers.get(pid, {})
+            if all(e.name in row_answers for e in endpoints):
+                writer.writerow([pid, prompt_text[pid]] + [row_answers[e.name] for e in endpoints])
+                out_f.flush()
+                answers.pop(pid, None)
+                stats['written'] += 1
+                if progress and stats['written'] % 50 == 0:
+                    rate = stats['written'] / (time.perf_counter() - started)
+                    print(f"[{stats['written']}/{len(pending)}] {rate:.1f}行/s", file=sys.stderr)
+
+        # チェックポイントだけで回答がそろっている行を先に書き出す
+        for pid, _ in pending:
+            write_if_complete(pid)
+
+        total_limit = asyncio.Semaphore(concurrency)
+        connector = aiohttp.TCPConnector(limit=concurrency, ttl_dns_cache=300)
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+
+            async def worker(endpoint: Endpoint, queue: asyncio.Queue):
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        return
+                    pid, prompt = item
+                    try:
+                        answer = await ask(session, endpoint, prompt, max_retries, total_limit, stats, backoff_base)
+                    except Exception as e:
+                        stats['failed'].append({'id': pid, 'endpoint': endpoint.name, 'error': f"{type(e).__name__}: {e}"})
+                        continue
+                    ckpt_f.write(json.dumps({'id': pid, 'endpoint': endpoint.name, 'answer': answer}, ensure_ascii=False) + '\n')
+                    ckpt_f.flush()
+                    answers.setdefault(pid, {})[endpoint.name] = answer
+                    write_if_complete(pid)
+
+            # エンドポイントごとにキューと担当ワーカーを分ける（遅いエンドポイントが他を待たせない）
+            workers = []
+            for endpoint in endpoints:
+                queue: asyncio.Queue = asyncio.Queue()
+                for pid, prompt in pending:
+                    if endpoint.name not in answers.get(pid, {}):
+                        queue.put_nowait((pid, prompt))
+                n_workers = max(1, min(endpoint.concurrency, concurrency, queue.qsize()))
+                for _ in range(n_workers):
+                    queue.put_nowait(None)
+                workers += [asyncio.create_task(worker(endpoint, queue)) for _ in range(n_workers)]
+
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                for task in workers:
+                    task.cancel()
+
+    stats['incomplete'] = len(pending) - stats['written']
+    stats['elapsed_s'] = round(time.perf_counter() - started, 3)
+    if stats['incomplete'] == 0:
+        checkpoint.unlink(missing_ok=True)  # 全行そろったら再開用の記録は不要
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LLMへの問い合わせでGEO分析用CSVを作成")
+    parser.add_argument('prompts', type=Path, help="プロンプト一覧（.txt: 1行1件 / .csv: ID, プロンプト）")
+    parser.add_argument('--endpoints', type=Path, required=True, help="エンドポイント設定JSON")
+    parser.add_argument('--output', type=Path, required=True, help="出力CSV（既存なら続きから追記）")
+    parser.add_argument('--checkpoint', type=Path, help="再開用の記録（省略時は <output>.checkpoint.jsonl）")
+    parser.add_argument('--concurrency', type=int, default=16, help="全エンドポイント合計の同時リクエスト数")
+    parser.add_argument('--retries', type=int, default=5, help="1リクエストあたりの再試行回数")
+    parser.add_argument('--timeout', type=float, default=120.0, help="1リクエストのタイムアウト（秒）")
+    parser.add_argument('--backoff', type=float, default=BACKOFF_BASE, help="再試行の初回待ち時間（秒。以降は倍々）")
+    args = parser.parse_args(argv)
+
+    try:
+        endpoints = load_endpoints(args.endpoints, args.concurrency)
+        prompts = load_prompts(args.prompts)
+        stats = asyncio.run(collect(
+            prompts, endpoints, args.output, args.checkpoint, args.concurrency, args.retries, args.timeout,
+            backoff_base=args.backoff
+        ))
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+
+    for failure in stats['failed'][:10]:
+        print(f"❌ ID {failure['id']} / {failure['endpoint']}: {failure['error']}", file=sys.stderr)
+    print(
+        f"✅ {stats['written']}行を書き出し（スキップ {stats['skipped']}行, 未完了 {stats['incomplete']}行, "
+        f"リクエスト {stats['requests']}件, 再試行 {stats['retries']}回, {stats['elapsed_s']:.1f}s） → {args.output}",
+        file=sys.stderr
+    )
+    if stats['incomplete']:
+        print("未完了の行は、同じコマンドを再実行すると続きから収集します", file=sys.stderr)
+    return 1 if stats['incomplete'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+GEO分析ダッシュボード - CSVエクスポート
+フィルター結果（行の位置インデックス）を一定行数ずつCSV化し、全体を一度に文字列化しない
+- 一時ファイルへの書き出し（gzip圧縮可）
+- 出力列の選択
+- 分析時に求めた行ごとの言及数・引用ドメインの追加
+"""
+
+import gzip
+import os
+import tempfile
+import time
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNK_ROWS = 5000
+DOMAIN_SEPARATOR = ";"
+
+# エクスポートの一時ファイルの置き場（セッションが終わっても残ったファイルは、一定時間後の次のエクスポート時に削除する）
+EXPORT_DIR = os.environ.get('GEO_EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'geo_exports'))
+EXPORT_MAX_AGE_S = 3600
+
+
+def analysis_columns(
+    row_mentions: Dict[str, np.ndarray],
+    row_domains: Dict[str, List[List[str]]],
+    main_brand: str
+) -> Dict[str, Sequence]:
+    """分析結果の行ごとの値を、エクスポート用の追加列（列名 → 全行分の値）にまとめる"""
+    columns: Dict[str, Sequence] = {}
+    for model, counts in row_mentions.items():
+        columns[f'{model}_{main_brand}言及数'] = counts
+    for model, domains in row_domains.items():
+        columns[f'{model}_引用ドメイン'] = domains
+    return columns
+
+
+def _take(values: Sequence, positions: np.ndarray) -> list:
+    """追加列の値をチャンク分だけ取り出す（リストは区切り文字で連結）"""
+    if isinstance(values, np.ndarray):
+        return values[positions].tolist()
+    taken = [values[i] for i in positions]
+    return [DOMAIN_SEPARATOR.join(v) if isinstance(v, list) else v for v in taken]
+
+
+def iter_csv_chunks(
+    df: pd.DataFrame,
+    row_indices: np.ndarray,
+    columns: Optional[List[str]] = None,
+    extra_columns: Optional[Dict[str, Sequence]] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS
+) -> Iterator[str]:
+    """
+    指定行を chunk_rows 行ずつCSV文字列として返す（ヘッダーは最初のチャンクのみ）
+    extra_columns は df と同じ行数の値の列で、各チャンクの右側に追加する
+    """
+    columns = list(df.columns) if columns is None else columns
+    extra_columns = extra_columns or {}
+    positions = [df.columns.get_loc(c) for c in columns]
+
+    if len(row_indices) == 0:
+        yield pd.DataFrame(columns=columns + list(extra_columns)).to_csv(index=False)
+        return
+
+    for start in range(0, len(row_indices), chunk_rows):
+        chunk_indices = row_indices[start:start + chunk_rows]
+        chunk = df.iloc[chunk_indices, positions]
+        if extra_columns:
+            chunk = chunk.assign(**{name: _take(values, chunk_indices) for name, values in extra_columns.items()})
+        yield chunk.to_csv(index=False, header=(start == 0))
+
+
+def write_csv(
+    path: str,
+    df: pd.DataFrame,
+    row_indices: np.ndarray,
+    columns: Optional[List[str]] = None,
+    extra_columns: Optional[Dict[str, Sequence]] = None,
+    compress: bool = False,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS
+) -> int:
+    """
+    チャンク単位でCSVファイルに書き出す（compress=True で gzip）
+    Returns: 書き出したバイト数（圧縮後）
+    """
+    opener = gzip.open if compress else open
+    with opener(path, 'wt', encoding='utf-8', newline='') as f:
+        for chunk in iter_csv_chunks(df, row_indices, columns, extra_columns, chunk_rows):
+            f.write(chunk)
+    return os.path.getsize(path)
+
+
+def export_to_tempfile(
+    df: pd.DataFrame,
+    row_indices: np.ndarray,
+    columns: Optional[List[str]] = None,
+    extra_columns: Optional[Dict[str, Sequence]] = None,
+    compress: bool = False,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS
+) -> str:
+    """
+    EXPORT_DIR の一時ファイルに書き出してパスを返す（不要になったら呼び出し側で削除する）
+    削除されずに EXPORT_MAX_AGE_S 以上経ったファイルは、ここで書き出す前に削除する
+    """
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    sweep_exports()
+    fd, path = tempfile.mkstemp(prefix="geo_export_", suffix=".csv.gz" if compress else ".csv", dir=EXPORT_DIR)
+    os.close(fd)
+    try:
+        write_csv(path, df, row_indices, columns, extra_columns, compress, chunk_rows)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def sweep_exports(directory: str = EXPORT_DIR, max_age_s: float = EXPORT_MAX_AGE_S) -> int:
+    """directory 内の古いエクスポートファイルを削除し、削除した件数を返す"""
+    removed = 0
+    cutoff = time.time() - max_age_s
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        if not entry.name.startswith("geo_export_"):
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            continue  # 他のセッションが先に削除した
+    return removed
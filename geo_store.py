@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+GEO分析 - 分析結果の履歴ストア（SQLite）
+分析のたびにモデル別・ブランド別の言及率とドメイン別引用数を、日時・データセットのハッシュと一緒に保存する
+推移グラフは保存済みの集計値をインデックス経由で引くだけで、過去のCSVを再分析しない
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+DEFAULT_STORE_PATH = Path(os.environ.get(
+    'GEO_STORE_PATH',
+    Path(__file__).resolve().parent / "data" / "geo_history.sqlite"
+))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    dataset_hash TEXT NOT NULL,
+    config_hash TEXT NOT NULL,
+    dataset_name TEXT,
+    main_brand TEXT NOT NULL,
+    competitors TEXT NOT NULL,
+    rows INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_runs_dataset ON runs (dataset_hash, config_hash);
+CREATE INDEX IF NOT EXISTS idx_runs_brand_time ON runs (main_brand, created_at);
+
+CREATE TABLE IF NOT EXISTS model_stats (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    model TEXT NOT NULL,
+    total_urls INTEGER NOT NULL,
+    unique_domains INTEGER NOT NULL,
+    PRIMARY KEY (run_id, model)
+);
+
+CREATE TABLE IF NOT EXISTS rates (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    model TEXT NOT NULL,
+    brand TEXT NOT NULL,
+    is_main INTEGER NOT NULL,
+    mention_rate REAL NOT NULL,
+    PRIMARY KEY (run_id, model, brand)
+);
+CREATE INDEX IF NOT EXISTS idx_rates_brand ON rates (brand, model, run_id);
+
+CREATE TABLE IF NOT EXISTS domains (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    model TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (run_id, model, domain)
+);
+CREATE INDEX IF NOT EXISTS idx_domains_domain ON domains (domain, run_id);
+"""
+
+
+def dataset_hash(df: pd.DataFrame) -> str:
+    """データセットの内容ハッシュ（行ごとのハッシュをまとめてSHA-1にする）"""
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.sha1(row_hashes.tobytes())
+    digest.update(json.dumps([str(c) for c in df.columns], ensure_ascii=False).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def config_hash(main_brand: str, competitors: List[str], settings: Optional[Dict] = None) -> str:
+    """ブランド設定（別名などを含む）のハッシュ（同じデータを同じ設定で分析した結果は1件だけ保存する）"""
+    payload = json.dumps(
+        {'main_brand': main_brand, 'competitors': competitors, 'settings': settings or {}},
+        ensure_ascii=False, sort_keys=True
+    )
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class ResultStore:
+    """分析結果の履歴（SQLiteファイル1つ）"""
+
+    def __init__(self, path: Path = DEFAULT_STORE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def save_run(
+        self,
+        results: Dict,
+        main_brand: str,
+        competitors: List[str],
+        data_hash: str,
+        rows: int,
+        dataset_name: str = "",
+        created_at: Optional[str] = None,
+        settings: Optional[Dict] = None
+    ) -> int:
+        """
+        分析結果を保存してrun IDを返す
+        同じデータセット・同じブランド設定（settings: 別名などの分析設定）の結果が保存済みなら、保存せずに既存のIDを返す
+        """
+        cfg_hash = config_hash(main_brand, competitors, settings)
+        with closing(self._connect()) as conn, conn:
+            existing = conn.execute(
+                "SELECT id FROM runs WHERE dataset_hash = ? AND config_hash = ?", (data_hash, cfg_hash)
+            ).fetchone()
+            if existing:
+                return existing[0]
+
+            cursor = conn.execute(
+                "INSERT INTO runs (created_at, dataset_hash, config_hash, dataset_name, main_brand, competitors, rows) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    created_at or datetime.now().isoformat(timespec='seconds'),
+                    data_hash, cfg_hash, dataset_name, main_brand,
+                    json.dumps(competitors, ensure_ascii=False), rows
+                )
+            )
+            run_id = cursor.lastrowid
+
+            for model, result in results.items():
+                conn.execute(
+                    "INSERT INTO model_stats VALUES (?, ?, ?, ?)",
+                    (run_id, model, result['total_urls'], result['unique_domains'])
+                )
+                rate_rows = [(run_id, model, main_brand, 1, result['main_brand_rate'])]
+                rate_rows += [
+                    (run_id, model, brand, 0, rate)
+                    for brand, rate in result['competitor_rates'].items() if brand != main_brand
+                ]
+                conn.executemany("INSERT INTO rates VALUES (?, ?, ?, ?, ?)", rate_rows)
+                conn.executemany(
+                    "INSERT INTO domains VALUES (?, ?, ?, ?)",
+                    [(run_id, model, domain, count) for domain, count in result['top_domains'].items()]
+                )
+            return run_id
+
+    def list_runs(self, main_brand: Optional[str] = None, limit: int = 500) -> pd.DataFrame:
+        """保存済みの実行一覧（新しい順）"""
+        query = "SELECT id, created_at, dataset_name, main_brand, rows, dataset_hash FROM runs"
+        params: list = []
+        if main_brand:
+            query += " WHERE main_brand = ?"
+            params.append(main_brand)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(query, conn, params=params)
+
+    def count_runs(self, main_brand: Optional[str] = None) -> int:
+        """保存済みの実行数（list_runs は新しい順に limit 件までなので、全体の件数はこちらで数える）"""
+        query = "SELECT COUNT(*) FROM runs" + (" WHERE main_brand = ?" if main_brand else "")
+        with closing(self._connect()) as conn:
+            return conn.execute(query, (main_brand,) if main_brand else ()).fetchone()[0]
+
+    def main_brands(self) -> List[str]:
+        """履歴があるメインブランドの一覧（新しい実行があるものから）"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT main_brand FROM runs GROUP BY main_brand ORDER BY MAX(created_at) DESC"
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def known_models(self, main_brand: str) -> List[str]:
+        """メインブランドの実行で保存されているモデルの一覧"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT x.model FROM runs r JOIN rates x ON x.run_id = r.id "
+                "WHERE r.main_brand = ? ORDER BY x.model",
+                (main_brand,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def brand_trend(self, main_brand: str, brands: Optional[List[str]] = None, since: Optional[str] = None) -> pd.DataFrame:
+        """
+        メインブランドで分析した実行の、ブランド別・モデル別言及率の推移
+        brands を省略するとメインブランドのみ
+        """
+        brands = brands or [main_brand]
+        query = (
+            "SELECT r.id AS run_id, r.created_at, r.dataset_name, x.model, x.brand, x.is_main, x.mention_rate "
+            "FROM runs r JOIN rates x ON x.run_id = r.id "
+            f"WHERE r.main_brand = ? AND x.brand IN ({','.join('?' * len(brands))})"
+        )
+        params = [main_brand] + list(brands)
+        if since:
+            query += " AND r.created_at >= ?"
+            params.append(since)
+        query += " ORDER BY r.created_at"
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(query, conn, params=params, parse_dates=['created_at'])
+
+    def known_brands(self, main_brand: str) -> List[str]:
+        """メインブランドの実行で保存されている競合ブランドの一覧"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT x.brand FROM runs r JOIN rates x ON x.run_id = r.id "
+                "WHERE r.main_brand = ? AND x.is_main = 0 ORDER BY x.brand",
+                (main_brand,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def domain_trend(self, main_brand: str, top_n: int = 10, since: Optional[str] = None) -> pd.DataFrame:
+        """引用回数の多いドメイン上位 top_n の推移（全モデル合計）"""
+        where = "WHERE r.main_brand = ?" + (" AND r.created_at >= ?" if since else "")
+        params = [main_brand] + ([since] if since else [])
+        query = (
+            "WITH scoped AS ("
+            "  SELECT r.id AS run_id, r.created_at, d.domain, SUM(d.count) AS count "
+            f"  FROM runs r JOIN domains d ON d.run_id = r.id {where} "
+            "  GROUP BY r.id, d.domain"
+            "), top AS ("
+            "  SELECT domain FROM scoped GROUP BY domain ORDER BY SUM(count) DESC LIMIT ?"
+            ") "
+            "SELECT run_id, created_at, domain, count FROM scoped WHERE domain IN (SELECT domain FROM top) "
+            "ORDER BY created_at"
+        )
+        with closing(self._connect()) as conn:
+            return pd.read_sql_query(query, conn, params=params + [top_n], parse_dates=['created_at'])
+
+    def delete_run(self, run_id: int):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM runs WHERE id = ?", (run_id,))
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+GEO分析ダッシュボード - 詳細データのページ表示
+DataFrameはコピーせず、フィルター結果を行番号（位置インデックス）の配列として保持し、
+表示するページ分の行だけを取り出す
+"""
+
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def filter_row_indices(
+    df: pd.DataFrame,
+    search_term: str = "",
+    row_mask: Optional[np.ndarray] = None,
+    search_column: str = 'プロンプト'
+) -> np.ndarray:
+    """
+    フィルター条件に該当する行の位置インデックスを返す
+    - search_term: search_column の部分一致（大文字小文字を区別しない）
+    - row_mask: 行ごとの真偽値（ブランド言及ありの行のみ、など）
+    """
+    mask = np.ones(len(df), dtype=bool)
+
+    if search_term and search_column in df.columns:
+        mask &= df[search_column].str.contains(search_term, case=False, na=False, regex=False).to_numpy(dtype=bool)
+
+    if row_mask is not None:
+        mask &= row_mask
+
+    return np.flatnonzero(mask)
+
+
+def page_count(total_rows: int, page_size: int) -> int:
+    """ページ数（0件でも1ページ）"""
+    return max((total_rows + page_size - 1) // page_size, 1)
+
+
+def page_rows(
+    df: pd.DataFrame,
+    row_indices: np.ndarray,
+    page: int,
+    page_size: int,
+    columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """指定ページの行だけを取り出す（表示列のみ）"""
+    start = page * page_size
+    visible = row_indices[start:start + page_size]
+    if columns is None:
+        return df.iloc[visible]
+    return df.iloc[visible, [df.columns.get_loc(c) for c in columns]]
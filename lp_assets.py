@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+LP Template Manager - base64埋め込み画像のアセット化
+HTML内の data:image/...;base64 をデコードして内容のハッシュ名で1回だけ保存し、HTMLは保存先のURL参照に書き換える
+保存先は Streamlit の静的ファイル配信（static/、.streamlit/config.toml で有効化）なので、プレビューのiframeからそのまま表示できる
+Pillow がインストールされていれば、大きな画像は縮小・再圧縮してから保存する（小さくなった場合のみ）
+どのセッションのテンプレートからも参照されなくなったアセットは sweep で削除する
+"""
+
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Set, Tuple
+
+DEFAULT_ASSET_DIR = Path(os.environ.get('LP_ASSET_DIR', 'static/lp_assets'))
+DEFAULT_ASSET_URL = os.environ.get('LP_ASSET_URL', '/app/static/lp_assets')
+
+RECOMPRESS_BYTES = 300 * 1024  # これより大きい画像を再圧縮の対象にする
+MAX_DIMENSION = 1920  # 再圧縮時の長辺の上限（px）
+MIN_SAVING = 0.1  # 再圧縮で1割以上小さくならなければ元の画像を使う（再圧縮済みの画像を何度も作り直さない）
+SWEEP_MIN_AGE_S = 3600  # これより最近保存・使用したアセットは参照がなくても削除しない（保存してから参照を登録するまでの間に消さない）
+
+# 静的ファイル配信が画像として返す形式のみ（SVGは text/plain になるので埋め込みのまま残す）
+EXTENSIONS = {'png': '.png', 'jpeg': '.jpg', 'jpg': '.jpg', 'gif': '.gif', 'webp': '.webp'}
+MIME_TYPES = {'.png': 'image/png', '.jpg': 'image/jpeg', '.gif': 'image/gif', '.webp': 'image/webp'}
+
+_DATA_URL = re.compile(r'data:image/(png|jpe?g|gif|webp);base64,([A-Za-z0-9+/=\s]+)', re.IGNORECASE)
+_ASSET_NAME = r'([0-9a-f]{64}\.(?:png|jpg|gif|webp))'
+
+
+class AssetStore:
+    """内容のSHA-256を名前にした画像ファイルの置き場（同じ画像は何度保存しても1ファイル）"""
+
+    def __init__(self, directory: Path = DEFAULT_ASSET_DIR, url_prefix: str = DEFAULT_ASSET_URL):
+        self.directory = Path(directory)
+        self.url_prefix = url_prefix.rstrip('/')
+        self._reference = re.compile(re.escape(self.url_prefix) + '/' + _ASSET_NAME)
+        # セッションごとの参照中のアセット名（sweep はどのセッションも参照していないものだけを削除する）
+        self._claims: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, data: bytes, extension: str) -> str:
+        """画像を保存してアセット名を返す（既にあれば書き込まず、使用した時刻だけ更新する）"""
+        name = asset_name(data, extension)
+        path = self.directory / name
+        try:
+            with self._lock:  # sweep が削除している最中に使用時刻を更新しない
+                os.utime(path)
+            return name
+        except FileNotFoundError:
+            pass
+
+        # 同じ画像を複数のセッションが同時に保存しても衝突しないよう、一時ファイルは書き込みごとに別の名前にする
+        # （内容が同じなので、どちらの置き換えが後になっても結果は同じ）
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=name + '.', suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return name
+
+    def put_all(self, files: Dict[str, bytes]):
+        """prepare_images で作った {アセット名: 内容} を保存する"""
+        for name, data in files.items():
+            self.put(data, Path(name).suffix)
+
+    def claim(self, owner: str, names: Iterable[str], replace: bool = False):
+        """
+        owner（セッション）が参照しているアセット名を登録する（replace=True なら登録済みのものと入れ替える）
+        終了したセッションの登録は残るので、そのアセットは削除されない（プロセスの再起動まで）
+        """
+        with self._lock:
+            if replace:
+                self._claims[owner] = set(names)
+            else:
+                self._claims.setdefault(owner, set()).update(names)
+
+    def sweep(self, min_age_s: float = SWEEP_MIN_AGE_S) -> int:
+        """どのセッションも参照していないアセットファイルを削除し、削除した件数を返す（最近使用したものは残す）"""
+        if not self.directory.is_dir():
+            return 0
+        cutoff = time.time() - min_age_s
+        removed = 0
+        with self._lock:
+            claimed = set().union(*self._claims.values())
+            for path in self.directory.iterdir():
+                if not re.fullmatch(_ASSET_NAME, path.name) or path.name in claimed:
+                    continue
+                try:
+                    if path.stat().st_mtime < cutoff:
+                        path.unlink()
+                        removed += 1
+                except FileNotFoundError:
+                    continue
+        return removed
+
+    def read(self, name: str) -> bytes:
+        return (self.directory / name).read_bytes()
+
+    def url(self, name: str) -> str:
+        return f"{self.url_prefix}/{name}"
+
+    def references(self, html_content: str) -> Set[str]:
+        """HTMLが参照しているアセット名"""
+        return set(self._reference.findall(html_content or ''))
+
+    def inline(self, html_content: str) -> str:
+        """アセット参照を data URL に戻す（単体で開けるHTMLのダウンロード用。見つからないものはそのまま）"""
+        def replace(match):
+            name = match.group(1)
+            try:
+                data = self.read(name)
+            except OSError:
+                return match.group(0)
+            return f"data:{MIME_TYPES[Path(name).suffix]};base64,{base64.b64encode(data).decode('ascii')}"
+        return self._reference.sub(replace, html_content)
+
+    def export(self, names: Iterable[str]) -> Dict[str, str]:
+        """エクスポートJSONに含める {アセット名: base64}（見つからないものは除く）"""
+        assets = {}
+        for name in sorted(names):
+            try:
+                assets[name] = base64.b64encode(self.read(name)).decode('ascii')
+            except OSError:
+                continue
+        return assets
+
+    def load(self, assets: Dict[str, str]) -> int:
+        """エクスポートJSONのアセットを保存し、保存した件数を返す（base64として不正なもの・名前と内容が一致しないものは無視）"""
+        count = 0
+        for name, encoded in assets.items():
+            if not re.fullmatch(_ASSET_NAME, name) or not isinstance(encoded, str):
+                continue
+            try:
+                data = base64.b64decode(encoded, validate=True)
+            except (binascii.Error, ValueError):
+                continue
+            if self.put(data, Path(name).suffix) == name:
+                count += 1
+        return count
+
+
+def recompress_image(data: bytes, extension: str) -> Tuple[bytes, str]:
+    """大きな画像を縮小・再圧縮する（Pillowがない・あまり小さくならない・アニメーションの場合は元のまま）"""
+    original_extension = extension
+    if len(data) <= RECOMPRESS_BYTES:
+        return data, extension
+    try:
+        from PIL import Image
+    except ImportError:
+        return data, extension
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        if getattr(image, 'is_animated', False):
+            return data, extension
+        image.thumbnail((MAX_DIMENSION, MAX_DIMENSION))
+        output = io.BytesIO()
+        if extension == '.png':
+            image.save(output, format='PNG', optimize=True)
+        elif extension == '.webp':
+            image.save(output, format='WEBP', quality=85)
+        elif extension == '.gif' and 'transparency' in image.info:
+            return data, extension
+        else:
+            # JPEGと静止画のGIFはJPEGで保存し直す
+            image.convert('RGB').save(output, format='JPEG', quality=85, optimize=True)
+            extension = '.jpg'
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return data, original_extension
+
+    compressed = output.getvalue()
+    if len(compressed) > len(data) * (1 - MIN_SAVING):
+        return data, original_extension
+    return compressed, extension
+
+
+def asset_name(data: bytes, extension: str) -> str:
+    """内容のSHA-256によるアセット名"""
+    return hashlib.sha256(data).hexdigest() + extension
+
+
+def prepare_images(html_content: str, store: AssetStore, recompress: bool = True) -> Tuple[str, Dict, Dict[str, bytes]]:
+    """
+    base64埋め込み画像をデコードし、URL参照に書き換えたHTMLを返す（ファイルにはまだ書き込まない）
+    書き換え後のHTMLを検証してから store.put_all(files) で保存する
+    戻り値: (書き換えたHTML, {'images': 件数, 'assets': アセット名のリスト,
+                              'embedded_bytes': デコード後の合計, 'stored_bytes': 保存する合計}, {アセット名: 内容})
+    """
+    stats = {'images': 0, 'assets': [], 'embedded_bytes': 0, 'stored_bytes': 0}
+    files: Dict[str, bytes] = {}
+
+    def replace(match):
+        try:
+            data = base64.b64decode(re.sub(r'\s+', '', match.group(2)), validate=True)
+        except (binascii.Error, ValueError):
+            return match.group(0)
+        extension = EXTENSIONS[match.group(1).lower()]
+        if recompress:
+            data_out, extension = recompress_image(data, extension)
+        else:
+            data_out = data
+        name = asset_name(data_out, extension)
+        stats['images'] += 1
+        stats['embedded_bytes'] += len(data)
+        files[name] = data_out
+        return store.url(name)
+
+    html_content = _DATA_URL.sub(replace, html_content)
+    stats['assets'] = list(files)
+    stats['stored_bytes'] = sum(len(data) for data in files.values())
+    return html_content, stats, files
+
+
+def extract_images(html_content: str, store: AssetStore, recompress: bool = True) -> Tuple[str, Dict]:
+    """
+    base64埋め込み画像をアセットとして保存し、URL参照に書き換えたHTMLを返す
+    戻り値: (書き換えたHTML, prepare_images と同じ統計)
+    """
+    html_content, stats, files = prepare_images(html_content, store, recompress)
+    store.put_all(files)
+    return html_content, stats
+
+
+def referenced_assets(templates: Iterable[Dict], store: AssetStore) -> Set[str]:
+    """テンプレート（辞書・TemplateRecord）が参照しているアセット名の集合"""
+    names: Set[str] = set()
+    for template in templates:
+        for field in ('html_content', 'html_sanitized'):
+            names |= store.references(template.get(field) or '')
+    return names
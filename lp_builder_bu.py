@@ -8,85 +8,35 @@ ChatGPTが生成したHTML+CSSをそのまま貼り付けて使える
 import streamlit as st
 import json
 import re
+import uuid
 from datetime import datetime
 from typing import Dict, List, Optional
 import html
+from pathlib import Path
 
-# ページ設定
-st.set_page_config(
-    page_title="LP Template Manager - HTML Edition",
-    page_icon="🎨",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# CSS：シンプルで安全なスタイル
-st.markdown("""
-<style>
-    /* 基本スタイル */
-    .main {
-        background-color: #ffffff;
-        color: #1a1a1a;
-    }
-    
-    /* 入力項目のラベルを見やすく */
-    label, .stTextInput label, .stTextArea label, .stSelectbox label, .stRadio label {
-        color: #000000 !important;
-        font-weight: 600 !important;
-        font-size: 14px !important;
-    }
-    
-    /* タイトル */
-    h1, h2, h3 {
-        color: #1a1a1a;
-        font-weight: 700;
-    }
-    
-    /* ボタン */
-    .stButton>button {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        border: none;
-        border-radius: 8px;
-        padding: 0.5rem 2rem;
-        font-weight: 600;
-        transition: all 0.3s ease;
-    }
-    
-    .stButton>button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 10px 20px rgba(102, 126, 234, 0.3);
-    }
-    
-    /* カード */
-    .template-card {
-        background: white;
-        border: 1px solid #e0e0e0;
-        border-radius: 12px;
-        padding: 1.5rem;
-        margin-bottom: 1rem;
-        box-shadow: 0 2px 8px rgba(0,0,0,0.05);
-        transition: all 0.3s ease;
-    }
-    
-    .template-card:hover {
-        box-shadow: 0 4px 16px rgba(0,0,0,0.1);
-        transform: translateY(-2px);
-    }
-    
-    /* 成功・警告メッセージ */
-    .stSuccess, .stWarning, .stInfo {
-        border-radius: 8px;
-        padding: 1rem;
-    }
-    
-    /* コードエディタエリア */
-    .stTextArea textarea {
-        font-family: 'Courier New', monospace;
-        font-size: 12px;
-    }
-</style>
-""", unsafe_allow_html=True)
+from lp_assets import AssetStore, prepare_images, referenced_assets
+from lp_dedupe import DUPLICATE_THRESHOLD, DuplicateIndex, template_signature
+from lp_prompts import PromptFieldError, PromptRegistry, parse_step1_records
+from lp_records import TemplateRecord, to_dicts, to_records
+from lp_similar import SimilarityIndex, query_features, template_features
+from lp_versions import RevisionHistory, revision_labels, side_by_side
+from perf import current as current_perf, discard_perf, finish_perf, start_perf
+
+CSS_PATH = Path(__file__).resolve().parent / "styles" / "lp_builder.css"
+
+# ===== スタイル =====
+@st.cache_resource
+def load_css() -> str:
+    """
+    CSSファイルを読み込み、コメント・余分な空白を除去して<style>タグで包む
+    Streamlitは再実行ごとに画面を組み直すため注入自体は毎回必要だが、
+    ファイル読み込みと圧縮はプロセスごとに一度だけ行う
+    """
+    css = CSS_PATH.read_text(encoding='utf-8')
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{}:;,>])\s*', r'\1', css)
+    return f"<style>{css.strip()}</style>"
 
 # ===== セキュリティ関数 =====
 def sanitize_html_basic(text: str) -> str:
@@ -144,6 +94,21 @@ def check_html_size(html_content: str, max_size_mb: float = 1.0) -> tuple[bool,
     
     return True, ""
 
+MAX_PASTE_SIZE_MB = 20.0  # 貼り付けたHTMLの上限（埋め込み画像を含む。画像ファイルにする前に確かめる）
+MAX_EMBEDDED_IMAGES_MB = 10.0  # デコードした埋め込み画像の合計の上限
+
+def check_embedded_images_size(embedded_bytes: int, max_size_mb: float = MAX_EMBEDDED_IMAGES_MB) -> tuple[bool, str]:
+    """
+    デコードした埋め込み画像の合計サイズチェック
+    Returns: (is_valid, error_message)
+    """
+    size_mb = embedded_bytes / (1024 * 1024)
+    
+    if size_mb > max_size_mb:
+        return False, f"埋め込み画像が大きすぎます: 合計{size_mb:.2f}MB (上限: {max_size_mb}MB)"
+    
+    return True, ""
+
 def check_base64_images(html_content: str) -> tuple[bool, str]:
     """
     base64埋め込み画像のチェック
@@ -169,98 +134,274 @@ def validate_html_structure(html_content: str) -> tuple[bool, str]:
     
     return True, ""
 
-# ===== セッション状態の初期化 =====
-if 'templates' not in st.session_state:
-    st.session_state.templates = []
+# ===== プロンプトテンプレート =====
+@st.cache_resource
+def get_prompt_registry() -> PromptRegistry:
+    """prompts/ のテンプレートを起動時に一度だけ読み込み・コンパイル"""
+    return PromptRegistry.from_directory()
 
-if 'drafts' not in st.session_state:
-    st.session_state.drafts = []
+@st.cache_resource
+def get_asset_store() -> AssetStore:
+    """埋め込み画像の保存先（static/lp_assets。全セッションで共有）"""
+    return AssetStore()
 
-if 'current_mode' not in st.session_state:
-    st.session_state.current_mode = 'template'
+def session_asset_names() -> set:
+    """このセッションが参照している画像アセット（テンプレートの過去の版・下書き・Step 2で検証したHTMLを含む）"""
+    store = get_asset_store()
+    names = referenced_assets(list(st.session_state.templates) + list(st.session_state.drafts), store)
+    for template in st.session_state.templates:
+        if template.history is not None:
+            for number in range(1, len(template.history)):
+                names |= store.references(template.history.text(number))
+    step2 = st.session_state.get('step2_html')
+    if step2 and step2['type'] == 'html':
+        names |= store.references(step2['original'])
+    return names
+
+def sweep_unused_assets():
+    """テンプレートの削除・インポート後に、このセッションの参照を登録し直し、どのセッションも参照していないアセットを削除"""
+    store = get_asset_store()
+    with current_perf().stage("アセットの整理"):
+        store.claim(st.session_state.asset_owner, session_asset_names(), replace=True)
+        store.sweep()
 
 # ===== テンプレート管理関数 =====
-def save_template(template_data: Dict):
-    """テンプレートを保存"""
+def next_template_id(templates: List[Dict]) -> int:
+    """未使用のテンプレートID（削除後も既存IDと重ならないよう最大値+1）"""
+    return max((t.get('id', 0) for t in templates), default=0) + 1
+
+def save_template(template_data: Dict, signature=None):
+    """テンプレートを保存（HTMLは圧縮して保持。重複チェック・類似検索の索引も更新）"""
     template_data['created_at'] = datetime.now().isoformat()
-    template_data['id'] = len(st.session_state.templates) + 1
-    st.session_state.templates.append(template_data)
+    template_data['id'] = next_template_id(st.session_state.templates)
+    st.session_state.templates.append(TemplateRecord.from_dict(template_data))
+    if signature is None:
+        signature = template_signature(template_data)
+    st.session_state.dup_index.add(template_data['id'], signature)
+    st.session_state.similar_index.add(template_data['id'], template_features(template_data))
+
+# 新しい版として保存するときに、Step 1の入力で置き換えられるテンプレート情報（版管理するのはHTMLのみ）
+REVISION_METADATA_FIELDS = ('name', 'category', 'source_url', 'industry', 'notes')
+
+def save_revision(template: TemplateRecord, template_data: Dict, signature=None,
+                  update_metadata: bool = False) -> Optional[int]:
+    """
+    既存テンプレートの新しい版として保存し、版番号を返す（以前の版は差分で履歴に残す）
+    HTMLが最新版と同じ場合は版を作らずに None を返す
+    update_metadata: テンプレート名などの情報も template_data の値に更新する（情報は版管理しない）
+    """
+    if update_metadata:
+        for field in REVISION_METADATA_FIELDS:
+            if template_data.get(field) is not None:
+                setattr(template, field, template_data[field])
+    if template_data['html_content'] == template.html_content:
+        if update_metadata:
+            st.session_state.similar_index.add(template.id, template_features(template))
+        return None
+    
+    saved_at = datetime.now().isoformat()
+    if template.history is None:
+        template.history = RevisionHistory.start(template.html_content or '', template.created_at)
+    number = template.history.append(template_data['html_content'], saved_at)
+    template.set_html(template_data['html_content'], template_data['html_sanitized'])
+    template.extra['updated_at'] = saved_at
+    if signature is None:
+        signature = template_signature(template_data)
+    st.session_state.dup_index.add(template.id, signature)
+    st.session_state.similar_index.add(template.id, template_features(template))
+    return number
+
+def restore_revision(template: TemplateRecord, number: int) -> Optional[int]:
+    """過去の版の内容を新しい版として保存し直す（最新版と同じ内容なら何もしない）"""
+    html_content = template.history.text(number)
+    return save_revision(template, {'html_content': html_content, 'html_sanitized': sanitize_user_html(html_content)})
+
+def delete_template(template: TemplateRecord):
+    """テンプレートを削除"""
+    st.session_state.templates.remove(template)
+    st.session_state.dup_index.remove(template['id'])
+    st.session_state.similar_index.remove(template['id'])
+
+def build_template_indexes(templates: Optional[List[Dict]] = None):
+    """
+    重複チェック・類似検索の索引をテンプレート一覧から作り直す
+    templates: 展開済みの辞書があれば渡す（省略時はセッションのテンプレートを展開して使う）
+    """
+    if templates is None:
+        templates = st.session_state.templates
+    with current_perf().stage("索引の作成"):
+        st.session_state.dup_index = DuplicateIndex.build(templates)
+        st.session_state.similar_index = SimilarityIndex.build(templates)
+
+def assign_template_ids(templates: List[Dict]) -> List[Dict]:
+    """IDがない・重複しているテンプレートに新しいIDを振る（古いエクスポートの読み込み用）"""
+    seen = set()
+    next_id = next_template_id(templates)
+    for template in templates:
+        if template.get('id') in seen or not isinstance(template.get('id'), int):
+            template['id'] = next_id
+            next_id += 1
+        seen.add(template['id'])
+    return templates
+
+def find_duplicates(signature, exclude: Optional[int] = None) -> List[tuple]:
+    """登録済みテンプレートのうち、署名が似ているもの [(テンプレート, 類似度), ...]"""
+    by_id = {t['id']: t for t in st.session_state.templates}
+    return [(by_id[key], score) for key, score in st.session_state.dup_index.query(signature, exclude=exclude) if key in by_id]
 
 def save_draft(draft_data: Dict):
     """下書きを保存"""
     draft_data['saved_at'] = datetime.now().isoformat()
     draft_data['id'] = len(st.session_state.drafts) + 1
-    st.session_state.drafts.append(draft_data)
+    st.session_state.drafts.append(TemplateRecord.from_dict(draft_data))
 
-def export_templates() -> str:
-    """全テンプレートをJSON文字列としてエクスポート"""
+def serialize_library(templates: List[Dict], drafts: List[Dict], assets: Optional[Dict[str, str]] = None) -> str:
+    """テンプレート・下書き（と参照している画像アセット）をエクスポート用のJSON文字列に変換"""
     export_data = {
-        'templates': st.session_state.templates,
-        'drafts': st.session_state.drafts,
+        'templates': templates,
+        'drafts': drafts,
         'exported_at': datetime.now().isoformat()
     }
+    if assets:
+        export_data['assets'] = assets
     return json.dumps(export_data, indent=2, ensure_ascii=False)
 
+def parse_library(json_str: str) -> Dict:
+    """エクスポートJSONを読み込む（含まれているキーのみ返す）"""
+    data = json.loads(json_str)
+    return {key: data[key] for key in ('templates', 'drafts', 'assets') if key in data}
+
+def export_templates() -> str:
+    """全テンプレートをJSON文字列としてエクスポート（画像アセットは同じものを1回だけ含める）"""
+    templates = to_dicts(st.session_state.templates)
+    drafts = to_dicts(st.session_state.drafts)
+    store = get_asset_store()
+    return serialize_library(templates, drafts, store.export(referenced_assets(templates + drafts, store)))
+
 def import_templates(json_str: str) -> bool:
     """JSON文字列からテンプレートをインポート"""
     try:
-        data = json.loads(json_str)
+        data = parse_library(json_str)
+        if 'assets' in data:
+            get_asset_store().load(data['assets'])
         if 'templates' in data:
-            st.session_state.templates = data['templates']
+            templates = assign_template_ids(data['templates'])
+            previous_index = st.session_state.get('dup_index')
+            build_template_indexes(templates)
+            st.session_state.templates = to_records(templates)
+            flag_imported_duplicates(previous_index)
         if 'drafts' in data:
-            st.session_state.drafts = data['drafts']
+            st.session_state.drafts = to_records(data['drafts'])
+        # 置き換えられたライブラリだけが参照していたアセットを削除
+        sweep_unused_assets()
         return True
     except Exception as e:
         st.error(f"インポートエラー: {str(e)}")
         return False
 
-# ===== サイドバー =====
-with st.sidebar:
-    st.title("🎨 LP Template Manager")
-    st.markdown("### HTML Edition")
-    st.markdown("---")
-    
-    mode = st.radio(
-        "モード選択",
-        options=['template', 'design'],
-        format_func=lambda x: "📝 テンプレート登録" if x == 'template' else "🎨 デザイン作成"
-    )
-    st.session_state.current_mode = mode
-    
-    st.markdown("---")
-    st.markdown("### 📊 統計")
-    st.metric("登録テンプレート", len(st.session_state.templates))
-    st.metric("下書き", len(st.session_state.drafts))
-    
-    # テンプレート形式の内訳
-    html_count = sum(1 for t in st.session_state.templates if t.get('template_type') == 'html')
-    json_count = sum(1 for t in st.session_state.templates if t.get('template_type') == 'json')
-    st.caption(f"HTML形式: {html_count} / JSON形式: {json_count}")
-    
-    st.markdown("---")
-    st.markdown("### 💾 データ管理")
-    
-    # エクスポート
-    if st.button("📤 全データをエクスポート"):
-        export_json = export_templates()
-        st.download_button(
-            label="💾 JSONをダウンロード",
-            data=export_json,
-            file_name=f"lp_templates_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-            mime="application/json"
+def flag_imported_duplicates(previous_index: Optional[DuplicateIndex]):
+    """
+    インポートしたテンプレートの重複を調べる（署名はインポート時に作った索引のものを使う）
+    インポートしたもの同士の重複は重複チェックの結果に入れ、インポート前のライブラリとほぼ同じものは件数を通知する
+    """
+    index = st.session_state.dup_index
+    with current_perf().stage("重複チェック"):
+        groups = index.duplicate_groups()
+        existing = 0
+        if previous_index is not None:
+            existing = sum(1 for signature in index.signatures.values() if previous_index.query(signature))
+    st.session_state.dedupe_report = groups
+    if groups or existing:
+        st.session_state.import_duplicates = {
+            'groups': len(groups),
+            'duplicates': sum(len(g) - 1 for g in groups),
+            'existing': existing,
+        }
+
+# ===== 画面描画 =====
+def init_session_state():
+    """セッション状態の初期化"""
+    if 'templates' not in st.session_state:
+        st.session_state.templates = []
+
+    if 'drafts' not in st.session_state:
+        st.session_state.drafts = []
+
+    if 'current_mode' not in st.session_state:
+        st.session_state.current_mode = 'template'
+
+    # 画像アセットの参照を登録するときのセッションの識別子（アセットは全セッションで共有）
+    if 'asset_owner' not in st.session_state:
+        st.session_state.asset_owner = uuid.uuid4().hex
+
+    # 重複チェック・類似検索の索引（テンプレート一覧と対応がずれていれば作り直す）
+    template_ids = {t['id'] for t in st.session_state.templates}
+    if any(name not in st.session_state or st.session_state[name].keys() != template_ids
+           for name in ('dup_index', 'similar_index')):
+        build_template_indexes()
+
+def render_sidebar():
+    """サイドバー（モード選択・統計・データ管理）"""
+    with st.sidebar:
+        st.title("🎨 LP Template Manager")
+        st.markdown("### HTML Edition")
+        st.markdown("---")
+        
+        mode = st.radio(
+            "モード選択",
+            options=['template', 'design'],
+            format_func=lambda x: "📝 テンプレート登録" if x == 'template' else "🎨 デザイン作成"
         )
-    
-    # インポート
-    uploaded_file = st.file_uploader("📥 JSONをインポート", type=['json'])
-    if uploaded_file:
-        json_str = uploaded_file.read().decode('utf-8')
-        if st.button("インポート実行"):
-            if import_templates(json_str):
-                st.success("✅ インポート成功！")
-                st.rerun()
-
-# ===== メインコンテンツ =====
-if st.session_state.current_mode == 'template':
+        st.session_state.current_mode = mode
+        
+        st.markdown("---")
+        st.markdown("### 📊 統計")
+        st.metric("登録テンプレート", len(st.session_state.templates))
+        st.metric("下書き", len(st.session_state.drafts))
+        
+        # テンプレート形式の内訳
+        html_count = sum(1 for t in st.session_state.templates if t.get('template_type') == 'html')
+        json_count = sum(1 for t in st.session_state.templates if t.get('template_type') == 'json')
+        st.caption(f"HTML形式: {html_count} / JSON形式: {json_count}")
+        
+        st.markdown("---")
+        st.markdown("### 💾 データ管理")
+        
+        # エクスポート
+        if st.button("📤 全データをエクスポート"):
+            with current_perf().stage("エクスポート"):
+                export_json = export_templates()
+            st.download_button(
+                label="💾 JSONをダウンロード",
+                data=export_json,
+                file_name=f"lp_templates_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                mime="application/json"
+            )
+        
+        # インポート
+        uploaded_file = st.file_uploader("📥 JSONをインポート", type=['json'])
+        if uploaded_file:
+            json_str = uploaded_file.read().decode('utf-8')
+            if st.button("インポート実行"):
+                with current_perf().stage("インポート"):
+                    imported = import_templates(json_str)
+                if imported:
+                    st.success("✅ インポート成功！")
+                    st.rerun()
+        
+        # インポートで見つかった重複（インポート後の再実行で1回だけ表示）
+        notice = st.session_state.pop('import_duplicates', None)
+        if notice:
+            if notice['duplicates']:
+                st.warning(
+                    f"⚠️ インポートしたテンプレートに{notice['groups']}グループ・{notice['duplicates']}件の重複候補があります。"
+                    "一覧の「🧹 重複チェック」で確認できます。"
+                )
+            if notice['existing']:
+                st.info(f"💡 インポートした{notice['existing']}件は、インポート前のライブラリのテンプレートとほぼ同じ内容です。")
+
+def render_template_mode():
+    """テンプレート登録モード（Step 1〜4 と保存済み一覧）"""
     st.title("📝 テンプレート登録モード")
     
     tab1, tab2, tab3, tab4 = st.tabs([
@@ -334,6 +475,20 @@ if st.session_state.current_mode == 'template':
             height=150
         )
         
+        # 入力中の内容に似ている登録済みテンプレート
+        if st.session_state.templates and (template_name or industry or notes):
+            with current_perf().stage("類似テンプレート検索"):
+                similar = st.session_state.similar_index.query(
+                    query_features(template_name, category, industry, notes, section_type), k=5
+                )
+            if similar:
+                by_id = {t['id']: t for t in st.session_state.templates}
+                st.markdown("**💡 似ている登録済みテンプレート**")
+                for key, score in similar:
+                    template = by_id[key]
+                    st.write(f"- {template.get('name', 'Unnamed')}（{template.get('category', 'N/A')} / "
+                             f"{template.get('industry') or 'N/A'}・類似度 {score:.0%}）")
+        
         if st.button("✅ Step 2へ進む", type="primary"):
             st.session_state.step1_data = {
                 'name': template_name,
@@ -349,7 +504,32 @@ if st.session_state.current_mode == 'template':
     # Step 2: プロンプト生成
     with tab2:
         st.header("🤖 ChatGPT用プロンプトを生成")
-        
+
+        # 一括生成モード（複数の事例をまとめてバッチ投入用JSONLに変換）
+        with st.expander("📦 一括プロンプト生成（JSONL）"):
+            st.caption("Step 1の項目（name, category, source_url, industry, template_type, section_type, notes）を列に持つCSV / JSON / JSONLをアップロードしてください。")
+            bulk_file = st.file_uploader("事例リスト", type=['csv', 'json', 'jsonl'], key="bulk_prompt_file")
+            bulk_model = st.text_input("モデル名", value="gpt-4o", key="bulk_prompt_model")
+
+            if bulk_file is not None:
+                try:
+                    records = parse_step1_records(bulk_file.name, bulk_file.getvalue().decode('utf-8-sig'))
+                except (ValueError, AttributeError) as e:
+                    st.error(f"❌ 読み込みエラー: {str(e)}")
+                    records = []
+
+                if records:
+                    jsonl, bulk_errors = get_prompt_registry().render_batch_jsonl(records, model=bulk_model)
+                    st.success(f"✅ {len(records) - len(bulk_errors)}件のプロンプトを生成しました。")
+                    for error in bulk_errors:
+                        st.warning(f"⚠️ {error}")
+                    st.download_button(
+                        label="💾 JSONLをダウンロード",
+                        data=jsonl,
+                        file_name=f"lp_prompts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl",
+                        mime="application/jsonl"
+                    )
+
         if 'step1_data' not in st.session_state:
             st.warning("⚠️ まずStep 1で基本情報を入力してください。")
         else:
@@ -362,88 +542,12 @@ if st.session_state.current_mode == 'template':
             {f"**セクション**: {data['section_type']}" if data['section_type'] else ""}
             """)
             
-            # プロンプト生成（HTML形式 or JSON形式）
-            if data['template_type'] == 'html':
-                # HTML形式のプロンプト
-                prompt = f"""以下のLP事例を分析し、完全なHTML+CSSコードを生成してください。
-
-【基本情報】
-- テンプレート名: {data['name']}
-- カテゴリ: {data['category']}
-- 業種: {data['industry']}
-- 元サイトURL: {data['source_url']}
-
-【デザインメモ】
-{data['notes']}
-
-【重要な要件】
-1. <!DOCTYPE html>から</html>までの完全なコード
-2. Tailwind CDN または インラインCSSを使用
-3. レスポンシブ対応（max-width: 1200px推奨）
-4. 画像はURL参照のみ（src="https://..."）
-   ❌ base64埋め込みは禁止
-5. <script>タグは使用しない（純粋なHTML+CSSのみ）
-6. フォントはGoogle Fonts CDN使用可
-7. 元サイトのデザインを可能な限り忠実に再現
-
-【出力形式】
-```html
-<!DOCTYPE html>
-<html lang="ja">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{data['name']}</title>
-    <script src="https://cdn.tailwindcss.com"></script>
-    <!-- 必要に応じてGoogle Fontsなど -->
-    <style>
-        /* カスタムスタイル */
-    </style>
-</head>
-<body>
-    <!-- 実際のコンテンツ -->
-    <section>
-        <!-- ヒーローセクション、機能紹介など -->
-    </section>
-</body>
-</html>
-```
-
-【注意事項】
-- 色、フォントサイズ、余白など、細部まで元サイトに近づけてください
-- ホバー効果、影、グラデーションなども忠実に再現
-- 画像はプレースホルダーテキストまたは https://via.placeholder.com/ を使用
-"""
-            else:
-                # JSON形式のプロンプト（旧方式）
-                prompt = f"""以下のLP事例を分析し、JSON形式でテンプレートを作成してください。
-
-【基本情報】
-- テンプレート名: {data['name']}
-- カテゴリ: {data['category']}
-- 業種: {data['industry']}
-- 元サイトURL: {data['source_url']}
-- セクションタイプ: {data['section_type']}
-
-【デザインメモ】
-{data['notes']}
-
-【出力形式】
-```json
-{{
-  "name": "{data['name']}",
-  "category": "{data['category']}",
-  "sections": [
-    {{
-      "type": "{data['section_type']}",
-      "content": {{ /* コンテンツの詳細構造 */ }},
-      "layout": {{ /* レイアウト設定 */ }},
-      "background": {{ /* 背景設定 */ }}
-    }}
-  ]
-}}
-```
-"""
+            # プロンプト生成（prompts/ の事前コンパイル済みテンプレートを使用）
+            try:
+                prompt = get_prompt_registry().render_step1(data)
+            except (KeyError, PromptFieldError) as e:
+                st.error(f"❌ プロンプト生成エラー: {str(e)}")
+                prompt = ""
             
             st.markdown("### 📋 生成されたプロンプト")
             st.code(prompt, language="text")
@@ -464,35 +568,68 @@ if st.session_state.current_mode == 'template':
                     height=400,
                     help="ChatGPTが生成した完全なHTMLコードをそのまま貼り付けてください"
                 )
+                recompress_images = st.checkbox(
+                    "🖼️ 大きな埋め込み画像は縮小・再圧縮して保存する", value=True, key="recompress_images",
+                    help="base64で埋め込まれた画像は自動で画像ファイルとして保存し、HTMLからはURLで参照します（Pillowが必要）"
+                )
                 
                 if st.button("✅ HTMLを検証してStep 3へ", type="primary"):
-                    # サイズチェック
-                    is_valid_size, size_error = check_html_size(html_input)
-                    if not is_valid_size:
-                        st.error(size_error)
+                    perf = current_perf()
+                    store = get_asset_store()
+                    
+                    # 画像ファイルにする前に、貼り付けたままのHTML（埋め込み画像を含む）の上限と構造を確かめる
+                    with perf.stage("HTML検証"):
+                        is_valid, error = check_html_size(html_input, MAX_PASTE_SIZE_MB)
+                        if is_valid:
+                            is_valid, error = validate_html_structure(html_input)
+                        is_no_base64, _ = check_base64_images(html_input)
+                    
+                    # base64画像は画像ファイルへの参照に置き換える（同じ画像は全テンプレートで1ファイル）
+                    # サイズの上限は置き換え後のHTMLに適用するので、大きな画像を埋め込んだLPも登録できる
+                    # ファイルへの書き込みは検証がすべて通ってから行う
+                    original, asset_stats, asset_files = html_input, None, {}
+                    if is_valid and not is_no_base64:
+                        with perf.stage("画像のアセット化"):
+                            original, asset_stats, asset_files = prepare_images(html_input, store, recompress_images)
+                        is_valid, error = check_embedded_images_size(asset_stats['embedded_bytes'])
+                    if is_valid:
+                        with perf.stage("HTML検証"):
+                            is_valid, error = check_html_size(original)
+                    
+                    if not is_valid:
+                        st.error(error)
                     else:
-                        # base64画像チェック
-                        is_no_base64, base64_warning = check_base64_images(html_input)
-                        if not is_no_base64:
-                            st.warning(base64_warning)
+                        if asset_files:
+                            with perf.stage("画像のアセット化"):
+                                store.put_all(asset_files)
+                                store.claim(st.session_state.asset_owner, asset_files)
+                        perf.count("検証したHTML (bytes)", len(original.encode('utf-8')))
                         
-                        # HTML構造チェック
-                        is_valid_html, html_error = validate_html_structure(html_input)
-                        if not is_valid_html:
-                            st.error(html_error)
-                        else:
-                            # サニタイズ
-                            sanitized = sanitize_user_html(html_input)
-                            
-                            st.session_state.step2_html = {
-                                'original': html_input,
-                                'sanitized': sanitized,
-                                'type': 'html'
-                            }
-                            st.success("✅ HTML検証成功！Step 3でプレビューを確認できます。")
-                            
+                        # サニタイズ
+                        with perf.stage("サニタイズ"):
+                            sanitized = sanitize_user_html(original)
+                        
+                        st.session_state.step2_html = {
+                            'original': original,
+                            'sanitized': sanitized,
+                            'type': 'html'
+                        }
+                        st.success("✅ HTML検証成功！Step 3でプレビューを確認できます。")
+                        
+                        if asset_stats and asset_stats['images']:
+                            before_kb = len(html_input.encode('utf-8')) / 1024
+                            after_kb = len(original.encode('utf-8')) / 1024
+                            st.info(
+                                f"🖼️ base64画像 {asset_stats['images']}個を画像ファイル（{len(asset_stats['assets'])}種類・"
+                                f"{asset_stats['stored_bytes'] / 1024:.0f} KB）として保存しました。"
+                                f"HTML: {before_kb:.0f} KB → {after_kb:.0f} KB"
+                            )
+                        
+                        # 画像ファイルにできなかったもの（SVGなど）は埋め込みのまま残るので警告する
+                        if not is_no_base64:
+                            is_no_base64, base64_warning = check_base64_images(original)
                             if not is_no_base64:
-                                st.warning("⚠️ base64画像が検出されましたが、検証は通過しました。可能であればURL参照に変更してください。")
+                                st.warning(base64_warning)
             
             else:
                 # JSON入力（旧方式）
@@ -601,6 +738,55 @@ if st.session_state.current_mode == 'template':
                 html_size = len(save_data['html_content'].encode('utf-8')) / 1024
                 st.write(f"**HTMLサイズ**: {html_size:.2f} KB")
             
+            # 重複チェック（署名は入力内容ごとに一度だけ計算）
+            if 'signature' not in step2:
+                with current_perf().stage("重複チェック"):
+                    step2['signature'] = template_signature(save_data)
+            duplicates = find_duplicates(step2['signature'])
+            if duplicates:
+                st.warning("⚠️ よく似たテンプレートがすでに登録されています。")
+                for template, score in duplicates[:5]:
+                    st.write(f"- {template.get('name', 'Unnamed')}（ID {template['id']}・類似度 {score:.0%}）")
+            
+            # 既存テンプレートの新しい版として保存（HTML形式のみ。似ているテンプレートがあればそれを初期選択）
+            target_id = None
+            html_templates = {t.id: t for t in st.session_state.templates if t.get('template_type') == 'html'}
+            if save_data['template_type'] == 'html' and html_templates:
+                options = [None] + list(html_templates)
+                default = duplicates[0][0].id if duplicates and duplicates[0][0].id in html_templates else None
+                target_id = st.selectbox(
+                    "保存方法",
+                    options,
+                    index=options.index(default),
+                    format_func=lambda i: "🆕 新しいテンプレートとして登録" if i is None
+                                          else f"🕘 「{html_templates[i].get('name', 'Unnamed')}」の新しい版として保存",
+                    key="save_target"
+                )
+            
+            # 版管理するのはHTMLのみ。テンプレート名などの情報は選んだ場合だけ Step 1 の入力で更新する
+            # 確認用のチェックは1回の保存ごとにやり直す（保存後、次に表示するときに外す）
+            if st.session_state.pop('reset_save_options', False):
+                st.session_state.allow_duplicate = False
+                st.session_state.update_metadata = False
+            
+            update_metadata = False
+            if target_id is not None:
+                target = html_templates[target_id]
+                changed = [
+                    label for field, label in zip(REVISION_METADATA_FIELDS, ("テンプレート名", "カテゴリ", "元サイト", "業種", "メモ"))
+                    if save_data.get(field) is not None and save_data[field] != target.get(field)
+                ]
+                st.caption(
+                    "新しい版として保存されるのはHTMLのみです。"
+                    + (f"Step 1の入力と登録済みの情報が異なります（{'・'.join(changed)}）。" if changed else "")
+                )
+                if changed:
+                    update_metadata = st.checkbox("テンプレート情報もStep 1の入力で更新する", key="update_metadata")
+            
+            allow_duplicate = True
+            if duplicates and target_id is None:
+                allow_duplicate = st.checkbox("重複を承知で登録する", key="allow_duplicate")
+            
             st.markdown("---")
             
             col1, col2 = st.columns(2)
@@ -611,26 +797,49 @@ if st.session_state.current_mode == 'template':
                     st.success("✅ 下書きを保存しました！")
             
             with col2:
-                if st.button("✅ 承認して本登録", type="primary", use_container_width=True):
-                    save_template(save_data.copy())
-                    st.success("🎉 テンプレートを本登録しました！")
-                    st.balloons()
-                    
-                    # クリーンアップ
-                    if 'step1_data' in st.session_state:
-                        del st.session_state.step1_data
-                    if 'step2_html' in st.session_state:
-                        del st.session_state.step2_html
+                label = "✅ 承認して本登録" if target_id is None else "✅ 新しい版として保存"
+                if st.button(label, type="primary", use_container_width=True, disabled=not allow_duplicate):
+                    saved = True
+                    if target_id is None:
+                        save_template(save_data.copy(), step2['signature'])
+                        st.success("🎉 テンプレートを本登録しました！")
+                    else:
+                        number = save_revision(target, save_data.copy(), step2['signature'], update_metadata)
+                        if number is not None:
+                            st.success(f"🎉 「{target.get('name', 'Unnamed')}」の版{number}として保存しました！")
+                        elif update_metadata:
+                            st.success(f"✅ 「{target.get('name', 'Unnamed')}」の情報を更新しました（HTMLは最新版と同じため、新しい版は作成していません）。")
+                        else:
+                            saved = False
+                            st.info("💡 HTMLが最新版と同じため、新しい版は作成しませんでした。")
+                    if saved:
+                        st.balloons()
                     
-                    st.info("💡 新しいテンプレートを登録する場合は、Step 1から再度入力してください。")
+                    # クリーンアップ（保存しなかった場合は入力を残し、保存方法を選び直せるようにする）
+                    if saved:
+                        if 'step1_data' in st.session_state:
+                            del st.session_state.step1_data
+                        if 'step2_html' in st.session_state:
+                            del st.session_state.step2_html
+                        # 「重複を承知で登録する」「テンプレート情報も更新する」は1回の保存ごとに確認する
+                        st.session_state.reset_save_options = True
+                        
+                        st.info("💡 新しいテンプレートを登録する場合は、Step 1から再度入力してください。")
     
     # 保存済みテンプレート一覧
+    with current_perf().stage("テンプレート一覧描画"):
+        render_template_list()
+
+def render_template_list():
+    """保存済みテンプレート一覧"""
     st.markdown("---")
     st.header("📚 保存済みテンプレート一覧")
     
     if not st.session_state.templates:
         st.info("まだテンプレートが登録されていません。")
     else:
+        render_dedupe_report()
+        
         for template in st.session_state.templates:
             template_type = template.get('template_type', 'unknown')
             type_badge = "🌐 HTML" if template_type == 'html' else "📊 JSON"
@@ -646,7 +855,7 @@ if st.session_state.current_mode == 'template':
                 
                 with col2:
                     if template_type == 'html':
-                        html_size = len(template.get('html_content', '').encode('utf-8')) / 1024
+                        html_size = template.html_size / 1024
                         st.metric("HTMLサイズ", f"{html_size:.1f} KB")
                     
                     if template.get('notes'):
@@ -655,18 +864,21 @@ if st.session_state.current_mode == 'template':
                 
                 with col3:
                     if st.button("🗑️ 削除", key=f"del_{template['id']}"):
-                        st.session_state.templates.remove(template)
+                        delete_template(template)
+                        sweep_unused_assets()
+                        st.session_state.pop('dedupe_report', None)
                         st.rerun()
                 
-                # プレビュー・ダウンロード
+                # プレビュー・ダウンロード（HTMLはボタンが押されたときだけ展開する）
                 if template_type == 'html':
-                    st.download_button(
-                        label="💾 HTMLをダウンロード",
-                        data=template.get('html_content', ''),
-                        file_name=f"{template.get('name', 'template')}.html",
-                        mime="text/html",
-                        key=f"download_{template['id']}"
-                    )
+                    if st.button("💾 HTMLをダウンロード", key=f"prepare_download_{template['id']}"):
+                        st.download_button(
+                            label="⬇️ ファイルを保存",
+                            data=get_asset_store().inline(template.get('html_content', '')),
+                            file_name=f"{template.get('name', 'template')}.html",
+                            mime="text/html",
+                            key=f"download_{template['id']}"
+                        )
                     
                     if st.button("👀 プレビューを表示", key=f"preview_{template['id']}"):
                         st.components.v1.html(
@@ -674,21 +886,118 @@ if st.session_state.current_mode == 'template':
                             height=600,
                             scrolling=True
                         )
+                    
+                    if template.history is not None and st.checkbox(
+                        f"🕘 変更履歴を表示（全{len(template.history)}版）", key=f"history_{template['id']}"
+                    ):
+                        render_revision_history(template)
 
-else:
-    # デザイン作成モード
+def render_revision_history(template: TemplateRecord):
+    """テンプレートの版の左右比較・復元"""
+    history = template.history
+    labels = dict(revision_labels(history))
+    numbers = list(labels)
+    st.caption(f"履歴の保存サイズ: {history.stored_bytes() / 1024:.1f} KB（最新版のHTML: {template.html_size / 1024:.1f} KB）")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        old = st.selectbox("比較元", numbers, index=len(numbers) - 2, format_func=labels.get, key=f"rev_old_{template.id}")
+    with col2:
+        new = st.selectbox("比較先", numbers, index=len(numbers) - 1, format_func=labels.get, key=f"rev_new_{template.id}")
+    
+    with current_perf().stage("版の比較"):
+        diff_html = side_by_side(history.text(old), history.text(new), labels[old], labels[new])
+    st.components.v1.html(diff_html, height=500, scrolling=True)
+    
+    if old != numbers[-1] and st.button(f"↩️ {labels[old]}に戻す", key=f"restore_{template.id}"):
+        restore_revision(template, old)
+        st.rerun()
+
+def render_dedupe_report():
+    """登録済みライブラリの重複チェック（一括）"""
+    with st.expander("🧹 重複チェック"):
+        st.caption(f"最初に登録されたテンプレートと類似度 {DUPLICATE_THRESHOLD:.0%} 以上のものをグループにまとめます（各グループの先頭が残すテンプレート）。")
+        if st.button("重複をチェック", key="run_dedupe"):
+            with current_perf().stage("重複チェック"):
+                st.session_state.dedupe_report = st.session_state.dup_index.duplicate_groups()
+        
+        groups = st.session_state.get('dedupe_report')
+        if groups is None:
+            return
+        if not groups:
+            st.success("✅ 重複しているテンプレートはありません。")
+            return
+        
+        by_id = {t['id']: t for t in st.session_state.templates}
+        st.warning(f"⚠️ {len(groups)}グループ・{sum(len(g) - 1 for g in groups)}件の重複候補が見つかりました。")
+        for number, group in enumerate(groups, 1):
+            st.markdown(f"**グループ {number}**")
+            for key, score in group:
+                label = "（残す）" if key == group[0][0] else f"（類似度 {score:.0%}）"
+                st.write(f"- ID {key}: {by_id[key].get('name', 'Unnamed')} {label}")
+        
+        if st.button("🗑️ 後から登録した重複をまとめて削除", key="delete_duplicates"):
+            for group in groups:
+                for key, _ in group[1:]:
+                    delete_template(by_id[key])
+            sweep_unused_assets()
+            del st.session_state.dedupe_report
+            st.rerun()
+
+def render_design_mode():
+    """デザイン作成モード"""
     st.title("🎨 デザイン作成モード")
     st.info("🚧 デザイン作成モードは開発中です。テンプレート登録モードをご利用ください。")
 
-# フッター
-st.markdown("---")
-st.markdown(f"""
-<div style="text-align: center; color: #6B7280; font-size: 14px; padding: 2rem 0;">
-    <p><strong>LP Template Manager - HTML Edition</strong></p>
-    <p>ChatGPTが生成したHTML+CSSをそのまま使える 🚀</p>
-    <p style="font-size: 12px; margin-top: 1rem;">
-        登録済み: HTML形式 {sum(1 for t in st.session_state.templates if t.get('template_type') == 'html')}件 / 
-        JSON形式 {sum(1 for t in st.session_state.templates if t.get('template_type') == 'json')}件
-    </p>
-</div>
-""", unsafe_allow_html=True)
+def render_footer():
+    """フッター"""
+    st.markdown("---")
+    st.markdown(f"""
+    <div style="text-align: center; color: #6B7280; font-size: 14px; padding: 2rem 0;">
+        <p><strong>LP Template Manager - HTML Edition</strong></p>
+        <p>ChatGPTが生成したHTML+CSSをそのまま使える 🚀</p>
+        <p style="font-size: 12px; margin-top: 1rem;">
+            登録済み: HTML形式 {sum(1 for t in st.session_state.templates if t.get('template_type') == 'html')}件 / 
+            JSON形式 {sum(1 for t in st.session_state.templates if t.get('template_type') == 'json')}件
+        </p>
+    </div>
+    """, unsafe_allow_html=True)
+
+def main():
+    """LP Template Manager のエントリポイント（単体実行・マルチページの両方から呼ばれる）"""
+    # ページ設定
+    st.set_page_config(
+        page_title="LP Template Manager - HTML Edition",
+        page_icon="🎨",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+
+    # 処理時間の計測（サイドバーの「パフォーマンス」パネルで有効化）
+    perf = start_perf("lp_builder")
+
+    try:
+        # CSS：シンプルで安全なスタイル（読み込み・圧縮は初回のみ）
+        st.markdown(load_css(), unsafe_allow_html=True)
+
+        init_session_state()
+
+        render_sidebar()
+
+        if st.session_state.current_mode == 'template':
+            render_template_mode()
+        else:
+            render_design_mode()
+
+        render_footer()
+    except BaseException:
+        # st.rerun()（例外で実行を打ち切る）・エラーで途中終了した場合も計測を止める
+        discard_perf(perf)
+        raise
+
+    # 処理時間の表示（計測が有効な場合）
+    finish_perf(perf)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+LP Template Manager - 重複テンプレートの検出（MinHash / LSH）
+サニタイズ済みHTMLのタグ構造と表示テキストをシングル（連続する部分列）に分け、MinHash署名で類似度を近似する
+署名はLSH（バンド分割したハッシュ表）に登録し、全テンプレートと比較せずに重複候補だけを取り出す
+"""
+
+import json
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+NUM_PERM = 128
+BANDS = 16  # 16バンド × 8行（類似度がおよそ0.7を超えると候補になる）
+DUPLICATE_THRESHOLD = 0.8
+
+TEXT_SHINGLE = 5  # 表示テキストは5文字ずつ
+TAG_SHINGLE = 4  # タグ構造は4タグずつ
+MINHASH_CHUNK = 8192  # 署名の計算で一度に扱うシングル数（一時配列は 8192×128×8バイト = 8MB まで）
+
+# 乱数のハッシュ関数 (a * x + b) mod 2^64 の上位32ビット（a は奇数）
+_rng = np.random.default_rng(1)
+_PERM_A = _rng.integers(0, np.iinfo(np.uint64).max, NUM_PERM, dtype=np.uint64, endpoint=True) | np.uint64(1)
+_PERM_B = _rng.integers(0, np.iinfo(np.uint64).max, NUM_PERM, dtype=np.uint64, endpoint=True)
+
+_SKIP_BLOCKS = re.compile(r'<(script|style)\b.*?</\1\s*>', re.DOTALL | re.IGNORECASE)
+_TAG = re.compile(r'<\s*(/?)\s*([a-zA-Z][\w-]*)([^>]*)>')
+_CLASS = re.compile(r'class\s*=\s*["\']([^"\']*)["\']', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def visible_text(html_content: str) -> str:
+    """タグ・script・styleを除いた表示テキスト（空白は1つにまとめる）"""
+    text = _TAG.sub(' ', _SKIP_BLOCKS.sub(' ', html_content))
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def tag_tokens(html_content: str) -> List[str]:
+    """タグ名とclass属性の並び（文章を差し替えただけのテンプレートも構造で一致させる）"""
+    tokens = []
+    for closing, name, attrs in _TAG.findall(_SKIP_BLOCKS.sub(' ', html_content)):
+        classes = _CLASS.search(attrs)
+        tokens.append(f"{closing}{name.lower()}.{'.'.join(sorted(classes.group(1).split())) if classes else ''}")
+    return tokens
+
+
+def _rolling_hashes(codes: np.ndarray, k: int) -> np.ndarray:
+    """整数列の長さ k の部分列ごとの多項式ハッシュ（uint64 のオーバーフローで mod 2^64）"""
+    if len(codes) < k:
+        codes = np.pad(codes, (0, k - len(codes)))
+    windows = np.lib.stride_tricks.sliding_window_view(codes.astype(np.uint64), k)
+    powers = np.uint64(1000003) ** np.arange(k - 1, -1, -1, dtype=np.uint64)
+    return (windows * powers).sum(axis=1, dtype=np.uint64)
+
+
+def shingle_hashes(html_content: str) -> np.ndarray:
+    """表示テキストの文字シングルとタグ構造のシングルのハッシュ（重複なし）"""
+    text = visible_text(html_content).lower()
+    text_codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32) if text else np.zeros(1, np.uint32)
+
+    tokens = tag_tokens(html_content)
+    token_hashes = {token: hash_token(token) for token in set(tokens)}
+    token_codes = np.array([token_hashes[t] for t in tokens] or [0], dtype=np.uint64)
+
+    text_hashes = _rolling_hashes(text_codes, TEXT_SHINGLE)
+    tag_hashes = _rolling_hashes(token_codes, TAG_SHINGLE) ^ np.uint64(0x9E3779B97F4A7C15)
+    return np.unique(np.concatenate([text_hashes, tag_hashes]))
+
+
+def hash_token(token: str) -> int:
+    """文字列の安定したハッシュ（プロセスをまたいで同じ値。Python の hash() は使わない）"""
+    value = 1469598103934665603
+    for byte in token.encode('utf-8'):
+        value = ((value ^ byte) * 1099511628211) & 0xFFFFFFFFFFFFFFFF
+    return value
+
+
+def minhash(hashes: np.ndarray) -> np.ndarray:
+    """MinHash署名（NUM_PERM 個の最小値。シングルが多いHTMLでもメモリが増えないよう MINHASH_CHUNK 個ずつ計算する）"""
+    signature = np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for start in range(0, len(hashes), MINHASH_CHUNK):
+            chunk = hashes[start:start + MINHASH_CHUNK, None]
+            permuted = (chunk * _PERM_A + _PERM_B) >> np.uint64(32)
+            np.minimum(signature, permuted.min(axis=0), out=signature)
+    return signature.astype(np.uint32)
+
+
+def template_text(template: Dict) -> str:
+    """テンプレートの比較対象（HTMLはサニタイズ済みHTML、JSON形式はJSONの文字列）"""
+    if template.get('template_type') == 'json' or 'json_data' in template:
+        return json.dumps(template.get('json_data') or {}, ensure_ascii=False, sort_keys=True)
+    return template.get('html_sanitized') or template.get('html_content') or ''
+
+
+def template_signature(template: Dict) -> np.ndarray:
+    return minhash(shingle_hashes(template_text(template)))
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """署名から推定したJaccard類似度"""
+    return float(np.mean(a == b))
+
+
+class DuplicateIndex:
+    """
+    MinHash署名のLSHインデックス
+    署名を BANDS 個のバンドに分け、いずれかのバンドが一致したものだけを候補として類似度を計算する
+    """
+
+    def __init__(self):
+        self.signatures: Dict[int, np.ndarray] = {}
+        self.buckets: List[Dict[bytes, set]] = [{} for _ in range(BANDS)]
+
+    @staticmethod
+    def _bands(signature: np.ndarray) -> Iterable[Tuple[int, bytes]]:
+        for band, chunk in enumerate(np.split(signature, BANDS)):
+            yield band, chunk.tobytes()
+
+    def add(self, key: int, signature: np.ndarray):
+        self.remove(key)
+        self.signatures[key] = signature
+        for band, value in self._bands(signature):
+            self.buckets[band].setdefault(value, set()).add(key)
+
+    def remove(self, key: int):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for band, value in self._bands(signature):
+            bucket = self.buckets[band].get(value)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self.buckets[band][value]
+
+    def query(self, signature: np.ndarray, threshold: float = DUPLICATE_THRESHOLD, exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        """類似度が threshold 以上の登録済みキーを (キー, 類似度) の類似度順で返す"""
+        candidates = set()
+        for band, value in self._bands(signature):
+            candidates |= self.buckets[band].get(value, set())
+        candidates.discard(exclude)
+        matches = [(key, similarity(signature, self.signatures[key])) for key in candidates]
+        return sorted((m for m in matches if m[1] >= threshold), key=lambda m: m[1], reverse=True)
+
+    def keys(self) -> set:
+        return set(self.signatures)
+
+    @classmethod
+    def build(cls, templates: List[Dict]) -> 'DuplicateIndex':
+        index = cls()
+        for template in templates:
+            index.add(template['id'], template_signature(template))
+        return index
+
+    def duplicate_groups(self, threshold: float = DUPLICATE_THRESHOLD) -> List[List[Tuple[int, float]]]:
+        """
+        重複しているテンプレートのグループ（一括チェック用）
+        各グループは [(キー, 先頭との類似度), ...]。先頭はキーが最小のもの（最初に登録されたもの）で、
+        残りはすべて先頭と直接 threshold 以上に似ているもの（A≈B≈C のように連鎖しただけのものは同じグループにしない）
+        """
+        groups = []
+        grouped = set()
+        for key in sorted(self.signatures):
+            if key in grouped:
+                continue
+            members = [
+                (other, score) for other, score in self.query(self.signatures[key], threshold, exclude=key)
+                if other not in grouped and other > key
+            ]
+            if members:
+                grouped.add(key)
+                grouped.update(other for other, _ in members)
+                groups.append([(key, 1.0)] + sorted(members))
+        return groups
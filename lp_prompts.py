@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LP Template Manager - プロンプトテンプレート管理
+prompts/ 配下のテンプレートファイルを起動時に一度だけ読み込み・事前コンパイルし、
+Step 1 の入力データから ChatGPT 用プロンプトを生成する
+"""
+
+import csv
+import io
+import json
+import string
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+PROMPT_DIR = Path(__file__).resolve().parent / "prompts"
+
+# Step 1 で入力されるフィールド（一括生成時の入力列）
+STEP1_FIELDS = ['name', 'category', 'source_url', 'industry', 'template_type', 'section_type', 'notes']
+
+# 一括生成時のデフォルト設定（OpenAI Batch API 形式）
+DEFAULT_BATCH_MODEL = "gpt-4o"
+DEFAULT_BATCH_ENDPOINT = "/v1/chat/completions"
+
+
+class PromptFieldError(ValueError):
+    """プロンプトの差し込みフィールドが不正な場合のエラー"""
+
+
+# ===== テンプレート =====
+class PromptTemplate:
+    """
+    事前コンパイル済みのプロンプトテンプレート
+    - 書式は str.format と同じ（{field}、波括弧は {{ }} でエスケープ）
+    - 読み込み時に (リテラル, フィールド名) の列に分解しておき、描画は連結のみ
+    """
+
+    __slots__ = ('name', 'source', 'fields', '_segments')
+
+    def __init__(self, name: str, source: str):
+        self.name = name
+        self.source = source
+        segments: List[Tuple[str, Optional[str]]] = []
+        fields: List[str] = []
+
+        for literal, field, format_spec, conversion in string.Formatter().parse(source):
+            if field is not None:
+                if not field.isidentifier():
+                    raise PromptFieldError(f"{name}: フィールド名が不正です: {{{field}}}")
+                if format_spec or conversion:
+                    raise PromptFieldError(f"{name}: 書式指定には対応していません: {{{field}}}")
+                if field not in fields:
+                    fields.append(field)
+            segments.append((literal, field))
+
+        self.fields = tuple(fields)
+        self._segments = tuple(segments)
+
+    def validate(self, values: Dict) -> List[str]:
+        """差し込み値を検証し、エラーメッセージのリストを返す（空なら有効）"""
+        errors = []
+        for field in self.fields:
+            if field not in values:
+                errors.append(f"必須フィールドがありません: {field}")
+            elif values[field] is not None and not isinstance(values[field], (str, int, float)):
+                errors.append(f"フィールドの型が不正です: {field} ({type(values[field]).__name__})")
+        return errors
+
+    def render(self, values: Dict) -> str:
+        """検証済みの値を差し込んでプロンプト文字列を生成"""
+        errors = self.validate(values)
+        if errors:
+            raise PromptFieldError(f"{self.name}: " + " / ".join(errors))
+
+        parts = []
+        for literal, field in self._segments:
+            parts.append(literal)
+            if field is not None:
+                value = values[field]
+                parts.append("" if value is None else str(value))
+        return "".join(parts)
+
+
+# ===== レジストリ =====
+class PromptRegistry:
+    """テンプレート名（= template_type）→ PromptTemplate の対応表"""
+
+    def __init__(self, templates: Optional[Dict[str, PromptTemplate]] = None):
+        self._templates: Dict[str, PromptTemplate] = dict(templates or {})
+
+    @classmethod
+    def from_directory(cls, directory: Path = PROMPT_DIR) -> "PromptRegistry":
+        """ディレクトリ内の *.txt をすべて読み込んでコンパイル"""
+        templates = {}
+        for path in sorted(Path(directory).glob("*.txt")):
+            templates[path.stem] = PromptTemplate(path.stem, path.read_text(encoding="utf-8"))
+        return cls(templates)
+
+    def names(self) -> List[str]:
+        return sorted(self._templates)
+
+    def get(self, name: str) -> PromptTemplate:
+        if name not in self._templates:
+            raise KeyError(f"プロンプトテンプレートが見つかりません: {name}")
+        return self._templates[name]
+
+    def render(self, name: str, values: Dict) -> str:
+        return self.get(name).render(values)
+
+    def render_step1(self, step1_data: Dict) -> str:
+        """Step 1 のデータから、その形式に対応するプロンプトを生成"""
+        return self.render(step1_data.get('template_type') or 'html', step1_data)
+
+    def iter_batch_jsonl(
+        self,
+        records: Iterable[Dict],
+        model: str = DEFAULT_BATCH_MODEL,
+        endpoint: str = DEFAULT_BATCH_ENDPOINT,
+        errors: Optional[List[str]] = None
+    ) -> Iterator[str]:
+        """
+        複数の Step 1 レコードからバッチ投入用の JSONL 行を生成
+        不正なレコードはスキップし、errors が渡されていればメッセージを追加する
+        """
+        for i, record in enumerate(records, start=1):
+            try:
+                prompt = self.render_step1(record)
+            except (KeyError, PromptFieldError) as e:
+                if errors is not None:
+                    errors.append(f"{i}行目: {e}")
+                continue
+
+            line = {
+                'custom_id': f"{i:05d}_{record.get('name') or 'template'}",
+                'method': 'POST',
+                'url': endpoint,
+                'body': {
+                    'model': model,
+                    'messages': [{'role': 'user', 'content': prompt}]
+                }
+            }
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+
+    def render_batch_jsonl(self, records: Iterable[Dict], model: str = DEFAULT_BATCH_MODEL) -> Tuple[str, List[str]]:
+        """
+        一括生成
+        Returns: (jsonl_text, error_messages)
+        """
+        errors: List[str] = []
+        jsonl = "".join(self.iter_batch_jsonl(records, model=model, errors=errors))
+        return jsonl, errors
+
+
+# ===== 一括入力の読み込み =====
+def parse_step1_records(file_name: str, content: str) -> List[Dict]:
+    """
+    一括生成用の Step 1 レコードを読み込む
+    - .json: レコードの配列、または {"records": [...]} 形式
+    - .jsonl: 1行1レコード
+    - .csv: ヘッダー行に STEP1_FIELDS の列名
+    """
+    lower = file_name.lower()
+    if lower.endswith('.jsonl'):
+        records = [json.loads(line) for line in content.splitlines() if line.strip()]
+    elif lower.endswith('.json'):
+        data = json.loads(content)
+        records = data.get('records', []) if isinstance(data, dict) else data
+    else:
+        records = list(csv.DictReader(io.StringIO(content)))
+
+    normalized = []
+    for record in records:
+        row = {field: record.get(field) for field in STEP1_FIELDS}
+        row['template_type'] = row['template_type'] or 'html'
+        normalized.append(row)
+    return normalized
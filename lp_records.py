@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+LP Template Manager - セッション内のテンプレート表現
+メタデータは __slots__ の属性、HTML本文は zlib 圧縮したバイト列で持ち、プレビュー・ダウンロード時だけ展開する
+読み出しは辞書と同じ get() / [] に対応しているので、索引の作成などは辞書のテンプレートと同じコードで扱える
+"""
+
+import zlib
+from typing import Any, Dict, Iterable, List, Optional
+
+from lp_versions import RevisionHistory
+
+COMPRESS_LEVEL = 6
+HTML_FIELDS = ('html_content', 'html_sanitized')
+
+
+class TemplateRecord:
+    """テンプレート・下書き1件（エクスポートJSONの1要素と相互変換できる）"""
+
+    __slots__ = (
+        'id', 'name', 'category', 'source_url', 'industry', 'template_type', 'notes', 'section_type',
+        'created_at', 'json_data', 'extra', 'history', 'html_size', '_html', '_sanitized'
+    )
+    FIELDS = ('id', 'name', 'category', 'source_url', 'industry', 'template_type', 'notes', 'section_type',
+              'created_at', 'json_data')
+
+    def __init__(self, html_content: Optional[str] = None, html_sanitized: Optional[str] = None,
+                 revisions: Optional[List[Dict]] = None, **fields):
+        for field in self.FIELDS:
+            setattr(self, field, fields.pop(field, None))
+        self.extra: Dict[str, Any] = fields  # 上記以外のキー（下書きの saved_at など）
+        # 変更履歴（新しい版を保存したテンプレートのみ。最新版の本文は html_content）
+        self.history: Optional[RevisionHistory] = RevisionHistory.from_list(revisions) if revisions else None
+        self.set_html(html_content, html_sanitized)
+
+    def set_html(self, html_content: Optional[str], html_sanitized: Optional[str]):
+        self.html_size = len(html_content.encode('utf-8')) if html_content is not None else 0
+        self._html = _compress(html_content)
+        # サニタイズで変わらなかった場合は同じバイト列を共有する
+        self._sanitized = self._html if html_sanitized == html_content else _compress(html_sanitized)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'TemplateRecord':
+        return cls(**data)
+
+    @property
+    def html_content(self) -> Optional[str]:
+        return _decompress(self._html)
+
+    @property
+    def html_sanitized(self) -> Optional[str]:
+        return _decompress(self._sanitized)
+
+    def keys(self) -> List[str]:
+        keys = [field for field in self.FIELDS if getattr(self, field) is not None]
+        keys += [field for field, value in zip(HTML_FIELDS, (self._html, self._sanitized)) if value is not None]
+        if self.history is not None:
+            keys.append('revisions')
+        return keys + list(self.extra)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key == 'revisions':
+            return default if self.history is None else self.history.to_list()
+        if key in self.FIELDS or key in HTML_FIELDS:
+            value = getattr(self, key)
+            return default if value is None else value
+        return self.extra.get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def to_dict(self) -> Dict:
+        """エクスポート用の辞書（HTMLも展開する）"""
+        return {key: self.get(key) for key in self.keys()}
+
+    def compressed_size(self) -> int:
+        """HTML本文の圧縮後のバイト数（共有している場合は1回分）"""
+        size = len(self._html or b'')
+        if self._sanitized is not self._html:
+            size += len(self._sanitized or b'')
+        return size
+
+
+def _compress(text: Optional[str]) -> Optional[bytes]:
+    return None if text is None else zlib.compress(text.encode('utf-8'), COMPRESS_LEVEL)
+
+
+def _decompress(data: Optional[bytes]) -> Optional[str]:
+    return None if data is None else zlib.decompress(data).decode('utf-8')
+
+
+def to_records(templates: Iterable[Dict]) -> List[TemplateRecord]:
+    return [TemplateRecord.from_dict(t) for t in templates]
+
+
+def to_dicts(records: Iterable[TemplateRecord]) -> List[Dict]:
+    return [r.to_dict() for r in records]
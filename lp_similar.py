@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+LP Template Manager - 似ているテンプレートの検索（ハッシュ化したTF-IDFベクトル）
+テンプレート名・カテゴリ・業種・メモ・表示テキストの語と、セクション数などの構造を特徴量にする
+IDFは検索時に文書頻度から計算するので、登録・削除では1件分の更新だけで済む（全体の再学習は不要）
+"""
+
+import math
+import re
+import unicodedata
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from lp_dedupe import tag_tokens, visible_text
+
+N_FEATURES = 1 << 18
+TEXT_LIMIT = 5000  # 表示テキストは先頭5000文字まで（長いページが類似度を独占しないように）
+STRUCTURE_TAGS = ('section', 'header', 'footer', 'nav', 'h1', 'h2', 'h3', 'img', 'form', 'button', 'table', 'ul', 'video')
+
+# 英数字は単語ごと、日本語などは2文字ずつ（分かち書きせずに部分一致させる）
+_WORD = re.compile(r'[a-z0-9]+|[^\x00-\x7f\u3000-\u303f]+')
+
+
+def text_tokens(text: str) -> List[str]:
+    tokens = []
+    for word in _WORD.findall(unicodedata.normalize('NFKC', text).lower()):
+        if word.isascii() or len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+Vector = Tuple[np.ndarray, np.ndarray]  # (特徴番号, 重み)
+
+
+def _vector(counts: Counter) -> Vector:
+    """特徴名ごとの件数 → ハッシュ化した特徴番号ごとの重み（1 + log(件数)）"""
+    weights: Dict[int, float] = {}
+    for token, count in counts.items():
+        index = zlib.crc32(token.encode('utf-8')) % N_FEATURES
+        weights[index] = weights.get(index, 0.0) + 1.0 + math.log(count)
+    return (np.fromiter(weights, dtype=np.int32, count=len(weights)),
+            np.fromiter(weights.values(), dtype=np.float32, count=len(weights)))
+
+
+def query_features(name: str = '', category: str = '', industry: str = '', notes: str = '',
+                   section_type: Optional[str] = None, html_content: str = '') -> Vector:
+    """入力中の項目（Step 1）や登録済みテンプレートの特徴量（インポートしたテンプレートの None の項目は空として扱う）"""
+    name, category, industry, notes, html_content = (
+        value or '' for value in (name, category, industry, notes, html_content)
+    )
+    counts = Counter(text_tokens(' '.join([name, industry, notes, visible_text(html_content)[:TEXT_LIMIT]])))
+    # カテゴリ・業種・セクションは完全一致も特徴にする
+    if category:
+        counts[f'category={category}'] += 2
+    if industry:
+        counts[f'industry={unicodedata.normalize("NFKC", industry).lower()}'] += 2
+    if section_type:
+        counts[f'section={section_type}'] += 2
+    if html_content:
+        tags = Counter(token.split('.', 1)[0] for token in tag_tokens(html_content))
+        for tag in STRUCTURE_TAGS:
+            if tags[tag]:
+                counts[f'tag={tag}'] += tags[tag]
+    return _vector(counts)
+
+
+def template_features(template: Dict) -> Vector:
+    return query_features(
+        template.get('name') or '', template.get('category') or '', template.get('industry') or '',
+        template.get('notes') or '', template.get('section_type'),
+        template.get('html_sanitized') or template.get('html_content') or ''
+    )
+
+
+class SimilarityIndex:
+    """
+    テンプレートの特徴ベクトルの索引
+    文書頻度（df）を登録・削除のたびに更新し、検索時にTF-IDFのコサイン類似度を疎行列の積で計算する
+    """
+
+    def __init__(self):
+        self.vectors: Dict[int, Vector] = {}
+        self.df = np.zeros(N_FEATURES, dtype=np.int32)
+        self._matrix: Optional[Tuple[np.ndarray, sparse.csr_matrix, np.ndarray, np.ndarray]] = None
+
+    def add(self, key: int, vector: Vector):
+        self.remove(key)
+        self.vectors[key] = vector
+        self.df[vector[0]] += 1
+        self._matrix = None
+
+    def remove(self, key: int):
+        vector = self.vectors.pop(key, None)
+        if vector is not None:
+            self.df[vector[0]] -= 1
+            self._matrix = None
+
+    def keys(self) -> set:
+        return set(self.vectors)
+
+    @classmethod
+    def build(cls, templates: List[Dict]) -> 'SimilarityIndex':
+        index = cls()
+        for template in templates:
+            index.add(template['id'], template_features(template))
+        return index
+
+    def matrix(self) -> Tuple[np.ndarray, sparse.csr_matrix, np.ndarray, np.ndarray]:
+        """
+        (キーの配列, 行がテンプレートの疎行列, IDFの2乗, 各行のTF-IDFノルム)
+        登録・削除があった後の最初の検索で作り直す
+        """
+        if self._matrix is None:
+            keys = np.fromiter(self.vectors, dtype=np.int64, count=len(self.vectors))
+            vectors = list(self.vectors.values()) or [(np.zeros(0, np.int32), np.zeros(0, np.float32))]
+            indptr = np.cumsum([0] + [len(indices) for indices, _ in vectors])
+            indices = np.concatenate([indices for indices, _ in vectors])
+            data = np.concatenate([data for _, data in vectors])
+            matrix = sparse.csr_matrix((data, indices, indptr), shape=(len(keys), N_FEATURES))
+            idf = np.log((1 + len(keys)) / (1 + self.df.astype(np.float32))) + 1
+            idf2 = idf * idf
+            self._matrix = (keys, matrix, idf2, np.sqrt(matrix.multiply(matrix) @ idf2))
+        return self._matrix
+
+    def query(self, vector: Vector, k: int = 5, exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        """類似度の高い順に上位 k 件の (キー, 類似度)（類似度0のものは返さない）"""
+        indices, weights = vector
+        if not len(indices) or not self.vectors:
+            return []
+        keys, matrix, idf2, row_norms = self.matrix()
+
+        query = np.zeros(N_FEATURES, dtype=np.float32)
+        query[indices] = weights * idf2[indices]
+
+        query_norm = math.sqrt(float(np.sum(weights * weights * idf2[indices])))
+        scores = (matrix @ query) / np.maximum(row_norms * query_norm, 1e-12)
+        if exclude is not None:
+            scores[keys == exclude] = 0
+
+        top = np.argsort(-scores, kind='stable')[:k]
+        return [(int(keys[i]), float(scores[i])) for i in top if scores[i] > 0]
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+LP Template Manager - テンプレートの版管理（差分で保存する変更履歴）
+HTMLをタグ・改行の区切りで分割し、各版は直前の版との差分（difflib）として保存する
+SNAPSHOT_INTERVAL 版ごとに全文（zlib圧縮）を持つので、どの版も最大 SNAPSHOT_INTERVAL - 1 回の差分適用で復元できる
+"""
+
+import base64
+import difflib
+import re
+import zlib
+from typing import Dict, List, Optional, Tuple, Union
+
+SNAPSHOT_INTERVAL = 10
+
+# 差分の要素: [開始, 終了] は直前の版の区切り単位をそのまま使う、文字列は追加・置換された内容
+Delta = List[Union[List[int], str]]
+
+_BOUNDARY = re.compile(r'(?<=[>\n])')
+
+
+def split_units(text: str) -> List[str]:
+    """差分の単位（タグの終わり・改行ごと。1行に詰めたHTMLでも細かく比較できる）"""
+    return [unit for unit in _BOUNDARY.split(text) if unit]
+
+
+def make_delta(old: str, new: str) -> Delta:
+    """old → new の差分"""
+    old_units, new_units = split_units(old), split_units(new)
+
+    # 編集は一部分のことが多いので、先頭・末尾の共通部分を除いた範囲だけを比較する
+    prefix = 0
+    limit = min(len(old_units), len(new_units))
+    while prefix < limit and old_units[prefix] == new_units[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old_units[-1 - suffix] == new_units[-1 - suffix]:
+        suffix += 1
+
+    delta: Delta = [[0, prefix]] if prefix else []
+    matcher = difflib.SequenceMatcher(
+        None, old_units[prefix:len(old_units) - suffix], new_units[prefix:len(new_units) - suffix]
+    )
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            _append(delta, [prefix + i1, prefix + i2])
+        elif tag in ('replace', 'insert'):
+            _append(delta, ''.join(new_units[prefix + j1:prefix + j2]))
+    if suffix:
+        _append(delta, [len(old_units) - suffix, len(old_units)])
+    return delta
+
+
+def _append(delta: Delta, op: Union[List[int], str]):
+    """連続する範囲・文字列は1つにまとめる"""
+    if delta and isinstance(op, str) and isinstance(delta[-1], str):
+        delta[-1] += op
+    elif delta and isinstance(op, list) and isinstance(delta[-1], list) and delta[-1][1] == op[0]:
+        delta[-1][1] = op[1]
+    else:
+        delta.append(op)
+
+
+def apply_delta(old: str, delta: Delta) -> str:
+    return ''.join(_apply_units(split_units(old), delta))
+
+
+def _apply_units(units: List[str], delta: Delta) -> List[str]:
+    """区切り単位のリストに差分を適用（差分の各要素は単位の区切りで終わるので、分割し直さずにつなげられる）"""
+    result: List[str] = []
+    for op in delta:
+        if isinstance(op, list):
+            result.extend(units[op[0]:op[1]])
+        else:
+            result.extend(split_units(op))
+    return result
+
+
+class RevisionHistory:
+    """
+    1テンプレートの変更履歴（版番号は1から）
+    各版は {'saved_at': 日時, 'snapshot': 圧縮した全文} または {'saved_at': 日時, 'delta': 差分}
+    """
+
+    __slots__ = ('revisions',)
+
+    def __init__(self, revisions: Optional[List[Dict]] = None):
+        self.revisions: List[Dict] = revisions or []
+
+    @classmethod
+    def start(cls, text: str, saved_at: Optional[str]) -> 'RevisionHistory':
+        history = cls()
+        history.revisions.append({'saved_at': saved_at, 'snapshot': zlib.compress(text.encode('utf-8'))})
+        return history
+
+    def __len__(self) -> int:
+        return len(self.revisions)
+
+    def append(self, text: str, saved_at: str) -> int:
+        """新しい版を追加して版番号を返す"""
+        number = len(self.revisions) + 1
+        if (number - 1) % SNAPSHOT_INTERVAL == 0:
+            self.revisions.append({'saved_at': saved_at, 'snapshot': zlib.compress(text.encode('utf-8'))})
+        else:
+            self.revisions.append({'saved_at': saved_at, 'delta': make_delta(self.text(number - 1), text)})
+        return number
+
+    def text(self, number: int) -> str:
+        """版番号 number の全文を復元（直前の全文から差分を順に適用）"""
+        if not 1 <= number <= len(self.revisions):
+            raise IndexError(f"版 {number} はありません（全{len(self.revisions)}版）")
+        base = number - 1
+        while 'snapshot' not in self.revisions[base]:
+            base -= 1
+        units = split_units(zlib.decompress(self.revisions[base]['snapshot']).decode('utf-8'))
+        for revision in self.revisions[base + 1:number]:
+            units = _apply_units(units, revision['delta'])
+        return ''.join(units)
+
+    def stored_bytes(self) -> int:
+        """履歴の保存サイズ（全文は圧縮後、差分は追加された内容のバイト数と範囲の数）"""
+        size = 0
+        for revision in self.revisions:
+            if 'snapshot' in revision:
+                size += len(revision['snapshot'])
+            else:
+                size += sum(len(op.encode('utf-8')) if isinstance(op, str) else 8 for op in revision['delta'])
+        return size
+
+    def to_list(self) -> List[Dict]:
+        """エクスポート用（全文はbase64にする）"""
+        return [
+            {'saved_at': r['saved_at'], 'snapshot': base64.b64encode(r['snapshot']).decode('ascii')} if 'snapshot' in r else dict(r)
+            for r in self.revisions
+        ]
+
+    @classmethod
+    def from_list(cls, revisions: List[Dict]) -> 'RevisionHistory':
+        return cls([
+            {'saved_at': r.get('saved_at'), 'snapshot': base64.b64decode(r['snapshot'])} if 'snapshot' in r
+            else {'saved_at': r.get('saved_at'), 'delta': r['delta']}
+            for r in revisions
+        ])
+
+
+def side_by_side(old: str, new: str, old_label: str, new_label: str) -> str:
+    """2つの版の左右比較（変更箇所の前後のみ）のHTML"""
+    return difflib.HtmlDiff(wrapcolumn=80).make_file(
+        [unit.rstrip('\n') for unit in split_units(old)],
+        [unit.rstrip('\n') for unit in split_units(new)],
+        old_label, new_label, context=True, numlines=3
+    )
+
+
+def revision_labels(history: RevisionHistory) -> List[Tuple[int, str]]:
+    """[(版番号, "版3（2025-01-01 12:00）"), ...]"""
+    return [(i, f"版{i}（{(r['saved_at'] or '')[:16].replace('T', ' ')}）") for i, r in enumerate(history.revisions, 1)]
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+"""LP Template Manager ページ（マルチページ構成。本体は lp_builder_bu.py）"""
+
+from lp_builder_bu import main
+
+main()
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+処理時間の計測（GEO分析ダッシュボード・LP Template Manager 共通）
+- 処理ステージごとのタイマーとカウンター
+- 再実行ごとの cProfile 取得（任意）
+- サイドバーの「パフォーマンス」パネル表示とJSONエクスポート
+計測を無効にしている間は、stage() は何もしないコンテキストマネージャを返すだけで、ほぼコストがかからない
+"""
+
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Dict, List, Optional
+
+PROFILE_LINES = 30
+HISTORY_SIZE = 20
+
+_NULL_STAGE = nullcontext()
+_local = threading.local()
+
+
+class PerfRecorder:
+    """1回のスクリプト実行（再実行）分の計測結果"""
+
+    def __init__(self, page: str, enabled: bool = False, profile: bool = False):
+        self.page = page
+        self.enabled = enabled
+        self.started_at = datetime.now().isoformat()
+        self.timings: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+        self.total_s: Optional[float] = None
+        self.profile_text = ""
+        self._started = time.perf_counter()
+        self._profiler = cProfile.Profile() if enabled and profile else None
+        if self._profiler is not None:
+            self._profiler.enable()
+
+    def stage(self, name: str):
+        """with perf.stage("名前"): で囲んだ処理の時間を加算する"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - started
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count(self, name: str, n: int = 1):
+        """件数などのカウンターを加算"""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def finish(self):
+        """計測を終了し、cProfile の結果をテキスト化する"""
+        if not self.enabled or self.total_s is not None:
+            return
+        self.total_s = time.perf_counter() - self._started
+        if self._profiler is not None:
+            self._profiler.disable()
+            buf = io.StringIO()
+            pstats.Stats(self._profiler, stream=buf).sort_stats('cumulative').print_stats(PROFILE_LINES)
+            self.profile_text = buf.getvalue()
+            self._profiler = None
+
+    def stop(self):
+        """途中で終わった実行（st.rerun()・例外）の計測を捨てる（cProfile を有効のまま残さない）"""
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler = None
+
+    def to_dict(self) -> Dict:
+        return {
+            'page': self.page,
+            'started_at': self.started_at,
+            'total_ms': round(self.total_s * 1000, 2) if self.total_s is not None else None,
+            'stages': [
+                {'stage': name, 'ms': round(seconds * 1000, 2), 'calls': self.calls[name]}
+                for name, seconds in self.timings.items()
+            ],
+            'counters': dict(self.counters),
+            'profile': self.profile_text,
+        }
+
+
+def current() -> PerfRecorder:
+    """実行中のスクリプトの記録器（start_perf の前は計測しない記録器）"""
+    recorder = getattr(_local, 'recorder', None)
+    if recorder is None:
+        recorder = PerfRecorder("", enabled=False)
+    return recorder
+
+
+# ===== Streamlit 連携 =====
+def start_perf(page: str) -> PerfRecorder:
+    """
+    スクリプト実行の最初に呼ぶ
+    設定はパネルのチェックボックス（前回の実行時の値）から読む
+    """
+    import streamlit as st
+
+    # 前回の実行が finish_perf まで進まなかった場合（st.rerun()・例外）の記録器が残っていれば止める
+    leftover = getattr(_local, 'recorder', None)
+    if leftover is not None:
+        discard_perf(leftover)
+
+    enabled = st.session_state.get('perf_enabled', False)
+    profile = enabled and st.session_state.get('perf_profile', False)
+    recorder = PerfRecorder(page, enabled, profile)
+    _local.recorder = recorder
+    return recorder
+
+
+def discard_perf(recorder: PerfRecorder):
+    """finish_perf の代わりに呼び、記録を残さずに計測を終える（途中で終わった実行用）"""
+    recorder.stop()
+    if getattr(_local, 'recorder', None) is recorder:
+        _local.recorder = None
+
+
+def finish_perf(recorder: PerfRecorder):
+    """スクリプト実行の最後に呼び、サイドバーにパネルを表示する"""
+    import streamlit as st
+
+    recorder.finish()
+    _local.recorder = None
+
+    history: List[Dict] = st.session_state.setdefault('perf_history', [])
+    if recorder.enabled:
+        history.append(recorder.to_dict())
+        del history[:-HISTORY_SIZE]
+
+    with st.sidebar.expander("⏱️ パフォーマンス"):
+        st.checkbox("計測を有効にする", key='perf_enabled')
+        st.checkbox("cProfileを取得", key='perf_profile', disabled=not st.session_state.get('perf_enabled', False))
+
+        if not recorder.enabled:
+            st.caption("計測は無効です。有効にすると次の操作から各処理の時間を表示します。")
+            return
+
+        latest = history[-1]
+        st.metric("スクリプト実行時間", f"{latest['total_ms']:.1f} ms")
+        if latest['stages']:
+            st.dataframe(latest['stages'], hide_index=True, use_container_width=True)
+        else:
+            st.caption("この実行で計測対象の処理はありませんでした。")
+        for name, value in latest['counters'].items():
+            st.caption(f"{name}: {value:,}")
+
+        if latest['profile']:
+            st.code(latest['profile'], language="text")
+
+        st.download_button(
+            label="💾 計測結果をJSONでダウンロード",
+            data=json.dumps({'latest': latest, 'history': history}, indent=2, ensure_ascii=False),
+            file_name=f"perf_{recorder.page}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            mime="application/json",
+            key='perf_download'
+        )